@@ -0,0 +1,147 @@
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import unicodedata
+
+# numpy, pandas y pyarrow se importan dentro de las funciones que leen o
+# escriben tablas: consultar el índice (p. ej. en una corrida sin cambios)
+# no los carga
+
+DIRECTORIO_COLUMNAR = 'data/columnar'
+ARCHIVO_INDICE = 'indice.json'
+
+# Cambia cuando cambia el contenido de los archivos (p. ej. reglas de tipado);
+# forma parte de la firma de caché de extraer_datos
+VERSION_FORMATO = 2
+
+def formato_disponible():
+    """'parquet' si pyarrow está instalado, si no 'npz' (formato NPZ de NumPy)"""
+    return 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'npz'
+
+def slug_tematica(tematica):
+    """Prefijo legible sin acentos + hash corto de la temática completa"""
+    texto = unicodedata.normalize('NFKD', tematica).encode('ascii', 'ignore').decode('ascii')
+    texto = re.sub(r'[^a-z0-9]+', '_', texto.lower()).strip('_')[:40].rstrip('_')
+    corto = hashlib.sha1(tematica.encode('utf-8')).hexdigest()[:8]
+    return f"{texto}_{corto}"
+
+def nombre_archivo_tabla(tematica, año, extension):
+    """Nombre de archivo corto y estable para una (temática, año)"""
+    return f"{slug_tematica(tematica)}_{año}.{extension}"
+
+def _guardar_parquet(ruta, df):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    # pyarrow conserva los tipos: category -> diccionario, Int32 -> int32 con nulos
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), ruta)
+
+def _guardar_npz(ruta, df):
+    import numpy as np
+    import pandas as pd
+    
+    # Las claves del NPZ son posicionales (c0, c1, ...); los nombres van en el índice.
+    # category -> códigos (c) + categorías (k); columnas con vacíos -> máscara (n)
+    arreglos = {}
+    for i, nombre in enumerate(df.columns):
+        serie = df[nombre]
+        
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            arreglos[f'c{i}'] = serie.cat.codes.to_numpy()
+            arreglos[f'k{i}'] = np.array(serie.cat.categories.astype(str), dtype=np.str_)
+        elif isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) and serie.dtype.kind in 'iuf':
+            arreglos[f'c{i}'] = serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0)
+            arreglos[f'n{i}'] = serie.isna().to_numpy()
+        elif serie.dtype.kind in 'iufb':
+            arreglos[f'c{i}'] = serie.to_numpy()
+        else:
+            nulos = serie.isna().to_numpy()
+            arreglos[f'c{i}'] = np.array(['' if v is None else str(v) for v in serie.where(~nulos, None)], dtype=np.str_)
+            if nulos.any():
+                arreglos[f'n{i}'] = nulos
+    
+    np.savez_compressed(ruta, **arreglos)
+
+def guardar_tabla(tematica, año, df, directorio=DIRECTORIO_COLUMNAR, formato=None):
+    """
+    Guarda una tabla (temática, año) ya tipada (ver tipado.tipar_tabla)
+    en su propio archivo columnar.
+    
+    Retorna la entrada para el índice:
+        {'archivo', 'formato', 'columnas', 'tipos', 'total_filas'}
+    """
+    formato = formato or formato_disponible()
+    os.makedirs(directorio, exist_ok=True)
+    
+    archivo = nombre_archivo_tabla(tematica, año, formato)
+    ruta = os.path.join(directorio, archivo)
+    
+    if formato == 'parquet':
+        _guardar_parquet(ruta, df)
+    else:
+        _guardar_npz(ruta, df)
+    
+    return {
+        'archivo': archivo,
+        'formato': formato,
+        'columnas': list(df.columns),
+        'tipos': [str(tipo) for tipo in df.dtypes],
+        'total_filas': len(df)
+    }
+
+def leer_tabla(entrada, directorio=DIRECTORIO_COLUMNAR):
+    """
+    Carga una sola tabla como DataFrame a partir de su entrada del índice,
+    sin leer el resto del conjunto de datos. Se conservan los tipos
+    guardados (enteros compactos, category).
+    """
+    import numpy as np
+    import pandas as pd
+    
+    ruta = os.path.join(directorio, entrada['archivo'])
+    
+    if entrada['formato'] == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(ruta).to_pandas()
+    
+    columnas = {}
+    with np.load(ruta, allow_pickle=False) as npz:
+        for i, (nombre, tipo) in enumerate(zip(entrada['columnas'], entrada['tipos'])):
+            valores = npz[f'c{i}']
+            
+            if tipo == 'category':
+                columnas[nombre] = pd.Categorical.from_codes(valores, npz[f'k{i}'])
+            elif f'n{i}' in npz and tipo[:1].isupper():
+                columnas[nombre] = pd.array(valores, dtype=tipo)
+                columnas[nombre][npz[f'n{i}']] = pd.NA
+            elif f'n{i}' in npz:
+                valores = valores.astype(object)
+                valores[npz[f'n{i}']] = None
+                columnas[nombre] = valores
+            else:
+                columnas[nombre] = valores
+    
+    return pd.DataFrame(columnas, columns=entrada['columnas'])
+
+def limpiar_huerfanos(indice, directorio=DIRECTORIO_COLUMNAR):
+    """Borra archivos de tablas que ya no aparecen en el índice"""
+    vigentes = {entrada['archivo'] for años in indice.values() for entrada in años.values()}
+    for archivo in os.listdir(directorio):
+        if archivo.endswith(('.parquet', '.npz')) and archivo not in vigentes:
+            os.remove(os.path.join(directorio, archivo))
+
+def cargar_indice(directorio=DIRECTORIO_COLUMNAR):
+    """Índice {temática: {año: entrada}} o {} si aún no existe"""
+    ruta = os.path.join(directorio, ARCHIVO_INDICE)
+    if not os.path.exists(ruta):
+        return {}
+    
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_indice(indice, directorio=DIRECTORIO_COLUMNAR):
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, ARCHIVO_INDICE), 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
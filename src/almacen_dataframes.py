@@ -0,0 +1,130 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from almacen_columnar import DIRECTORIO_COLUMNAR, cargar_indice, leer_tabla
+from almacen_mmap import DIRECTORIO_MMAP, AlmacenMmap
+
+class AlmacenDataFrames:
+    """
+    Acceso bajo demanda a los DataFrames por (temática, año) para el notebook.
+    
+    Solo se lee el archivo columnar de la tabla pedida. Los DataFrames
+    cargados y los resultados de combinar_años quedan en una caché LRU
+    limitada por memoria (`limite_mb`); al superarla se descartan los
+    usados hace más tiempo.
+    
+    Los DataFrames devueltos son compartidos con la caché: usar .copy()
+    antes de modificarlos.
+    
+    Con mmap=True las tablas se leen de data/mmap (extraer_datos.py --mmap):
+    cada DataFrame de obtener_dataframe es una vista de solo lectura sobre
+    el archivo mapeado, sin descomprimir ni copiar, y los kernels que leen
+    la misma tabla comparten la memoria. combinar_años sí arma una copia.
+    
+    Uso:
+        almacen = AlmacenDataFrames()
+        df = almacen.obtener_dataframe(tematica, '2015')
+        df_todos = almacen.combinar_años(tematica)
+    """
+    
+    def __init__(self, directorio=DIRECTORIO_COLUMNAR, limite_mb=512, mmap=False, directorio_mmap=DIRECTORIO_MMAP):
+        self.directorio = directorio
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self.mmap = AlmacenMmap(directorio_mmap) if mmap else None
+        self.indice = self.mmap.indice if mmap else cargar_indice(directorio)
+        self._cache = OrderedDict()  # clave -> (DataFrame, bytes)
+        self._bytes_cache = 0
+        
+        if not self.indice:
+            if mmap:
+                raise FileNotFoundError(f"No hay tablas mapeables en {directorio_mmap}. Ejecuta extraer_datos.py --mmap")
+            raise FileNotFoundError(f"No hay índice columnar en {directorio}. Ejecuta primero extraer_datos.py")
+    
+    def tematicas(self):
+        """Lista de temáticas disponibles (en el orden del mapeo)"""
+        return list(self.indice.keys())
+    
+    def años(self, tematica):
+        """Años con datos disponibles para una temática"""
+        self._validar_tematica(tematica)
+        return [año for año, entrada in self.indice[tematica].items() if entrada['total_filas'] > 0]
+    
+    def total_filas(self, tematica, año=None):
+        """Filas de una tabla o de toda la temática, leídas del índice (sin cargar datos)"""
+        self._validar_tematica(tematica)
+        if año is not None:
+            return self.indice[tematica][año]['total_filas']
+        return sum(entrada['total_filas'] for entrada in self.indice[tematica].values())
+    
+    def obtener_dataframe(self, tematica, año):
+        """Obtiene un DataFrame específico de una temática y año"""
+        self._validar_tematica(tematica)
+        if año not in self.años(tematica):
+            raise ValueError(f"Año '{año}' no disponible para '{tematica}'")
+        
+        clave = ('tabla', tematica, año)
+        df = self._de_cache(clave)
+        if df is None:
+            if self.mmap is not None:
+                df = self.mmap.leer_tabla(tematica, año)
+            else:
+                df = leer_tabla(self.indice[tematica][año], self.directorio)
+            df['año'] = np.int16(año)  # Agregar columna de año
+            self._a_cache(clave, df)
+        return df
+    
+    def combinar_años(self, tematica, años=None):
+        """Combina DataFrames de múltiples años en una temática (resultado en caché)"""
+        self._validar_tematica(tematica)
+        
+        if años is None:
+            años = self.años(tematica)
+        disponibles = self.años(tematica)
+        años = tuple(año for año in años if año in disponibles)
+        
+        if not años:
+            raise ValueError("No hay datos para combinar")
+        
+        clave = ('combinado', tematica, años)
+        df = self._de_cache(clave)
+        if df is None:
+            dfs = [self.obtener_dataframe(tematica, año) for año in años]
+            df = pd.concat(dfs, ignore_index=True)
+            
+            # concat pierde el tipo category si las categorías difieren entre años
+            for columna in dfs[0].columns:
+                if (all(isinstance(d[columna].dtype, pd.CategoricalDtype) for d in dfs if columna in d)
+                        and not isinstance(df[columna].dtype, pd.CategoricalDtype)):
+                    df[columna] = df[columna].astype('category')
+            self._a_cache(clave, df)
+        return df
+    
+    def memoria_mb(self):
+        """Memoria aproximada ocupada por la caché, en MB"""
+        return self._bytes_cache / (1024 * 1024)
+    
+    def limpiar_cache(self):
+        self._cache.clear()
+        self._bytes_cache = 0
+    
+    def _validar_tematica(self, tematica):
+        if tematica not in self.indice:
+            raise ValueError(f"Temática '{tematica}' no encontrada")
+    
+    def _de_cache(self, clave):
+        if clave not in self._cache:
+            return None
+        self._cache.move_to_end(clave)
+        return self._cache[clave][0]
+    
+    def _a_cache(self, clave, df):
+        tamaño = int(df.memory_usage(deep=True).sum())
+        self._cache[clave] = (df, tamaño)
+        self._bytes_cache += tamaño
+        
+        # Descartar los menos usados, conservando siempre el recién agregado
+        while self._bytes_cache > self.limite_bytes and len(self._cache) > 1:
+            _, (_, tamaño_viejo) = self._cache.popitem(last=False)
+            self._bytes_cache -= tamaño_viejo
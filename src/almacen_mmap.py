@@ -0,0 +1,203 @@
+import json
+import os
+import secrets
+
+import numpy as np
+import pandas as pd
+
+from almacen_columnar import nombre_archivo_tabla
+
+DIRECTORIO_MMAP = 'data/mmap'
+ARCHIVO_INDICE_MMAP = 'indice.json'
+
+# Cambia si cambia la disposición o el nombre de los archivos .bin
+VERSION_MMAP = 2
+
+# Cada arreglo empieza en un múltiplo de 64 bytes (alineado para cualquier dtype)
+ALINEACION = 64
+
+def _alinear(posicion):
+    return -(-posicion // ALINEACION) * ALINEACION
+
+def _arreglos_columna(serie):
+    """
+    Descompone una columna tipada en arreglos de ancho fijo:
+    (descripción para el índice, [arreglos a escribir en orden]).
+    
+    - numéricas/bool/fechas: 'valores'
+    - enteros nullable (Int16, ...): 'valores' (vacíos = 0) + 'nulos'
+    - category y texto: códigos en 'valores' + 'categorias' en el índice
+      (diccionario; -1 = vacío)
+    """
+    tipo = str(serie.dtype)
+    
+    if isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype.kind not in 'iufbM':
+        categorico = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype('category')
+        codigos = categorico.cat.codes.to_numpy()
+        return {'tipo': tipo, 'categorias': [str(valor) for valor in categorico.cat.categories]}, [codigos]
+    
+    if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+        valores = serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0)
+        return {'tipo': tipo}, [valores, serie.isna().to_numpy()]
+    
+    return {'tipo': tipo}, [serie.to_numpy()]
+
+class AlmacenMmap:
+    """
+    Copia de las tablas extraídas en un formato que se abre con np.memmap,
+    para que el notebook arme DataFrames sin descomprimir ni copiar datos y
+    varios kernels en la misma máquina compartan las mismas páginas del
+    sistema operativo.
+    
+    Cada (temática, año) es un archivo .bin con sus columnas una tras otra:
+    números de ancho fijo (int16, float32, ...) y textos codificados como
+    diccionario (códigos enteros; las categorías van en el índice). El
+    índice data/mmap/indice.json guarda por (temática, año) el dtype,
+    desplazamiento y largo de cada arreglo, más la firma con que se exportó.
+    
+    Cada exportación escribe un .bin con nombre nuevo (sufijo aleatorio) y
+    el índice se reemplaza de forma atómica (os.replace); los .bin que el
+    índice ya no nombra se borran después. Un kernel con el índice anterior
+    en memoria sigue leyendo la versión anterior intacta mientras su
+    archivo exista (o la tenga mapeada) y, si ya se borró, leer_tabla
+    falla con FileNotFoundError en lugar de aplicar desplazamientos viejos
+    a un archivo nuevo; recargar_indice() toma la versión actual.
+    
+    Uso:
+        almacen = AlmacenMmap()
+        df = almacen.leer_tabla(tematica, '2015')  # columnas sobre np.memmap
+    """
+    
+    def __init__(self, directorio=DIRECTORIO_MMAP):
+        self.directorio = directorio
+        self.recargar_indice()
+    
+    def recargar_indice(self):
+        """Vuelve a leer indice.json (p. ej. después de una nueva exportación)"""
+        self.indice = {}
+        
+        ruta = os.path.join(self.directorio, ARCHIVO_INDICE_MMAP)
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+                if datos.get('version') == VERSION_MMAP:
+                    self.indice = datos['tablas']
+            except (OSError, ValueError):
+                # Índice dañado: se vuelve a exportar todo
+                pass
+    
+    def vigente(self, tematica, año, firma):
+        """True si (temática, año) ya se exportó con esta firma y su archivo existe"""
+        entrada = self.indice.get(tematica, {}).get(año)
+        return (entrada is not None and firma is not None and entrada.get('firma') == firma
+                and os.path.exists(os.path.join(self.directorio, entrada['archivo'])))
+    
+    def guardar_tabla(self, tematica, año, df, hoja=None, firma=None):
+        """Escribe el .bin de (temática, año) con las columnas de `df` (ya tipado)"""
+        os.makedirs(self.directorio, exist_ok=True)
+        # Nombre nuevo en cada exportación: nunca se reescribe un .bin que otro proceso pueda estar leyendo
+        archivo = nombre_archivo_tabla(tematica, año, f'{secrets.token_hex(6)}.bin')
+        ruta = os.path.join(self.directorio, archivo)
+        
+        columnas = []
+        posicion = 0
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as f:
+            for nombre in df.columns:
+                descripcion, arreglos = _arreglos_columna(df[nombre])
+                ubicaciones = []
+                for arreglo in arreglos:
+                    arreglo = np.ascontiguousarray(arreglo)
+                    inicio = _alinear(posicion)
+                    f.write(b'\0' * (inicio - posicion))
+                    f.write(arreglo.tobytes())
+                    posicion = inicio + arreglo.nbytes
+                    ubicaciones.append([arreglo.dtype.str, inicio])
+                
+                descripcion['nombre'] = nombre
+                descripcion['valores'] = ubicaciones[0]
+                if len(ubicaciones) > 1:
+                    descripcion['nulos'] = ubicaciones[1]
+                columnas.append(descripcion)
+        os.replace(temporal, ruta)
+        
+        entrada = {
+            'archivo': archivo,
+            'total_filas': len(df),
+            'hoja': hoja,
+            'firma': firma,
+            'columnas': columnas
+        }
+        self.indice.setdefault(tematica, {})[año] = entrada
+        return entrada
+    
+    def leer_tabla(self, tematica, año):
+        """
+        DataFrame de (temática, año) cuyas columnas son vistas de solo
+        lectura sobre el archivo mapeado (usar .copy() antes de modificarlo).
+        Los textos vuelven como category sin copiar sus códigos.
+        """
+        entrada = self.indice[tematica][año]
+        filas = entrada['total_filas']
+        ruta = os.path.join(self.directorio, entrada['archivo'])
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(
+                f"{ruta} ya no existe: el índice en memoria es de una exportación anterior (usar recargar_indice())")
+        mapa = np.memmap(ruta, mode='r') if os.path.getsize(ruta) else np.zeros(0, dtype=np.uint8)
+        
+        def vista(ubicacion):
+            dtype, inicio = ubicacion
+            return np.frombuffer(mapa, dtype=np.dtype(dtype), count=filas, offset=inicio)
+        
+        columnas = {}
+        for columna in entrada['columnas']:
+            valores = vista(columna['valores'])
+            tipo = columna['tipo']
+            
+            if 'categorias' in columna:
+                categorico = pd.Categorical.from_codes(valores, columna['categorias'], validate=False)
+                if tipo != 'category':
+                    # Texto sin tipo category: se arma la columna de objetos (esta sí se copia)
+                    categorico = pd.Series(categorico).astype(object).where(valores >= 0, None)
+                    if tipo != 'object':
+                        categorico = categorico.astype(tipo)
+                columnas[columna['nombre']] = categorico
+            elif 'nulos' in columna:
+                # IntegerArray/FloatingArray sobre los valores y la máscara mapeados
+                arreglo = pd.api.types.pandas_dtype(tipo).construct_array_type()
+                columnas[columna['nombre']] = arreglo(valores, vista(columna['nulos']))
+            else:
+                columnas[columna['nombre']] = valores
+        
+        return pd.DataFrame(columnas, columns=[columna['nombre'] for columna in entrada['columnas']], copy=False)
+    
+    def conservar(self, claves):
+        """Quita del índice los (temática, año) que no están en `claves` (guardar_indice borra sus archivos)"""
+        vigentes = set(claves)
+        self.indice = {
+            tematica: {año: entrada for año, entrada in años.items() if (tematica, año) in vigentes}
+            for tematica, años in self.indice.items()
+        }
+        self.indice = {tematica: años for tematica, años in self.indice.items() if años}
+    
+    def guardar_indice(self):
+        """
+        Reemplaza indice.json de forma atómica y luego borra los .bin que ya
+        no nombra (versiones anteriores y tablas quitadas con conservar)
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, ARCHIVO_INDICE_MMAP)
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION_MMAP, 'tablas': self.indice}, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, ruta)
+        
+        archivos = {entrada['archivo'] for años in self.indice.values() for entrada in años.values()}
+        for archivo in os.listdir(self.directorio):
+            if archivo.endswith(('.bin', '.bin.tmp')) and archivo not in archivos:
+                try:
+                    os.remove(os.path.join(self.directorio, archivo))
+                except OSError:
+                    # Abierto por otro proceso (Windows): se borra en la próxima exportación
+                    pass
@@ -0,0 +1,218 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from almacen_columnar import slug_tematica
+from armonizar import clasificar_columnas
+
+RUTA_SQLITE = 'data/sqlite/defunciones.sqlite'
+
+# Catálogo de lo exportado: una fila por (temática, año)
+ESQUEMA_CATALOGO = """
+CREATE TABLE IF NOT EXISTS catalogo (
+    tematica TEXT NOT NULL,
+    año INTEGER NOT NULL,
+    tabla TEXT NOT NULL,
+    hoja TEXT,
+    tipo_tabla TEXT,
+    total_filas INTEGER,
+    firma TEXT,
+    PRIMARY KEY (tematica, año)
+)
+"""
+
+def citar(nombre):
+    """Identificador SQL entre comillas dobles (los encabezados traen espacios y acentos)"""
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+def tipo_sql(dtype):
+    """Afinidad SQLite de una columna tipada (ver tipado.tipar_tabla)"""
+    if dtype.kind in 'iub':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+def nombres_sql(columnas):
+    """
+    Nombres de columna para SQLite, que compara identificadores sin
+    distinguir mayúsculas: 'Año' chocaría con la columna año y dos
+    encabezados que solo difieren en mayúsculas entre sí.
+    """
+    usados = {'año'}
+    nombres = []
+    for columna in columnas:
+        nombre = str(columna)
+        n = 2
+        while nombre.lower() in usados:
+            nombre = f"{columna}_{n}"
+            n += 1
+        usados.add(nombre.lower())
+        nombres.append(nombre)
+    return nombres
+
+def _filas(df):
+    # Valores de Python para sqlite3: enteros compactos -> int, category -> str, vacíos -> None
+    objetos = df.astype(object)
+    return objetos.where(df.notna(), None).itertuples(index=False, name=None)
+
+class AlmacenSQLite:
+    """
+    Base SQLite local con las tablas extraídas, para filtrar y agregar
+    sin cargar datos_completos completo.
+    
+    Cada temática es una tabla SQL (t_<slug>) con una columna año y las
+    columnas de sus tablas por año; si un año trae columnas nuevas se
+    agregan a la tabla. Hay índices sobre año y sobre las columnas de
+    dimensión (departamento, causa, edad, ...). El catálogo registra qué
+    (temática, año) hay y con qué firma se exportó.
+    
+    Uso en el notebook:
+        with AlmacenSQLite() as base:
+            base.filtrar('Defunciones por sexo', años=[2019, 2020], Departamento='Guatemala')
+            base.agregar('Defunciones por sexo', por=['año'], medidas=['Total'])
+            base.consultar('SELECT ... FROM ' + base.tabla('Defunciones por sexo'))
+    """
+    
+    def __init__(self, ruta=RUTA_SQLITE):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.execute('PRAGMA synchronous=NORMAL')
+        self.conexion.execute(ESQUEMA_CATALOGO)
+    
+    def vigente(self, tematica, año, firma):
+        """True si (temática, año) ya se exportó con esta firma"""
+        fila = self.conexion.execute(
+            'SELECT firma FROM catalogo WHERE tematica = ? AND año = ?', (tematica, int(año))).fetchone()
+        return fila is not None and fila[0] == firma
+    
+    def guardar_tabla(self, tematica, año, df, estructura_tabla, hoja=None, firma=None):
+        """
+        Reemplaza las filas de (temática, año) con las de `df` (ya tipado)
+        en una sola transacción.
+        """
+        tabla = self.tabla(tematica) or f"t_{slug_tematica(tematica)}"
+        nombres = nombres_sql(df.columns)
+        dimensiones, _ = clasificar_columnas(df, estructura_tabla)
+        
+        with self.conexion:
+            existentes = self._columnas_sql(tabla)
+            if not existentes:
+                definicion = ', '.join(['"año" INTEGER NOT NULL'] + [
+                    f"{citar(nombre)} {tipo_sql(tipo)}" for nombre, tipo in zip(nombres, df.dtypes)])
+                self.conexion.execute(f"CREATE TABLE {citar(tabla)} ({definicion})")
+                self.conexion.execute(f"CREATE INDEX {citar('ix_' + tabla + '_año')} ON {citar(tabla)} (\"año\")")
+                existentes = {'año'} | {nombre.lower() for nombre in nombres}
+            
+            for nombre, tipo in zip(nombres, df.dtypes):
+                if nombre.lower() not in existentes:
+                    self.conexion.execute(f"ALTER TABLE {citar(tabla)} ADD COLUMN {citar(nombre)} {tipo_sql(tipo)}")
+            
+            for columna, nombre in zip(df.columns, nombres):
+                if columna in dimensiones:
+                    indice = f"ix_{tabla}_{nombre}"
+                    self.conexion.execute(
+                        f"CREATE INDEX IF NOT EXISTS {citar(indice)} ON {citar(tabla)} ({citar(nombre)}, \"año\")")
+            
+            self.conexion.execute(f"DELETE FROM {citar(tabla)} WHERE \"año\" = ?", (int(año),))
+            columnas = ', '.join(['"año"'] + [citar(nombre) for nombre in nombres])
+            marcas = ', '.join('?' * (len(nombres) + 1))
+            self.conexion.executemany(
+                f"INSERT INTO {citar(tabla)} ({columnas}) VALUES ({marcas})",
+                ((int(año),) + fila for fila in _filas(df)))
+            
+            self.conexion.execute(
+                'INSERT OR REPLACE INTO catalogo VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (tematica, int(año), tabla, hoja, estructura_tabla.get('tipo'), len(df), firma))
+    
+    def conservar(self, claves):
+        """Borra del almacén los (temática, año) que no están en `claves`"""
+        vigentes = {(tematica, int(año)) for tematica, año in claves}
+        with self.conexion:
+            for tematica, año, tabla in self.conexion.execute(
+                    'SELECT tematica, año, tabla FROM catalogo').fetchall():
+                if (tematica, año) in vigentes:
+                    continue
+                self.conexion.execute(f"DELETE FROM {citar(tabla)} WHERE \"año\" = ?", (año,))
+                self.conexion.execute('DELETE FROM catalogo WHERE tematica = ? AND año = ?', (tematica, año))
+            
+            for (tabla,) in self.conexion.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 't\\_%' ESCAPE '\\'"
+                    " AND name NOT IN (SELECT tabla FROM catalogo)").fetchall():
+                self.conexion.execute(f"DROP TABLE {citar(tabla)}")
+    
+    def _columnas_sql(self, tabla):
+        return {fila[1].lower() for fila in self.conexion.execute(f"PRAGMA table_info({citar(tabla)})")}
+    
+    def catalogo(self):
+        """DataFrame con las (temática, año) disponibles"""
+        return self.consultar('SELECT * FROM catalogo ORDER BY tematica, año')
+    
+    def tabla(self, tematica):
+        """Nombre de la tabla SQL de una temática (None si no se exportó)"""
+        fila = self.conexion.execute(
+            'SELECT tabla FROM catalogo WHERE tematica = ? LIMIT 1', (tematica,)).fetchone()
+        return fila[0] if fila else None
+    
+    def consultar(self, sql, parametros=()):
+        """Ejecuta una consulta SQL y retorna el resultado como DataFrame"""
+        return pd.read_sql_query(sql, self.conexion, params=parametros)
+    
+    def filtrar(self, tematica, años=None, columnas=None, **igualdades):
+        """
+        Filas de una temática, opcionalmente solo de `años` y con
+        columna = valor para cada igualdad (las columnas con espacios
+        se pasan como dict: **{'Grupo de edad': '0-4'}).
+        """
+        tabla = self._tabla_existente(tematica)
+        seleccion = ', '.join(citar(c) for c in ['año'] + list(columnas)) if columnas else '*'
+        donde, parametros = self._condiciones(años, igualdades)
+        return self.consultar(f"SELECT {seleccion} FROM {citar(tabla)}{donde} ORDER BY \"año\"", parametros)
+    
+    def agregar(self, tematica, por, medidas, años=None, funcion='SUM', **igualdades):
+        """
+        Agregación en la base: SELECT por..., SUM(medida)... GROUP BY por.
+        Solo vuelve el resultado agregado.
+        """
+        tabla = self._tabla_existente(tematica)
+        grupos = ', '.join(citar(c) for c in por)
+        valores = ', '.join(f"{funcion}({citar(m)}) AS {citar(m)}" for m in medidas)
+        donde, parametros = self._condiciones(años, igualdades)
+        return self.consultar(
+            f"SELECT {grupos}, {valores} FROM {citar(tabla)}{donde} GROUP BY {grupos} ORDER BY {grupos}",
+            parametros)
+    
+    def _tabla_existente(self, tematica):
+        tabla = self.tabla(tematica)
+        if tabla is None:
+            raise KeyError(f"Temática no exportada a SQLite: {tematica}")
+        return tabla
+    
+    def _condiciones(self, años, igualdades):
+        condiciones = []
+        parametros = []
+        if años is not None:
+            años = [int(año) for año in años]
+            condiciones.append(f"\"año\" IN ({', '.join('?' * len(años))})")
+            parametros.extend(años)
+        for columna, valor in igualdades.items():
+            condiciones.append(f"{citar(columna)} = ?")
+            parametros.append(valor)
+        donde = (' WHERE ' + ' AND '.join(condiciones)) if condiciones else ''
+        return donde, parametros
+    
+    def cerrar(self):
+        self.conexion.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+        return False
@@ -0,0 +1,407 @@
+import argparse
+import json
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cache_build import ManifiestoBuild
+from almacen_columnar import (DIRECTORIO_COLUMNAR, cargar_indice, formato_disponible, guardar_tabla,
+                              leer_tabla)
+from indice_titulos import normalizar_titulo
+from tipado import entero_compacto, es_dimension_por_nombre
+
+# La tabla de hechos vive junto a las tablas por año
+DIRECTORIO_HECHOS = os.path.join(DIRECTORIO_COLUMNAR, 'hechos')
+ARCHIVO_INDICE_HECHOS = 'indice_hechos.json'
+
+# Cambia cuando cambian las reglas de armonización (invalida la caché)
+VERSION_HECHOS = 2
+
+# Nombre canónico de las dimensiones: el primer prefijo que coincide con el
+# encabezado normalizado (sin acentos, minúsculas) decide la columna.
+# Residencia y ocurrencia son lugares distintos: solo 'Departamento' a secas es 'departamento'
+DIMENSIONES_CANONICAS = (
+    ('departamento_residencia', ('departamento de residencia',)),
+    ('departamento_ocurrencia', ('departamento de ocurrencia',)),
+    ('departamento', ('departamento',)),
+    ('municipio', ('municipio',)),
+    ('grupo_edad', ('grupos de edad', 'grupo de edad', 'grupo edad')),
+    ('edad', ('edad',)),
+    ('causa', ('causa',)),
+    ('sexo', ('sexo',)),
+    ('estado_civil', ('estado civil',)),
+    ('pueblo', ('pueblo',)),
+    ('mes', ('mes',)),
+    ('dia', ('dia',)),
+    ('lugar', ('lugar',)),
+    ('tipo', ('tipo',))
+)
+
+# Dimensiones de departamento, en orden de preferencia para ordenar y filtrar la tabla de hechos
+DIMENSIONES_DEPARTAMENTO = ('departamento', 'departamento_residencia', 'departamento_ocurrencia')
+
+# Columnas fijas de la tabla de hechos (las dimensiones van entre año y grupo)
+COLUMNAS_FIJAS = ('tematica', 'año')
+COLUMNAS_MEDIDA = ('grupo', 'medida', 'valor')
+
+def nombre_canonico(encabezado):
+    """
+    Nombre canónico de una columna de dimensión:
+    'Departamento' -> 'departamento', 'Departamento de residencia' ->
+    'departamento_residencia', 'Grupos de edad' -> 'grupo_edad'.
+    Los encabezados desconocidos quedan como su versión normalizada ('lugar_x').
+    """
+    normalizado = normalizar_titulo(encabezado)
+    for canonico, prefijos in DIMENSIONES_CANONICAS:
+        if any(normalizado.startswith(prefijo) for prefijo in prefijos):
+            return canonico
+    return re.sub(r'[^a-z0-9]+', '_', normalizado).strip('_') or 'dimension'
+
+def dimension_departamento(dimensiones):
+    """Primera dimensión de departamento de `dimensiones` según DIMENSIONES_DEPARTAMENTO, o None"""
+    return next((dimension for dimension in DIMENSIONES_DEPARTAMENTO if dimension in dimensiones), None)
+
+def clasificar_columnas(df, estructura_tabla):
+    """
+    Separa las columnas de una tabla tipada en dimensiones y medidas.
+    
+    - Columnas bajo un grupo con subtítulos ('Sexo_Hombres'): medida 'Hombres' del grupo 'Sexo'
+    - Primera columna, columnas de texto y columnas con nombre de dimensión: dimensiones
+    - El resto (conteos como 'Total'): medidas sin grupo
+    
+    Retorna: ({columna: nombre_canonico}, {columna: (grupo o None, medida)})
+    """
+    grupos = {}
+    if estructura_tabla.get('tipo') == 'agrupado':
+        for titulo, valores in estructura_tabla['encabezados'].items():
+            if isinstance(valores, list):
+                for subtitulo in valores:
+                    grupos[f"{titulo}_{subtitulo}"] = (titulo, subtitulo)
+    
+    dimensiones = {}
+    medidas = {}
+    for posicion, columna in enumerate(df.columns):
+        if columna in grupos:
+            medidas[columna] = grupos[columna]
+        elif (posicion == 0 or isinstance(df[columna].dtype, pd.CategoricalDtype)
+                or es_dimension_por_nombre(columna)):
+            canonico = nombre_canonico(columna)
+            # Dos columnas de la misma tabla no pueden compartir nombre canónico
+            if canonico in dimensiones.values() or canonico in COLUMNAS_FIJAS + COLUMNAS_MEDIDA:
+                canonico = re.sub(r'[^a-z0-9]+', '_', normalizar_titulo(columna)).strip('_')
+            dimensiones[columna] = canonico
+        else:
+            medidas[columna] = (None, columna)
+    
+    return dimensiones, medidas
+
+def tabla_larga(df, tematica, año, estructura_tabla):
+    """
+    Convierte una tabla (temática, año) en formato largo:
+    tematica, año, dimensiones canónicas..., grupo, medida, valor.
+    Cada celda de medida pasa a ser una fila.
+    """
+    dimensiones, medidas = clasificar_columnas(df, estructura_tabla)
+    
+    ancha = df[list(dimensiones) + list(medidas)].rename(columns=dimensiones)
+    for canonico in dimensiones.values():
+        ancha[canonico] = ancha[canonico].astype(object)
+    
+    larga = ancha.melt(id_vars=list(dimensiones.values()), value_vars=list(medidas),
+                       var_name='columna', value_name='valor')
+    
+    grupo = {columna: grupo for columna, (grupo, _) in medidas.items()}
+    medida = {columna: nombre for columna, (_, nombre) in medidas.items()}
+    larga['grupo'] = larga['columna'].map(grupo)
+    larga['medida'] = larga['columna'].map(medida)
+    larga['valor'] = pd.to_numeric(larga['valor'], errors='coerce')
+    larga['tematica'] = tematica
+    larga['año'] = np.int16(año)
+    
+    return larga.drop(columns='columna')
+
+def a_categoria(serie):
+    """Texto como category con categorías ordenadas alfabéticamente (para búsquedas binarias)"""
+    texto = serie.astype('string').str.strip()
+    categorias = sorted(texto.dropna().unique())
+    return pd.Categorical(texto.to_numpy(dtype=object, na_value=None), categories=categorias)
+
+def armonizar_tematica(tematica, tablas):
+    """
+    Tabla de hechos de una temática a partir de sus tablas por año.
+    
+    tablas: lista de (año, DataFrame tipado, estructura_tabla)
+    
+    Las dimensiones de todos los años se alinean por nombre canónico (las
+    que faltan en un año quedan vacías) y las filas se ordenan por
+    (año, departamento, resto de dimensiones) para poder recortar por
+    rangos; el departamento es el primero de DIMENSIONES_DEPARTAMENTO que
+    tenga la temática. Retorna: (DataFrame, [dimensiones en orden])
+    """
+    largas = [tabla_larga(df, tematica, año, estructura_tabla) for año, df, estructura_tabla in tablas]
+    largas = [larga for larga in largas if len(larga)]
+    
+    dimensiones = []
+    for larga in largas:
+        for columna in larga.columns:
+            if columna not in COLUMNAS_FIJAS + COLUMNAS_MEDIDA and columna not in dimensiones:
+                dimensiones.append(columna)
+    departamento = dimension_departamento(dimensiones)
+    if departamento:
+        dimensiones.remove(departamento)
+        dimensiones.insert(0, departamento)
+    
+    columnas = list(COLUMNAS_FIJAS) + dimensiones + list(COLUMNAS_MEDIDA)
+    if not largas:
+        return pd.DataFrame(columns=columnas), dimensiones
+    
+    hechos = pd.concat([larga.reindex(columns=columnas) for larga in largas], ignore_index=True)
+    
+    for columna in ['tematica'] + dimensiones + ['grupo', 'medida']:
+        hechos[columna] = a_categoria(hechos[columna])
+    hechos['año'] = hechos['año'].astype(np.int16)
+    
+    valores = hechos['valor']
+    if np.all(np.mod(valores.dropna(), 1) == 0):
+        hechos['valor'] = entero_compacto(valores)
+    else:
+        hechos['valor'] = valores.astype(np.float32)
+    
+    # Orden (año, departamento, ...): los códigos de category siguen el orden alfabético
+    claves = [hechos['año'].to_numpy()] + [hechos[d].cat.codes.to_numpy() for d in dimensiones]
+    orden = np.lexsort(claves[::-1])
+    hechos = hechos.iloc[orden].reset_index(drop=True)
+    
+    return hechos, dimensiones
+
+def rangos_por_año(hechos):
+    """{año: [fila_inicio, fila_fin)} de una tabla de hechos ya ordenada por año"""
+    años = hechos['año'].to_numpy()
+    if len(años) == 0:
+        return {}
+    
+    unicos, inicios = np.unique(años, return_index=True)
+    fines = list(inicios[1:]) + [len(años)]
+    return {str(año): [int(inicio), int(fin)] for año, inicio, fin in zip(unicos, inicios, fines)}
+
+def construir_hechos(indice, estructura, forzar=False, directorio=DIRECTORIO_COLUMNAR,
+                     manifiesto=None):
+    """
+    Arma (o reutiliza) la tabla de hechos de cada temática del índice columnar.
+    
+    indice: {temática: {año: entrada}} de almacen_columnar
+    estructura: {temática: {año: estructura_tabla}} (estructura_completa.json)
+    
+    Una temática se reconstruye solo si cambió alguna de sus tablas o
+    estructuras (firma en ManifiestoBuild, etapa 'armonizar').
+    Retorna el índice de hechos:
+        {temática: entrada de guardar_tabla + {'años': {año: [inicio, fin]},
+                                               'dimensiones': [...], 'firma': str}}
+    """
+    directorio_hechos = os.path.join(directorio, 'hechos')
+    manifiesto_propio = manifiesto is None
+    if manifiesto_propio:
+        manifiesto = ManifiestoBuild()
+    
+    indice_previo = {} if forzar else cargar_indice_hechos(directorio_hechos)
+    indice_hechos = {}
+    
+    for tematica, años in indice.items():
+        tablas_estructura = estructura.get(tematica, {})
+        # Contenido de cada archivo: el nombre es fijo por (temática, año)
+        firma = manifiesto.firma(
+            {año: manifiesto.hash_archivo(os.path.join(directorio, entrada['archivo']))
+             for año, entrada in años.items()},
+            {año: entrada['total_filas'] for año, entrada in años.items()},
+            {año: tablas_estructura.get(año) for año in años},
+            VERSION_HECHOS
+        )
+        
+        previa = indice_previo.get(tematica)
+        if (previa and previa.get('firma') == firma and manifiesto.vigente('armonizar', tematica, firma)
+                and os.path.exists(os.path.join(directorio_hechos, previa['archivo']))):
+            indice_hechos[tematica] = previa
+            continue
+        
+        tablas = [
+            (año, leer_tabla(entrada, directorio), tablas_estructura.get(año, {}))
+            for año, entrada in años.items() if entrada['total_filas'] > 0
+        ]
+        hechos, dimensiones = armonizar_tematica(tematica, tablas)
+        
+        entrada = guardar_tabla(tematica, 'hechos', hechos, directorio_hechos)
+        entrada.update({
+            'años': rangos_por_año(hechos),
+            'dimensiones': dimensiones,
+            'firma': firma
+        })
+        indice_hechos[tematica] = entrada
+        manifiesto.registrar('armonizar', tematica, firma)
+    
+    guardar_indice_hechos(indice_hechos, directorio_hechos)
+    
+    # Borrar tablas de hechos de temáticas que ya no están
+    vigentes = {entrada['archivo'] for entrada in indice_hechos.values()}
+    for archivo in os.listdir(directorio_hechos):
+        if archivo.endswith(('.parquet', '.npz')) and archivo not in vigentes:
+            os.remove(os.path.join(directorio_hechos, archivo))
+    
+    if manifiesto_propio:
+        manifiesto.guardar()
+    
+    return indice_hechos
+
+def cargar_indice_hechos(directorio=DIRECTORIO_HECHOS):
+    """Índice de la tabla de hechos o {} si aún no existe"""
+    ruta = os.path.join(directorio, ARCHIVO_INDICE_HECHOS)
+    if not os.path.exists(ruta):
+        return {}
+    
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_indice_hechos(indice_hechos, directorio=DIRECTORIO_HECHOS):
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, ARCHIVO_INDICE_HECHOS), 'w', encoding='utf-8') as f:
+        json.dump(indice_hechos, f, ensure_ascii=False, indent=2)
+
+class TablaHechos:
+    """
+    Consultas sobre la tabla de hechos en formato largo
+    (tematica, año, dimensiones..., grupo, medida, valor).
+    
+    Las filas de cada temática están ordenadas por (año, departamento), así
+    que un filtro por años y departamento se resuelve con los rangos del
+    índice y una búsqueda binaria, sin recorrer la tabla.
+    
+    Uso:
+        hechos = TablaHechos()
+        df = hechos.consultar(tematica, años=['2019', '2020'], departamento='Guatemala')
+        serie = hechos.serie_temporal(tematica, medida='Total', departamento='Guatemala')
+    """
+    
+    def __init__(self, directorio=DIRECTORIO_HECHOS, max_tablas=4):
+        self.directorio = directorio
+        self.indice = cargar_indice_hechos(directorio)
+        self.max_tablas = max_tablas
+        self._tablas = OrderedDict()
+        
+        if not self.indice:
+            raise FileNotFoundError(f"No hay tabla de hechos en {directorio}. Ejecuta primero armonizar.py")
+    
+    def tematicas(self):
+        return list(self.indice.keys())
+    
+    def años(self, tematica):
+        return list(self._entrada(tematica)['años'].keys())
+    
+    def dimensiones(self, tematica):
+        return list(self._entrada(tematica)['dimensiones'])
+    
+    def tabla(self, tematica):
+        """Tabla de hechos completa de una temática (compartida: usar .copy() para modificarla)"""
+        if tematica in self._tablas:
+            self._tablas.move_to_end(tematica)
+            return self._tablas[tematica]
+        
+        df = leer_tabla(self._entrada(tematica), self.directorio)
+        departamento = dimension_departamento(self._entrada(tematica)['dimensiones'])
+        if departamento:
+            # Las búsquedas binarias necesitan los códigos en orden alfabético
+            df[departamento] = df[departamento].cat.reorder_categories(sorted(df[departamento].cat.categories))
+        self._tablas[tematica] = df
+        while len(self._tablas) > self.max_tablas:
+            self._tablas.popitem(last=False)
+        return df
+    
+    def consultar(self, tematica, años=None, departamento=None):
+        """
+        Filas de `tematica` para `años` (todos si es None) y, opcionalmente,
+        un solo `departamento` (de la dimensión de departamento por la que se
+        ordenó la temática, ver dimension_departamento). Cada año es un rango
+        contiguo de filas y, dentro de él, cada departamento también.
+        """
+        entrada = self._entrada(tematica)
+        df = self.tabla(tematica)
+        años = entrada['años'] if años is None else [str(año) for año in años]
+        
+        codigo = None
+        if departamento is not None:
+            columna = dimension_departamento(entrada['dimensiones'])
+            if columna is None:
+                raise ValueError(f"'{tematica}' no tiene dimensión departamento")
+            categorias = df[columna].cat.categories
+            if departamento not in categorias:
+                return df.iloc[0:0]
+            codigo = categorias.get_loc(departamento)
+            codigos = df[columna].cat.codes.to_numpy()
+        
+        trozos = []
+        for año in años:
+            if año not in entrada['años']:
+                continue
+            inicio, fin = entrada['años'][año]
+            if codigo is not None:
+                tramo = codigos[inicio:fin]
+                inicio, fin = (inicio + np.searchsorted(tramo, codigo, 'left'),
+                               inicio + np.searchsorted(tramo, codigo, 'right'))
+            trozos.append(df.iloc[inicio:fin])
+        
+        if not trozos:
+            return df.iloc[0:0]
+        return pd.concat(trozos) if len(trozos) > 1 else trozos[0]
+    
+    def serie_temporal(self, tematica, medida, departamento=None, grupo=None):
+        """Suma de `valor` por año para una medida (y grupo/departamento opcionales)"""
+        df = self.consultar(tematica, departamento=departamento)
+        filtro = df['medida'] == medida
+        if grupo is not None:
+            filtro &= df['grupo'] == grupo
+        return df[filtro].groupby('año')['valor'].sum()
+    
+    def _entrada(self, tematica):
+        if tematica not in self.indice:
+            raise ValueError(f"Temática '{tematica}' no encontrada")
+        return self.indice[tematica]
+
+def main(forzar=False):
+    estructura_json = 'data/json/estructura_completa.json'
+    
+    print("=" * 80)
+    print("ARMONIZANDO TABLAS ENTRE AÑOS (FORMATO LARGO)")
+    print("=" * 80)
+    
+    indice = cargar_indice()
+    if not indice:
+        print(f"\n❌ Error: no hay índice columnar en {DIRECTORIO_COLUMNAR}. Ejecuta primero extraer_datos.py")
+        return
+    
+    if not os.path.exists(estructura_json):
+        print(f"\n❌ Error: {estructura_json} no existe")
+        return
+    
+    with open(estructura_json, 'r', encoding='utf-8') as f:
+        estructura = json.load(f)
+    
+    indice_hechos = construir_hechos(indice, estructura, forzar)
+    
+    print()
+    for tematica, entrada in indice_hechos.items():
+        print(f"  {tematica[:50]}... ({len(entrada['años'])} años, {entrada['total_filas']:,} filas, "
+              f"dimensiones: {', '.join(entrada['dimensiones'])})")
+    
+    print(f"\n✓ Tabla de hechos ({formato_disponible()}) guardada en: {DIRECTORIO_HECHOS}/")
+    
+    print(f"\n{'='*80}")
+    print("PROCESO COMPLETADO")
+    print(f"{'='*80}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arma la tabla de hechos armonizada entre años")
+    parser.add_argument('--forzar', action='store_true', help="Reconstruir todas las temáticas")
+    args = parser.parse_args()
+    
+    main(forzar=args.forzar)
@@ -0,0 +1,241 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from sesion_libros import SesionLibros
+from metricas import memoria_pico_mb
+from libros_sinteticos import generar_libros
+from generar_mapeo import generar_mapeo_hojas
+from extraer_estructura import extraer_estructura_tabla
+from extraer_datos import extraer_datos_tabla
+
+def _commit_actual():
+    """Hash corto del commit de git del repositorio, o None"""
+    try:
+        resultado = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        return resultado.stdout.strip() or None
+    except OSError:
+        return None
+
+def cargar_libro(archivo, **opciones_carga):
+    """Abre `archivo` en una sesión propia y la cierra (cada medición deja el libro cerrado)"""
+    with SesionLibros(**opciones_carga) as sesion:
+        sesion.libro(archivo)
+
+def medir(funcion, repeticiones=3):
+    """
+    Ejecuta `funcion()` `repeticiones` veces y una vez más bajo tracemalloc.
+    Las corridas cronometradas no llevan tracemalloc para no inflar los tiempos.
+    
+    Retorna: (resultado de la última corrida, {'segundos': mediana, 'segundos_min',
+              'segundos_cpu': mediana, 'memoria_pico_mb': pico de tracemalloc})
+    """
+    tiempos = []
+    tiempos_cpu = []
+    resultado = None
+    
+    for _ in range(repeticiones):
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+        tiempos_cpu.append(time.process_time() - inicio_cpu)
+    
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return resultado, {
+        'segundos': statistics.median(tiempos),
+        'segundos_min': min(tiempos),
+        'segundos_cpu': statistics.median(tiempos_cpu),
+        'memoria_pico_mb': pico / (1024 * 1024)
+    }
+
+def _acumular(etapas, nombre, medicion, filas=0, celdas=0):
+    """Suma una medición a los totales de la etapa `nombre`"""
+    etapa = etapas.setdefault(nombre, {
+        'llamadas': 0, 'segundos': 0.0, 'segundos_min': 0.0, 'segundos_cpu': 0.0,
+        'memoria_pico_mb': 0.0, 'filas': 0, 'celdas': 0
+    })
+    etapa['llamadas'] += 1
+    for clave in ('segundos', 'segundos_min', 'segundos_cpu'):
+        etapa[clave] += medicion[clave]
+    etapa['memoria_pico_mb'] = max(etapa['memoria_pico_mb'], medicion['memoria_pico_mb'])
+    etapa['filas'] += filas
+    etapa['celdas'] += celdas
+
+def ejecutar_benchmark(años=('2015', '2016'), filas=500, columnas=12, hojas=16, repeticiones=3, semilla=0):
+    """
+    Genera libros sintéticos en un directorio temporal y mide:
+    
+    - generar_mapeo_hojas: el mapeo completo de todos los años
+    - extraer_estructura_tabla: cada hoja mapeada, con el libro ya abierto
+    - extraer_datos_tabla: cada hoja mapeada, con el libro ya abierto en read_only
+    - carga_libro / carga_libro_read_only: la apertura de cada libro
+    
+    Los tiempos son la mediana de `repeticiones` corridas, sumada sobre
+    hojas y años. Retorna el reporte como dict (ver main).
+    """
+    parametros = {'años': list(años), 'filas': filas, 'columnas': columnas, 'hojas': hojas,
+                  'repeticiones': repeticiones, 'semilla': semilla}
+    etapas = {}
+    directorio_original = os.getcwd()
+    temporal = tempfile.mkdtemp(prefix='benchmark_ine_')
+    
+    try:
+        # Los scripts trabajan con rutas relativas a la raíz del proyecto
+        os.chdir(temporal)
+        os.makedirs('data/json', exist_ok=True)
+        archivos = generar_libros('data/defunciones', años, filas, columnas, hojas, semilla)
+        bytes_libros = sum(os.path.getsize(archivo) for archivo in archivos)
+        
+        # 1. Mapeo (sin caché, para medir siempre la lectura de títulos)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, medicion = medir(lambda: generar_mapeo_hojas(forzar=True), repeticiones)
+        _acumular(etapas, 'generar_mapeo_hojas', medicion)
+        
+        with open('data/json/mapeo_hojas.json', 'r', encoding='utf-8') as f:
+            mapeo = json.load(f)
+        
+        for año, archivo in zip(años, archivos):
+            hojas_año = [mapeo[tematica][año] for tematica in mapeo if mapeo[tematica].get(año)]
+            
+            # 2. Estructura, con el libro abierto una sola vez como en extraer_estructura.py
+            _, medicion = medir(lambda: cargar_libro(archivo), repeticiones)
+            _acumular(etapas, 'carga_libro', medicion)
+            
+            estructuras = {}
+            with SesionLibros() as sesion:
+                sesion.libro(archivo)
+                for nombre_hoja in hojas_año:
+                    estructura, medicion = medir(
+                        lambda: extraer_estructura_tabla(archivo, nombre_hoja, sesion), repeticiones)
+                    estructuras[nombre_hoja] = estructura
+                    _acumular(etapas, 'extraer_estructura_tabla', medicion)
+            
+            # 3. Datos, con el libro en read_only como en extraer_datos.py
+            _, medicion = medir(lambda: cargar_libro(archivo, read_only=True), repeticiones)
+            _acumular(etapas, 'carga_libro_read_only', medicion)
+            
+            with SesionLibros(read_only=True) as sesion:
+                sesion.libro(archivo)
+                for nombre_hoja in hojas_año:
+                    datos, medicion = medir(
+                        lambda: extraer_datos_tabla(archivo, nombre_hoja, estructuras[nombre_hoja], sesion),
+                        repeticiones)
+                    _acumular(etapas, 'extraer_datos_tabla', medicion, datos['total_filas'],
+                              datos['total_filas'] * len(datos['encabezados']))
+    
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(temporal, ignore_errors=True)
+    
+    for etapa in etapas.values():
+        segundos = etapa['segundos']
+        etapa['filas_por_segundo'] = etapa['filas'] / segundos if segundos > 0 else None
+        etapa['celdas_por_segundo'] = etapa['celdas'] / segundos if segundos > 0 else None
+    
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': parametros,
+        'bytes_libros': bytes_libros,
+        'etapas': etapas,
+        'rss_pico_mb': memoria_pico_mb()
+    }
+
+def comparar_reportes(actual, base):
+    """
+    Compara dos reportes etapa por etapa.
+    Retorna: {etapa: {'base': s, 'actual': s, 'razon': actual/base}}
+    """
+    comparacion = {}
+    for nombre, etapa in actual['etapas'].items():
+        previa = base.get('etapas', {}).get(nombre)
+        if not previa or not previa['segundos']:
+            continue
+        comparacion[nombre] = {
+            'base': previa['segundos'],
+            'actual': etapa['segundos'],
+            'razon': etapa['segundos'] / previa['segundos']
+        }
+    return comparacion
+
+def main(años, filas, columnas, hojas, repeticiones, semilla, salida, comparar=None):
+    print("=" * 80)
+    print("BENCHMARK CON LIBROS SINTÉTICOS")
+    print("=" * 80)
+    print(f"\nAños: {', '.join(años)} | {hojas} hojas × {filas} filas × {columnas} columnas | "
+          f"{repeticiones} repeticiones")
+    
+    reporte = ejecutar_benchmark(años, filas, columnas, hojas, repeticiones, semilla)
+    
+    print(f"\n{'='*80}")
+    print("RESULTADOS")
+    print(f"{'='*80}\n")
+    
+    for nombre, etapa in reporte['etapas'].items():
+        texto = f"  {nombre:28s} {etapa['segundos']:8.3f} s  ({etapa['llamadas']:3d} llamadas, " \
+                f"pico {etapa['memoria_pico_mb']:7.1f} MB"
+        if etapa['filas_por_segundo']:
+            texto += f", {etapa['filas_por_segundo']:,.0f} filas/s"
+        print(texto + ")")
+    
+    if reporte['rss_pico_mb'] is not None:
+        print(f"\n  RSS pico del proceso: {reporte['rss_pico_mb']:,.1f} MB")
+    
+    if comparar:
+        with open(comparar, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        reporte['comparacion'] = {'base': comparar, 'commit_base': base.get('commit'),
+                                  'etapas': comparar_reportes(reporte, base)}
+        
+        print(f"\n{'='*80}")
+        print(f"COMPARACIÓN CON {comparar} (commit {base.get('commit')})")
+        print(f"{'='*80}\n")
+        for nombre, info in reporte['comparacion']['etapas'].items():
+            marca = "⚠" if info['razon'] > 1.10 else "✓"
+            print(f"  {marca} {nombre:28s} {info['base']:8.3f} s → {info['actual']:8.3f} s  (×{info['razon']:.2f})")
+    
+    directorio = os.path.dirname(salida)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    
+    print(f"\n✓ Resultados guardados en: {salida}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide mapeo, estructura y datos sobre libros sintéticos")
+    parser.add_argument('--años', nargs='+', default=['2015', '2016'],
+                        help="Años a generar (deben estar entre 2015 y 2024)")
+    parser.add_argument('--filas', type=int, default=500, help="Filas de datos por hoja")
+    parser.add_argument('--columnas', type=int, default=12, help="Columnas por hoja")
+    parser.add_argument('--hojas', type=int, default=16, help="Hojas por libro (16 = una por temática)")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Corridas por medición (se toma la mediana)")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla de los libros sintéticos")
+    parser.add_argument('--salida', default=None,
+                        help="JSON de resultados (por defecto data/benchmarks/benchmark_<fecha>.json)")
+    parser.add_argument('--comparar', default=None, help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+    
+    salida = args.salida or os.path.join(
+        'data/benchmarks', f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    
+    main(args.años, args.filas, args.columnas, args.hojas, args.repeticiones, args.semilla, salida, args.comparar)
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+
+class ManifiestoBuild:
+    """
+    Caché persistente para reconstrucciones incrementales.
+    
+    Guarda en un JSON pequeño (junto a data/json/) el hash de contenido y
+    mtime de cada <año>.xlsx y una firma por cada resultado ya generado
+    (por etapa y clave, p. ej. 'extraer_datos' / '2024|Cuadro 3').
+    Si la firma actual coincide con la guardada, el resultado anterior
+    puede reutilizarse sin volver a abrir el libro.
+    
+    Estructura:
+        {
+            'archivos': {ruta: {'sha256': str, 'mtime': float, 'tamaño': int}},
+            'etapas': {etapa: {clave: firma}}
+        }
+    """
+    
+    def __init__(self, ruta='data/json/manifiesto_build.json'):
+        self.ruta = ruta
+        self.datos = {'archivos': {}, 'etapas': {}}
+        
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    self.datos = json.load(f)
+            except (OSError, ValueError):
+                # Manifiesto dañado: se reconstruye todo
+                pass
+    
+    def hash_archivo(self, archivo):
+        """
+        Hash SHA-256 del contenido de `archivo`.
+        Si mtime y tamaño no cambiaron se reutiliza el hash guardado.
+        """
+        info = os.stat(archivo)
+        clave = os.path.normpath(archivo)
+        previo = self.datos['archivos'].get(clave)
+        
+        if previo and previo['mtime'] == info.st_mtime and previo['tamaño'] == info.st_size:
+            return previo['sha256']
+        
+        h = hashlib.sha256()
+        with open(archivo, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(bloque)
+        
+        self.datos['archivos'][clave] = {
+            'sha256': h.hexdigest(),
+            'mtime': info.st_mtime,
+            'tamaño': info.st_size
+        }
+        return h.hexdigest()
+    
+    @staticmethod
+    def firma(*partes):
+        """Firma estable de cualquier combinación de valores serializables a JSON"""
+        texto = json.dumps(partes, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+    
+    def vigente(self, etapa, clave, firma):
+        """True si el resultado de (etapa, clave) se generó con la misma firma"""
+        return self.datos['etapas'].get(etapa, {}).get(clave) == firma
+    
+    def registrar(self, etapa, clave, firma):
+        self.datos['etapas'].setdefault(etapa, {})[clave] = firma
+    
+    def olvidar(self, etapa, clave):
+        self.datos['etapas'].get(etapa, {}).pop(clave, None)
+    
+    def guardar(self):
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        
+        with open(self.ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.datos, f, ensure_ascii=False, indent=2)
+
+def cargar_json_previo(ruta):
+    """Carga un JSON de salida anterior para reutilizar entradas, o {} si no existe"""
+    if not os.path.exists(ruta):
+        return {}
+    
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import re
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from cache_build import ManifiestoBuild
+from almacen_columnar import (DIRECTORIO_COLUMNAR, cargar_indice, formato_disponible, guardar_tabla,
+                              leer_tabla)
+from armonizar import a_categoria, nombre_canonico, tabla_larga
+from indice_titulos import normalizar_titulo
+from tipado import entero_compacto
+
+# Los agregados viven junto a las tablas por año
+DIRECTORIO_CUBO = os.path.join(DIRECTORIO_COLUMNAR, 'cubo')
+ARCHIVO_INDICE_CUBO = 'indice_cubo.json'
+
+# Cambia cuando cambian las reglas de agregación (invalida la caché)
+VERSION_CUBO = 3
+
+# Ejes del cubo; el año siempre se conserva
+EJES_CUBO = ('departamento', 'sexo', 'grupo_edad')
+
+# Columnas (o grupos de medidas) que alimentan cada eje, en orden de preferencia.
+# El eje departamento es el de residencia o sin calificar; el de ocurrencia no entra al cubo
+COLUMNAS_EJE = {
+    'departamento': ('departamento', 'departamento_residencia'),
+    'grupo_edad': ('grupo_edad', 'edad')
+}
+
+# Valor de un eje sumado en un agregado ('*' = todos los valores)
+TODOS = '*'
+
+# Valor de un eje que la tabla no desglosa o que es el total publicado
+TOTAL = 'Total'
+
+# Celda vacía en un eje que la tabla sí desglosa: va aparte, nunca al total
+SIN_DATO = 'Sin dato'
+
+# Cuántas causas guardar por (temática, año) en el ranking
+TOP_CAUSAS = 20
+
+def eje_de_titulo(tematica):
+    """
+    Eje que recorren las columnas de medida, según el título:
+    'Defunciones por sexo, según departamento...' -> 'sexo'.
+    """
+    coincidencia = re.search(r'\bpor (.+?)(?:,|\bsegun\b|$)', normalizar_titulo(tematica))
+    return nombre_canonico(coincidencia.group(1)) if coincidencia else None
+
+def es_total(valor):
+    """'Total', 'Total República', 'Ambos sexos', ... (ya normalizado)"""
+    return valor.startswith('total') or valor in ('ambos sexos', 'todos', 'todas')
+
+def filas_cubo(df, tematica, año, estructura_tabla):
+    """
+    Filas de una tabla (temática, año) con sus valores ubicados en los ejes
+    del cubo: año, departamento, sexo, grupo_edad, causa, categoria, valor.
+    
+    Cada medida se ubica en el eje de su grupo ('Sexo_Hombres' -> sexo) o,
+    sin grupo, en el eje del título; si ese eje no es del cubo (o ya es
+    una dimensión de la tabla) va a 'categoria', que siempre se suma.
+    Los ejes que la tabla no desglosa y los totales publicados ('Total',
+    'Total República', ...) quedan como TOTAL; las celdas vacías de un eje
+    que la tabla desglosa quedan como SIN_DATO.
+    """
+    return ubicar_en_ejes(tabla_larga(df, tematica, año, estructura_tabla), tematica)
+
+def ubicar_en_ejes(larga, tematica):
+    """filas_cubo a partir de la tabla_larga ya armada de (temática, año)"""
+    ejes = EJES_CUBO + ('causa', 'categoria')
+    filas = pd.DataFrame({'año': larga['año'].to_numpy()})
+    
+    # Filas en que la tabla desglosa cada eje (por una dimensión o por sus medidas)
+    desglosa = {}
+    for eje in ejes:
+        columna = next((nombre for nombre in COLUMNAS_EJE.get(eje, (eje,)) if nombre in larga.columns), None)
+        filas[eje] = larga[columna].to_numpy(dtype=object) if columna else None
+        desglosa[eje] = np.full(len(larga), columna is not None)
+    
+    eje_titulo = eje_de_titulo(tematica)
+    eje_medida = larga['grupo'].map(nombre_canonico, na_action='ignore').fillna(eje_titulo or 'categoria')
+    eje_medida = eje_medida.replace({'departamento_residencia': 'departamento'})
+    libres = [eje for eje in ejes[:-1] if not desglosa[eje].any()]
+    eje_medida = eje_medida.where(eje_medida.isin(libres), 'categoria')
+    medidas = larga['medida'].to_numpy(dtype=object)
+    for eje in ejes:
+        de_medida = eje_medida.to_numpy() == eje
+        filas[eje] = np.where(de_medida, medidas, filas[eje].to_numpy())
+        desglosa[eje] |= de_medida
+    
+    for eje in ejes:
+        texto = filas[eje].astype('string').str.strip()
+        valores_total = [valor for valor in texto.dropna().unique()
+                         if valor != '' and es_total(normalizar_titulo(valor))]
+        vacios = texto.fillna('').eq('').to_numpy(dtype=bool)
+        totales = texto.isin(valores_total).to_numpy(dtype=bool) | (vacios & ~desglosa[eje])
+        filas[eje] = np.where(totales, TOTAL,
+                              np.where(vacios, SIN_DATO, texto.to_numpy(dtype=object, na_value=None)))
+    
+    filas['valor'] = larga['valor'].fillna(0).to_numpy(dtype=np.float64)
+    return filas
+
+def resumir(filas, por):
+    """
+    Suma `valor` por año y los ejes de `por`, sin contar dos veces:
+    cada eje fuera de `por` se reduce a su fila TOTAL si la tabla la
+    publica y, si no, se suman sus valores. En los ejes de `por` se
+    descartan las filas TOTAL.
+    """
+    for eje in ('categoria', 'causa') + EJES_CUBO:
+        if eje in por:
+            continue
+        es_total_eje = (filas[eje] == TOTAL).to_numpy()
+        if es_total_eje.any():
+            filas = filas[es_total_eje]
+    
+    for eje in por:
+        filas = filas[filas[eje] != TOTAL]
+    
+    return filas.groupby(['año'] + list(por), sort=False)['valor'].sum().reset_index()
+
+def agregar_tabla(df, tematica, año, estructura_tabla):
+    """
+    Agregados de una tabla (temática, año):
+    - cubo: una fila por combinación de ejes del cubo, con TODOS en los
+      ejes sumados (año; año × departamento; ...; año × departamento × sexo × grupo_edad)
+    - causas: las TOP_CAUSAS causas con más defunciones y su rango
+    """
+    filas = filas_cubo(df, tematica, año, estructura_tabla)
+    
+    partes = []
+    for n in range(len(EJES_CUBO) + 1):
+        for por in combinations(EJES_CUBO, n):
+            parte = resumir(filas, por)
+            for eje in EJES_CUBO:
+                if eje not in por:
+                    parte[eje] = TODOS
+            partes.append(parte)
+    cubo = pd.concat(partes, ignore_index=True)
+    cubo.insert(0, 'tematica', tematica)
+    
+    causas = resumir(filas, ('causa',)).nlargest(TOP_CAUSAS, 'valor', keep='first')
+    causas.insert(0, 'tematica', tematica)
+    causas['rango'] = np.arange(1, len(causas) + 1, dtype=np.int16)
+    
+    return cubo, causas
+
+def _compactar(df, columnas_texto):
+    # category ordenada para las columnas de texto, enteros compactos para las sumas
+    df = df.reset_index(drop=True)
+    for columna in columnas_texto:
+        df[columna] = a_categoria(df[columna])
+    df['año'] = df['año'].astype(np.int16)
+    
+    valores = df['valor']
+    if len(valores) and np.all(np.mod(valores, 1) == 0):
+        df['valor'] = entero_compacto(valores.astype(np.int64))
+    return df
+
+def construir_cubo(indice, estructura, forzar=False, directorio=DIRECTORIO_COLUMNAR, manifiesto=None):
+    """
+    Arma o actualiza los agregados de todas las tablas del índice columnar.
+    
+    Cada (temática, año) tiene su firma (contenido del archivo columnar +
+    estructura); solo se recalculan las que cambiaron y se reemplazan
+    sus filas en los agregados guardados. Retorna el índice del cubo:
+        {'agregados': entrada, 'causas': entrada, 'firmas': {temática: {año: firma}}}
+    """
+    directorio_cubo = os.path.join(directorio, 'cubo')
+    manifiesto_propio = manifiesto is None
+    if manifiesto_propio:
+        manifiesto = ManifiestoBuild()
+    
+    indice_previo = {} if forzar else cargar_indice_cubo(directorio_cubo)
+    firmas_previas = indice_previo.get('firmas', {})
+    archivos_previos = all(
+        os.path.exists(os.path.join(directorio_cubo, indice_previo[nombre]['archivo']))
+        for nombre in ('agregados', 'causas') if nombre in indice_previo
+    ) and 'agregados' in indice_previo
+    
+    firmas = {}
+    pendientes = []
+    for tematica, años in indice.items():
+        for año, entrada in años.items():
+            firma = manifiesto.firma(
+                manifiesto.hash_archivo(os.path.join(directorio, entrada['archivo'])),
+                estructura.get(tematica, {}).get(año),
+                VERSION_CUBO
+            )
+            firmas.setdefault(tematica, {})[año] = firma
+            clave = f"{tematica}|{año}"
+            if not (archivos_previos and firmas_previas.get(tematica, {}).get(año) == firma
+                    and manifiesto.vigente('cubo', clave, firma)):
+                pendientes.append((tematica, año, entrada))
+    
+    if archivos_previos and not pendientes and firmas == firmas_previas:
+        return indice_previo
+    
+    # Se conservan las filas de las (temática, año) sin cambios
+    conservar = {(tematica, año) for tematica, años in firmas.items() for año in años} - {
+        (tematica, año) for tematica, año, _ in pendientes}
+    cubos, causas = [], []
+    if archivos_previos:
+        for nombre, destino in (('agregados', cubos), ('causas', causas)):
+            previo = leer_tabla(indice_previo[nombre], directorio_cubo)
+            claves = zip(previo['tematica'].astype(str), previo['año'].astype(str))
+            # Máscara de numpy: una lista vacía de bools seleccionaría columnas, no filas
+            conservadas = np.fromiter((clave in conservar for clave in claves), dtype=bool, count=len(previo))
+            destino.append(previo[conservadas].astype(
+                {columna: object for columna in previo.columns if columna not in ('año', 'valor', 'rango')}))
+    
+    for tematica, año, entrada in pendientes:
+        if entrada['total_filas'] > 0:
+            df = leer_tabla(entrada, directorio)
+            cubo, top = agregar_tabla(df, tematica, año, estructura.get(tematica, {}).get(año, {}))
+            cubos.append(cubo)
+            causas.append(top)
+        manifiesto.registrar('cubo', f"{tematica}|{año}", firmas[tematica][año])
+    
+    columnas_cubo = ['tematica', 'año'] + list(EJES_CUBO) + ['valor']
+    cubo = pd.concat([c.reindex(columns=columnas_cubo) for c in cubos] or
+                     [pd.DataFrame(columns=columnas_cubo)], ignore_index=True)
+    cubo = _compactar(cubo.sort_values(['tematica', 'año'], kind='stable'), ['tematica'] + list(EJES_CUBO))
+    
+    columnas_causas = ['tematica', 'año', 'causa', 'valor', 'rango']
+    top = pd.concat([c.reindex(columns=columnas_causas) for c in causas] or
+                    [pd.DataFrame(columns=columnas_causas)], ignore_index=True)
+    top = _compactar(top.sort_values(['tematica', 'año', 'rango'], kind='stable'), ['tematica', 'causa'])
+    top['rango'] = top['rango'].astype(np.int16)
+    
+    indice_cubo = {
+        'agregados': guardar_tabla('cubo', 'agregados', cubo, directorio_cubo),
+        'causas': guardar_tabla('cubo', 'causas', top, directorio_cubo),
+        'firmas': firmas
+    }
+    guardar_indice_cubo(indice_cubo, directorio_cubo)
+    
+    # Borrar archivos de un formato anterior
+    vigentes = {indice_cubo['agregados']['archivo'], indice_cubo['causas']['archivo']}
+    for archivo in os.listdir(directorio_cubo):
+        if archivo.endswith(('.parquet', '.npz')) and archivo not in vigentes:
+            os.remove(os.path.join(directorio_cubo, archivo))
+    
+    if manifiesto_propio:
+        manifiesto.guardar()
+    
+    return indice_cubo
+
+def cargar_indice_cubo(directorio=DIRECTORIO_CUBO):
+    """Índice del cubo o {} si aún no existe"""
+    ruta = os.path.join(directorio, ARCHIVO_INDICE_CUBO)
+    if not os.path.exists(ruta):
+        return {}
+    
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_indice_cubo(indice_cubo, directorio=DIRECTORIO_CUBO):
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, ARCHIVO_INDICE_CUBO), 'w', encoding='utf-8') as f:
+        json.dump(indice_cubo, f, ensure_ascii=False, indent=2)
+
+class CuboDefunciones:
+    """
+    Totales precalculados por año × departamento × sexo × grupo de edad
+    y ranking de causas, sin tocar las tablas por año.
+    
+    Uso:
+        cubo = CuboDefunciones()
+        cubo.resumen(tematica, por=['departamento', 'sexo'], años=['2019', '2020'])
+        cubo.top_causas(tematica, n=10, año='2020')
+    """
+    
+    def __init__(self, directorio=DIRECTORIO_CUBO):
+        self.directorio = directorio
+        self.indice = cargar_indice_cubo(directorio)
+        
+        if not self.indice:
+            raise FileNotFoundError(f"No hay cubo en {directorio}. Ejecuta primero cubo.py")
+        
+        self.agregados = leer_tabla(self.indice['agregados'], directorio)
+        self.causas = leer_tabla(self.indice['causas'], directorio)
+    
+    def tematicas(self):
+        return list(self.indice['firmas'].keys())
+    
+    def resumen(self, tematica, por=(), años=None, **filtros):
+        """
+        Defunciones de `tematica` por año y los ejes de `por`
+        (departamento, sexo, grupo_edad); `filtros` fija el valor de otros
+        ejes, p. ej. sexo='Mujeres'. Retorna un DataFrame en formato ancho
+        si `por` tiene un solo eje (años como columnas) o largo si no.
+        """
+        desconocidos = (set(por) | set(filtros)) - set(EJES_CUBO)
+        if desconocidos:
+            raise ValueError(f"Ejes desconocidos: {', '.join(sorted(desconocidos))}")
+        
+        filtro = (self.agregados['tematica'] == tematica).to_numpy(copy=True)
+        for eje in EJES_CUBO:
+            if eje in filtros:
+                filtro &= (self.agregados[eje] == filtros[eje]).to_numpy()
+            elif eje not in por:
+                filtro &= (self.agregados[eje] == TODOS).to_numpy()
+            else:
+                filtro &= (self.agregados[eje] != TODOS).to_numpy()
+        if años is not None:
+            filtro &= self.agregados['año'].isin([int(año) for año in años]).to_numpy()
+        
+        df = self.agregados.loc[filtro, ['año'] + list(por) + ['valor']]
+        for eje in por:
+            df[eje] = df[eje].cat.remove_unused_categories()
+        
+        if len(por) == 1:
+            return df.pivot_table(index=por[0], columns='año', values='valor', aggfunc='sum', observed=True)
+        return df.reset_index(drop=True)
+    
+    def top_causas(self, tematica, n=10, año=None):
+        """Las `n` causas con más defunciones (de todos los años si `año` es None)"""
+        df = self.causas[self.causas['tematica'] == tematica]
+        if año is not None:
+            return df[df['año'] == int(año)].head(n)[['causa', 'valor', 'rango']].reset_index(drop=True)
+        
+        # Suma de las causas guardadas en el ranking de cada año
+        total = df.groupby('causa', observed=True)['valor'].sum().nlargest(n)
+        return total.reset_index()
+
+def main(forzar=False):
+    estructura_json = 'data/json/estructura_completa.json'
+    
+    print("=" * 80)
+    print("CALCULANDO AGREGADOS (CUBO)")
+    print("=" * 80)
+    
+    indice = cargar_indice()
+    if not indice:
+        print(f"\n❌ Error: no hay índice columnar en {DIRECTORIO_COLUMNAR}. Ejecuta primero extraer_datos.py")
+        return
+    
+    if not os.path.exists(estructura_json):
+        print(f"\n❌ Error: {estructura_json} no existe")
+        return
+    
+    with open(estructura_json, 'r', encoding='utf-8') as f:
+        estructura = json.load(f)
+    
+    indice_cubo = construir_cubo(indice, estructura, forzar)
+    
+    print(f"\n  Agregados: {indice_cubo['agregados']['total_filas']:,} filas")
+    print(f"  Ranking de causas: {indice_cubo['causas']['total_filas']:,} filas")
+    print(f"\n✓ Cubo ({formato_disponible()}) guardado en: {DIRECTORIO_CUBO}/")
+    
+    print(f"\n{'='*80}")
+    print("PROCESO COMPLETADO")
+    print(f"{'='*80}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcula totales por año, departamento, sexo y grupo de edad")
+    parser.add_argument('--forzar', action='store_true', help="Recalcular todas las tablas")
+    args = parser.parse_args()
+    
+    main(forzar=args.forzar)
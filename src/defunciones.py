@@ -0,0 +1,58 @@
+import time
+
+INICIO = time.perf_counter()
+
+import argparse
+import importlib
+import sys
+
+# Subcomando -> (módulo, descripción). Los módulos se importan solo al elegir el subcomando
+SUBCOMANDOS = {
+    'mapeo': ('generar_mapeo', "Genera el mapeo de temáticas a hojas por año"),
+    'estructura': ('extraer_estructura', "Extrae la estructura de columnas de cada temática y año"),
+    'datos': ('extraer_datos', "Extrae los datos de todas las tablas mapeadas"),
+    'validar': ('validacion', "Verifica totales y conteos entre temáticas y años"),
+    'all': ('pipeline', "Mapeo, estructura y datos en una sola pasada por libro, más armonización, cubo "
+                        "y validación")
+}
+
+# Módulos pesados que se reportan si llegaron a cargarse
+MODULOS_PESADOS = ('openpyxl', 'pandas', 'numpy', 'pyarrow')
+
+def reporte_tiempos(arranque, ejecucion):
+    """
+    Línea final con el tiempo de arranque (desde que se carga este script
+    hasta tener los argumentos del subcomando, imports incluidos) y de
+    ejecución, y qué módulos pesados se cargaron.
+    """
+    cargados = [modulo for modulo in MODULOS_PESADOS if modulo in sys.modules]
+    pesados = ", ".join(cargados) if cargados else "ninguno"
+    return f"⏱ Arranque {arranque * 1000:.0f} ms, ejecución {ejecucion:.2f} s (módulos pesados cargados: {pesados})"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='defunciones.py',
+        description="Punto de entrada único: mapeo, estructura y datos de los libros de defunciones",
+        epilog="Cada subcomando acepta --help con sus opciones")
+    parser.add_argument('subcomando', choices=list(SUBCOMANDOS),
+                        help="; ".join(f"{nombre}: {descripcion}" for nombre, (_, descripcion) in SUBCOMANDOS.items()))
+    parser.add_argument('argumentos', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    parser.add_argument('--sin-tiempos', action='store_true', help="No reportar el tiempo de arranque al terminar")
+    args = parser.parse_args(argv)
+    
+    nombre_modulo, descripcion = SUBCOMANDOS[args.subcomando]
+    subparser = argparse.ArgumentParser(prog=f'defunciones.py {args.subcomando}', description=descripcion)
+    
+    modulo = importlib.import_module(nombre_modulo)
+    modulo.agregar_argumentos(subparser)
+    
+    args_subcomando = subparser.parse_args(args.argumentos)
+    arranque = time.perf_counter() - INICIO
+    
+    inicio = time.perf_counter()
+    modulo.ejecutar(args_subcomando)
+    if not args.sin_tiempos:
+        print(reporte_tiempos(arranque, time.perf_counter() - inicio))
+
+if __name__ == "__main__":
+    main()
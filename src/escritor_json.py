@@ -0,0 +1,201 @@
+import json
+import os
+
+from segundo_plano import EscritorSegundoPlano
+from tabla_filas import TablaFilas
+
+# Modos de salida de datos_completos
+MODOS_JSON = ('indentado', 'compacto', 'jsonl')
+
+def ruta_datos(ruta_json, modo):
+    """datos_completos.json, o datos_completos.jsonl en modo 'jsonl'"""
+    if modo == 'jsonl':
+        return os.path.splitext(ruta_json)[0] + '.jsonl'
+    return ruta_json
+
+def cargar_datos_previos(ruta):
+    """
+    Carga una salida anterior de datos como {temática: {año: bloque}}, o {}.
+    Acepta JSON ({temática: {año: bloque}}) o JSON Lines; de JSON Lines cada
+    tabla se arma desde su línea de cabecera (también las tablas sin filas)
+    más sus filas. Las salidas sin cabeceras reconstruyen 'hoja',
+    'encabezados', 'datos' y 'total_filas' desde las filas.
+    """
+    if not os.path.exists(ruta):
+        return {}
+    
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            if not ruta.endswith('.jsonl'):
+                return json.load(f)
+            
+            previos = {}
+            for linea in f:
+                registro = json.loads(linea)
+                if 'tabla' in registro:
+                    previos.setdefault(registro['tematica'], {})[registro['año']] = dict(registro['tabla'], datos=[])
+                    continue
+                
+                bloque = previos.setdefault(registro['tematica'], {}).setdefault(registro['año'], {
+                    'encabezados': list(registro['fila']),
+                    'datos': [],
+                    'hoja': registro['hoja']
+                })
+                bloque['datos'].append(registro['fila'])
+            
+            for años in previos.values():
+                for bloque in años.values():
+                    bloque['total_filas'] = len(bloque['datos'])
+            return previos
+    
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def _serializable(objeto):
+    # Las filas en tuplas (TablaFilas) se escriben como la lista de dicts de siempre
+    if isinstance(objeto, TablaFilas):
+        return objeto.como_dicts()
+    raise TypeError(f"Objeto de tipo {type(objeto).__name__} no serializable a JSON")
+
+class EscritorDatosJSON:
+    """
+    Escribe datos_completos por bloques (temática, año) a medida que se
+    extraen, sin mantener todas las filas en memoria.
+    
+    Modos:
+    - 'indentado': el mismo JSON que json.dump(..., indent=2)
+    - 'compacto': el mismo esquema sin espacios ni saltos de línea
+    - 'jsonl': por cada bloque una línea de cabecera {"tematica", "año",
+      "tabla"} con todo el bloque salvo 'datos' (así las tablas sin filas
+      también quedan en el archivo) y luego una fila por línea,
+      {"tematica", "año", "hoja", "fila"}
+    
+    En los modos JSON cada bloque se serializa en cuanto llega y se guarda
+    en un archivo auxiliar (<ruta>.partes); al cerrar se arma el archivo
+    final en el orden {temática: {año: ...}}, copiando cada bloque ya
+    serializado. La salida anterior solo se reemplaza al cerrar sin errores.
+    
+    Con segundo_plano=True (por defecto) la serialización y la escritura de
+    cada bloque corren en un hilo aparte (ver EscritorSegundoPlano), así
+    que agregar() vuelve enseguida; los bloques no deben modificarse después.
+    
+    Uso:
+        with EscritorDatosJSON('data/json/datos_completos.json') as escritor:
+            escritor.agregar(tematica, año, bloque)
+    """
+    
+    def __init__(self, ruta, modo='indentado', segundo_plano=True):
+        if modo not in MODOS_JSON:
+            raise ValueError(f"Modo JSON desconocido: {modo}")
+        
+        self.ruta = ruta
+        self.modo = modo
+        self.bloques = 0
+        self._temporal = ruta + '.tmp'
+        self._partes = {}  # temática -> [(año, inicio, largo)]
+        self._escritura = EscritorSegundoPlano() if segundo_plano else None
+        
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        
+        if modo == 'jsonl':
+            self._archivo = open(self._temporal, 'w', encoding='utf-8')
+        else:
+            self._archivo = open(ruta + '.partes', 'w+b')
+    
+    def agregar(self, tematica, año, bloque):
+        """Serializa el bloque de (temática, año) y lo escribe (en segundo plano si corresponde)"""
+        self.bloques += 1
+        
+        if self._escritura is not None:
+            self._escritura.enviar(self._escribir, tematica, año, bloque)
+        else:
+            self._escribir(tematica, año, bloque)
+    
+    def _escribir(self, tematica, año, bloque):
+        if self.modo == 'jsonl':
+            tabla = {clave: valor for clave, valor in bloque.items() if clave != 'datos'}
+            cabecera = {'tematica': tematica, 'año': año, 'tabla': tabla}
+            self._archivo.write(json.dumps(cabecera, ensure_ascii=False) + '\n')
+            for fila in bloque['datos']:
+                registro = {'tematica': tematica, 'año': año, 'hoja': bloque.get('hoja'), 'fila': fila}
+                self._archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            return
+        
+        if self.modo == 'compacto':
+            texto = json.dumps(bloque, ensure_ascii=False, separators=(',', ':'), default=_serializable)
+        else:
+            # Sangría del bloque dentro de {temática: {año: bloque}}
+            texto = json.dumps(bloque, ensure_ascii=False, indent=2,
+                               default=_serializable).replace('\n', '\n    ')
+        
+        contenido = texto.encode('utf-8')
+        inicio = self._archivo.seek(0, os.SEEK_END)
+        self._archivo.write(contenido)
+        self._partes.setdefault(tematica, []).append((año, inicio, len(contenido)))
+    
+    def cerrar(self):
+        """Arma el archivo final y lo mueve a `ruta`"""
+        if self._escritura is not None:
+            try:
+                self._escritura.cerrar()
+            except Exception:
+                self.descartar()
+                raise
+        
+        if self.modo != 'jsonl':
+            self._armar()
+        self._archivo.close()
+        os.replace(self._temporal, self.ruta)
+        self._limpiar()
+    
+    def descartar(self):
+        """Cierra sin tocar la salida anterior"""
+        if self._escritura is not None:
+            self._escritura.descartar()
+        self._archivo.close()
+        if os.path.exists(self._temporal):
+            os.remove(self._temporal)
+        self._limpiar()
+    
+    def _armar(self):
+        compacto = self.modo == 'compacto'
+        clave = (lambda texto: json.dumps(texto, ensure_ascii=False) + (':' if compacto else ': '))
+        separador = ',' if compacto else ',\n'
+        
+        with open(self._temporal, 'wb') as salida:
+            if not self._partes:
+                salida.write(b'{}')
+                return
+            
+            salida.write(b'{' if compacto else b'{\n')
+            for n_tematica, (tematica, partes) in enumerate(self._partes.items()):
+                if n_tematica:
+                    salida.write(separador.encode('utf-8'))
+                salida.write(((clave(tematica) + '{') if compacto else
+                              ('  ' + clave(tematica) + '{\n')).encode('utf-8'))
+                
+                for n_año, (año, inicio, largo) in enumerate(partes):
+                    if n_año:
+                        salida.write(separador.encode('utf-8'))
+                    salida.write((clave(año) if compacto else '    ' + clave(año)).encode('utf-8'))
+                    self._archivo.seek(inicio)
+                    salida.write(self._archivo.read(largo))
+                
+                salida.write(b'}' if compacto else b'\n  }')
+            salida.write(b'}' if compacto else b'\n}')
+    
+    def _limpiar(self):
+        if self.modo != 'jsonl' and os.path.exists(self.ruta + '.partes'):
+            os.remove(self.ruta + '.partes')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.cerrar()
+        else:
+            self.descartar()
+        return False
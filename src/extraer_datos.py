@@ -1,75 +1,191 @@
-import openpyxl
-from openpyxl.utils import get_column_letter
+import argparse
 import json
 import os
+import re
+import time
 from datetime import datetime
 
-def extraer_datos_tabla(archivo_excel, nombre_hoja, estructura_tabla):
+import perfilado
+from sesion_libros import LECTORES, SesionLibros
+from metricas import formatear_rendimiento
+from paralelo import ejecutar_por_año
+from cache_build import ManifiestoBuild
+from almacen_columnar import (DIRECTORIO_COLUMNAR, VERSION_FORMATO, cargar_indice, formato_disponible,
+                              guardar_indice, guardar_tabla, leer_tabla, limpiar_huerfanos)
+from escritor_json import EscritorDatosJSON, cargar_datos_previos, ruta_datos
+from tabla_filas import TablaFilas
+from segundo_plano import EscritorSegundoPlano, resultado as resultado_escritura
+
+def aplanar_encabezados(estructura_tabla):
+    """
+    Convierte la estructura de encabezados a lista plana de nombres de columna.
+    Para tablas agrupadas los nombres quedan como "grupo_subtitulo".
+    """
+    encabezados_estructura = estructura_tabla['encabezados']
+    
+    if estructura_tabla['tipo'] == 'agrupado':
+        nombres_columnas = []
+        for titulo, valores in encabezados_estructura.items():
+            if isinstance(valores, list):
+                # Tiene subtítulos
+                for subtitulo in valores:
+                    nombres_columnas.append(f"{titulo}_{subtitulo}")
+            else:
+                # Es un string (sin subtítulos)
+                nombres_columnas.append(titulo)
+        return nombres_columnas
+    
+    # Para tablas simples, los nombres son directos
+    return encabezados_estructura
+
+# Versión de las reglas de extracción de filas y de tipado (entra en la firma de la caché)
+VERSION_EXTRACCION = 5
+
+# Primer texto de una fila que marca el pie del cuadro (fuente, notas, llamadas)
+PATRON_PIE = re.compile(r'^\s*((fuente|notas?|elaborad[oa]|elaboración)\b|\*|\(?\d{1,2}[/)])', re.IGNORECASE)
+
+# Número escrito como texto ('1,234', ' 56 ')
+PATRON_NUMERO = re.compile(r'^\s*[-+]?\d[\d,.\s]*$')
+
+# Largo mínimo de una nota al pie escrita como texto suelto tras una fila vacía
+MIN_LARGO_NOTA = 40
+
+# Filas vacías seguidas tras las que se da por terminada la tabla
+# (hojas con formato aplicado hasta mucho más abajo que los datos)
+MAX_FILAS_VACIAS = 100
+
+def es_numero(valor):
+    """True si la celda trae un número (o un número escrito como texto)"""
+    if isinstance(valor, bool):
+        return False
+    if isinstance(valor, (int, float)):
+        return True
+    return isinstance(valor, str) and bool(PATRON_NUMERO.match(valor))
+
+def es_pie_de_tabla(valores, num_columnas):
+    """
+    True si la fila empieza con un texto de pie de cuadro ('Fuente:', 'Nota:',
+    '1/', '*') y no trae números en el resto de sus `num_columnas` columnas:
+    una fila de datos rotulada '*Guatemala' o '12) Escuintla' sí los trae.
+    """
+    valores = valores[:num_columnas]
+    posicion, primero = next(((posicion, valor) for posicion, valor in enumerate(valores) if valor is not None),
+                             (None, None))
+    if not isinstance(primero, str) or not PATRON_PIE.match(primero):
+        return False
+    return not any(es_numero(valor) for valor in valores[posicion + 1:])
+
+def es_nota_suelta(valores):
+    """True si la fila tiene un único valor y es un texto largo (una oración, no una etiqueta)"""
+    presentes = [valor for valor in valores if valor is not None]
+    return len(presentes) == 1 and isinstance(presentes[0], str) and len(presentes[0].strip()) >= MIN_LARGO_NOTA
+
+def filas_combinadas_anchas(ws, num_columnas, fila_inicio=10):
+    """
+    Filas (desde `fila_inicio`) que empiezan con una celda combinada en
+    horizontal que cubre al menos la mitad de la tabla: en los cuadros del
+    INE así se escriben las notas al pie. Las hojas read_only no exponen
+    las celdas combinadas y dan un conjunto vacío.
+    """
+    rangos = ws.merged_cells.ranges if hasattr(ws, 'merged_cells') else ()
+    return {
+        rango.min_row for rango in rangos
+        if rango.min_row >= fila_inicio and rango.min_col == 1
+        and rango.max_col - rango.min_col + 1 >= max(2, num_columnas // 2)
+    }
+
+def region_datos(ws, fila_inicio=10):
+    """
+    Filas donde pueden estar los datos, sin leer celdas: de `fila_inicio` a
+    la última fila que declara la hoja (max_row). Retorna (fila_inicio,
+    fila_fin); fila_fin es None si la hoja no declara sus dimensiones (se
+    lee hasta el final).
+    """
+    fila_fin = ws.max_row
+    
+    # Hojas read_only escritas sin dimensiones reportan 'A1:A1'
+    # (iter_rows sin max_row vuelve a usar max_row, así que se descartan)
+    if fila_fin is not None and fila_fin <= 1 and hasattr(ws, 'reset_dimensions'):
+        ws.reset_dimensions()
+        fila_fin = None
+    
+    return fila_inicio, fila_fin
+
+def iterar_filas(ws, num_columnas, fila_inicio=10, max_filas=None):
+    """
+    Genera las filas de datos como tuplas de `num_columnas` valores.
+    
+    Lee en bloque las filas de region_datos (columnas 1 a `num_columnas`)
+    con iter_rows(values_only=True), por lo que funciona con hojas en modo
+    read_only sin materializar la hoja completa. En la misma pasada:
+    
+    - las filas vacías intermedias (separadores) se saltan sin cortar la tabla
+    - la tabla termina en el pie del cuadro: una fila sin números que
+      empieza con 'Fuente:', 'Nota:', '1/', etc., o, después de una fila
+      vacía, una nota combinada en horizontal o un texto largo suelto
+    - también termina tras MAX_FILAS_VACIAS filas vacías seguidas
+    
+    `max_filas` limita opcionalmente las filas leídas.
+    """
+    if num_columnas == 0:
+        return
+    
+    fila_inicio, fila_fin = region_datos(ws, fila_inicio)
+    if max_filas is not None:
+        limite = fila_inicio + max_filas - 1
+        fila_fin = limite if fila_fin is None else min(fila_fin, limite)
+    if fila_fin is not None and fila_fin < fila_inicio:
+        return
+    
+    notas_combinadas = filas_combinadas_anchas(ws, num_columnas, fila_inicio)
+    filas = ws.iter_rows(min_row=fila_inicio, max_row=fila_fin, max_col=num_columnas, values_only=True)
+    
+    vacias_seguidas = 0
+    for numero_fila, valores in enumerate(filas, fila_inicio):
+        if all(valor is None for valor in valores):
+            vacias_seguidas += 1
+            if vacias_seguidas >= MAX_FILAS_VACIAS:
+                return
+            continue
+        
+        if es_pie_de_tabla(valores, num_columnas):
+            return
+        if vacias_seguidas and (numero_fila in notas_combinadas or es_nota_suelta(valores)):
+            return
+        vacias_seguidas = 0
+        
+        # Las filas cortas (celdas finales vacías) se completan con None
+        if len(valores) < num_columnas:
+            valores = valores + (None,) * (num_columnas - len(valores))
+        
+        yield valores
+
+def extraer_datos_tabla(archivo_excel, nombre_hoja, estructura_tabla, sesion=None, lector='openpyxl'):
     """
     Extrae los datos de una tabla Excel basándose en su estructura.
     
+    Si se pasa una `SesionLibros`, la hoja se toma del libro ya abierto
+    en lugar de volver a cargar el archivo. Sin sesión, el libro se abre
+    en modo read_only con `lector` ('openpyxl' o 'rapido', ver LibroXLSX).
+    
     Retorna: {
         'encabezados': [...],
-        'datos': [
-            {...}  # cada fila como dict
-        ]
+        'datos': TablaFilas  # una tupla por fila; se itera como dicts
     }
     """
+    sesion_propia = sesion is None
+    if sesion_propia:
+        sesion = SesionLibros(lector=lector, read_only=True)
+    
     try:
-        wb = openpyxl.load_workbook(archivo_excel, data_only=True)
-        ws = wb[nombre_hoja]
+        ws = sesion.hoja(archivo_excel, nombre_hoja)
         
-        # Obtener encabezados de la estructura
-        encabezados_estructura = estructura_tabla['encabezados']
-        
-        # Convertir estructura de encabezados a lista plana de nombres de columna
-        if estructura_tabla['tipo'] == 'agrupado':
-            # Para tablas agrupadas, crear nombres como "grupo_subtitulo"
-            nombres_columnas = []
-            for titulo, valores in encabezados_estructura.items():
-                if isinstance(valores, list):
-                    # Tiene subtítulos
-                    for subtitulo in valores:
-                        nombres_columnas.append(f"{titulo}_{subtitulo}")
-                else:
-                    # Es un string (sin subtítulos)
-                    nombres_columnas.append(titulo)
-        else:
-            # Para tablas simples, los nombres son directos
-            nombres_columnas = encabezados_estructura
+        nombres_columnas = aplanar_encabezados(estructura_tabla)
         
         # Leer datos a partir de fila 10
-        datos = []
-        fila_inicio = 10
-        
-        # Encontrar cuántas filas tiene datos
-        fila_actual = fila_inicio
-        max_filas = 10000  # Límite de búsqueda
-        
-        while fila_actual <= fila_inicio + max_filas:
-            # Leer valores de la fila
-            valores = []
-            tiene_datos = False
-            
-            for col in range(1, len(nombres_columnas) + 1):
-                valor = ws.cell(fila_actual, col).value
-                valores.append(valor)
-                if valor is not None:
-                    tiene_datos = True
-            
-            # Si la fila no tiene datos, terminar
-            if not tiene_datos:
-                break
-            
-            # Crear diccionario de fila
-            fila_dict = {}
-            for col_idx, nombre_col in enumerate(nombres_columnas):
-                fila_dict[nombre_col] = valores[col_idx] if col_idx < len(valores) else None
-            
-            datos.append(fila_dict)
-            fila_actual += 1
-        
-        wb.close()
+        with perfilado.etapa('leer_filas', archivo_excel, nombre_hoja) as registro:
+            datos = TablaFilas(nombres_columnas, list(iterar_filas(ws, len(nombres_columnas))))
+            registro['filas'] = len(datos)
         
         return {
             'encabezados': nombres_columnas,
@@ -85,13 +201,116 @@ def extraer_datos_tabla(archivo_excel, nombre_hoja, estructura_tabla):
             'error': str(e),
             'total_filas': 0
         }
+    
+    finally:
+        if sesion_propia:
+            sesion.cerrar()
 
-def main():
+def extraer_datos_hojas(archivo_año, hojas, lector='openpyxl'):
+    """
+    Extrae los datos de varias hojas de un mismo libro, abriéndolo una vez
+    en modo read_only. Se ejecuta en el proceso actual o en un worker del pool.
+    
+    hojas: lista de (nombre_hoja, estructura_tabla)
+    lector: 'openpyxl' o 'rapido' (ver SesionLibros)
+    Retorna: lista de (datos, texto_rendimiento) en el mismo orden
+    """
+    resultado = []
+    
+    with SesionLibros(lector=lector, read_only=True) as sesion:
+        if hojas:
+            with perfilado.etapa('carga_libro', archivo_año):
+                try:
+                    sesion.libro(archivo_año)
+                except Exception:
+                    pass  # El error se reporta en cada hoja
+        
+        for nombre_hoja, estructura_tabla in hojas:
+            inicio = time.perf_counter()
+            datos = extraer_datos_tabla(archivo_año, nombre_hoja, estructura_tabla, sesion)
+            segundos = time.perf_counter() - inicio
+            resultado.append((datos, formatear_rendimiento(datos['total_filas'], segundos)))
+    
+    return resultado
+
+def tabla_tipada(año, datos, estructura_tabla, nombre_hoja):
+    """DataFrame tipado (ver tipado.tipar_tabla) de una tabla extraída"""
+    from tipado import tipar_tabla
+    
+    with perfilado.etapa('tipar_tabla', hoja=nombre_hoja, año=año) as registro:
+        registro['filas'] = datos['total_filas']
+        return tipar_tabla(datos['encabezados'], datos['datos'], estructura_tabla)
+
+def guardar_tabla_columnar(tematica, año, datos, estructura_tabla, nombre_hoja, df=None):
+    """
+    Tipa una tabla extraída (si no se pasa `df` ya tipado) y la guarda
+    en el almacén columnar. Retorna su entrada para el índice, con los
+    celdas que el tipado dejó vacías ('perdidos', lo revisa
+    validacion.py).
+    """
+    from tipado import perdidos_al_tipar
+    
+    if df is None:
+        df = tabla_tipada(año, datos, estructura_tabla, nombre_hoja)
+    
+    with perfilado.etapa('escribir_columnar', hoja=nombre_hoja, año=año) as registro:
+        registro['filas'] = datos['total_filas']
+        entrada = guardar_tabla(tematica, año, df)
+    
+    entrada.update({
+        'hoja': nombre_hoja,
+        'tipo_tabla': estructura_tabla['tipo'],
+        'encabezados': datos['encabezados'],
+        'perdidos': perdidos_al_tipar(datos['encabezados'], datos['datos'], df)
+    })
+    return entrada
+
+def guardar_tabla_sqlite(base, tematica, año, df, estructura_tabla, nombre_hoja, firma):
+    """Reemplaza (temática, año) en la base SQLite"""
+    with perfilado.etapa('escribir_sqlite', hoja=nombre_hoja, año=año) as registro:
+        registro['filas'] = len(df)
+        base.guardar_tabla(tematica, año, df, estructura_tabla, nombre_hoja, firma)
+
+def guardar_tabla_mmap(almacen, tematica, año, df, nombre_hoja, firma):
+    """Reemplaza el archivo mapeable de (temática, año) en data/mmap"""
+    with perfilado.etapa('escribir_mmap', hoja=nombre_hoja, año=año) as registro:
+        registro['filas'] = len(df)
+        almacen.guardar_tabla(tematica, año, df, nombre_hoja, firma)
+
+def tabla_desde_cache(entrada, previo, estructura_tabla):
+    """DataFrame tipado de una tabla reutilizada: del archivo columnar o, si no hay, del JSON previo"""
+    from tipado import tipar_tabla
+    
+    if entrada:
+        return leer_tabla(entrada)
+    return tipar_tabla(previo['encabezados'], previo['datos'], estructura_tabla)
+
+def main(workers=1, por_hoja=False, forzar=False, formato='columnar', modo_json='indentado', sqlite=False,
+         lector='openpyxl', mmap=False):
+    """
+    workers: procesos para repartir los años (1 = en serie)
+    por_hoja: repartir cada (año, hoja) como tarea independiente
+    forzar: ignorar la caché incremental y reprocesar todas las hojas
+    formato: 'columnar' (un archivo por temática y año en data/columnar),
+             'json' (datos_completos.json) o 'ambos'
+    modo_json: 'indentado', 'compacto' o 'jsonl' (datos_completos.jsonl,
+               una fila por línea); ver EscritorDatosJSON
+    sqlite: exportar además cada (temática, año) a data/sqlite (ver
+            AlmacenSQLite); las tablas sin cambios se copian de la salida
+            anterior solo si aún no están en la base
+    lector: 'openpyxl' (referencia) o 'rapido' (LibroXLSX, lee los valores
+            directamente del XML del libro)
+    mmap: exportar además cada (temática, año) a data/mmap en formato
+          mapeable con np.memmap (ver AlmacenMmap); como con sqlite, las
+          tablas sin cambios se copian solo si faltan o cambió su firma
+    """
     # Configuración
     directorio_data = 'data/defunciones'
     mapeo_json = 'data/json/mapeo_hojas.json'
     estructura_json = 'data/json/estructura_completa.json'
-    datos_json = 'data/json/datos_completos.json'
+    datos_json = ruta_datos('data/json/datos_completos.json', modo_json)
+    exportar_columnar = formato in ('columnar', 'ambos')
+    exportar_json = formato in ('json', 'ambos')
     años = ['2015', '2016', '2017', '2018', '2019', '2020', '2021', '2022', '2023', '2024']
     
     print("=" * 80)
@@ -115,76 +334,216 @@ def main():
     with open(estructura_json, 'r', encoding='utf-8') as f:
         estructura = json.load(f)
     
-    # Resultado: {tema: {año: {datos}}}
-    datos_resultado = {}
+    # Resultado: {tema: {año: {datos}}} (JSON, escrito por bloques) e índice columnar {tema: {año: entrada}}
+    indice = {}
+    tematicas_extraidas = set()
     resumen_años = {}
     
-    # Por cada año
+    # Caché incremental: firma por (año, hoja) = contenido del archivo + hoja + estructura.
+    # Cada formato se reutiliza solo desde su propia salida anterior.
+    manifiesto = ManifiestoBuild()
+    datos_previos = cargar_datos_previos(datos_json) if exportar_json and not forzar else {}
+    indice_previo = cargar_indice() if exportar_columnar and not forzar else {}
+    firmas = {}
+    en_cache = {}
+    
+    # Preparar el trabajo de cada año: [(hoja, estructura)] pendientes, en el orden del mapeo
+    trabajos = []
     for año in años:
-        print(f"\n{'='*80}")
-        print(f"PROCESANDO AÑO {año}")
-        print(f"{'='*80}")
-        
         archivo_año = os.path.join(directorio_data, f'{año}.xlsx')
-        
         if not os.path.exists(archivo_año):
-            print(f"⚠ {archivo_año} no existe, saltando...")
-            resumen_años[año] = {'procesadas': 0, 'error': 'Archivo no existe'}
             continue
         
-        print(f"✓ Procesando {año}.xlsx...")
-        
-        temáticas_procesadas = 0
-        total_filas_año = 0
-        
-        # Por cada temática
+        hash_año = manifiesto.hash_archivo(archivo_año)
+        hojas = []
         for tematica, años_map in mapeo.items():
             nombre_hoja = años_map.get(año)
-            
-            if not nombre_hoja:
-                continue
-            
-            # Obtener estructura de esta temática y año
-            if tematica not in estructura or año not in estructura[tematica]:
-                print(f"  ⚠ No hay estructura para {tematica[:50]}... en {año}")
+            if not nombre_hoja or tematica not in estructura or año not in estructura[tematica]:
                 continue
             
             estructura_tabla = estructura[tematica][año]
+            clave = f"{año}|{nombre_hoja}"
+            firmas[clave] = manifiesto.firma(hash_año, nombre_hoja, estructura_tabla, VERSION_FORMATO,
+                                            VERSION_EXTRACCION)
+            previo = datos_previos.get(tematica, {}).get(año)
+            entrada_previa = indice_previo.get(tematica, {}).get(año)
             
-            # Inicializar entrada para temática si no existe
-            if tematica not in datos_resultado:
-                datos_resultado[tematica] = {}
+            json_listo = not exportar_json or (previo and previo.get('hoja') == nombre_hoja)
+            columnar_listo = not exportar_columnar or (
+                entrada_previa and entrada_previa.get('hoja') == nombre_hoja
+                and os.path.exists(os.path.join(DIRECTORIO_COLUMNAR, entrada_previa['archivo'])))
             
-            # Extraer datos
-            datos = extraer_datos_tabla(archivo_año, nombre_hoja, estructura_tabla)
+            if json_listo and columnar_listo and manifiesto.vigente('extraer_datos', clave, firmas[clave]):
+                en_cache[(tematica, año)] = (previo, entrada_previa)
+            else:
+                hojas.append((nombre_hoja, estructura_tabla))
+        
+        trabajos.append((año, archivo_año, hojas))
+    
+    # Las entradas reutilizadas ya están en en_cache
+    datos_previos = None
+    
+    # Cada tabla se escribe en datos_completos en cuanto se extrae y sus filas se liberan
+    escritor = EscritorDatosJSON(datos_json, modo_json) if exportar_json else None
+    
+    # Los archivos columnares se escriben en un hilo aparte mientras se extrae lo siguiente
+    escritura = EscritorSegundoPlano() if exportar_columnar else None
+    # pandas (tipado, SQLite, mmap) se importa recién aquí y solo si se usa
+    base_sqlite = almacen_mmap = None
+    if sqlite:
+        from almacen_sqlite import RUTA_SQLITE, AlmacenSQLite
+        base_sqlite = AlmacenSQLite()
+    if mmap:
+        from almacen_mmap import DIRECTORIO_MMAP, AlmacenMmap
+        almacen_mmap = AlmacenMmap()
+    exportadas_sqlite = []
+    exportadas_mmap = []
+    
+    try:
+        resultados = ejecutar_por_año(extraer_datos_hojas, trabajos, workers, por_hoja, extra=(lector,))
+        
+        for año in años:
+            print(f"\n{'='*80}")
+            print(f"PROCESANDO AÑO {año}")
+            print(f"{'='*80}")
             
-            datos_resultado[tematica][año] = {
-                'encabezados': datos['encabezados'],
-                'datos': datos['datos'],
-                'total_filas': datos['total_filas'],
-                'tipo_tabla': estructura_tabla['tipo'],
-                'hoja': nombre_hoja
-            }
+            archivo_año = os.path.join(directorio_data, f'{año}.xlsx')
+            
+            if not os.path.exists(archivo_año):
+                print(f"⚠ {archivo_año} no existe, saltando...")
+                resumen_años[año] = {'procesadas': 0, 'error': 'Archivo no existe'}
+                continue
+            
+            print(f"✓ Procesando {año}.xlsx...")
             
-            temáticas_procesadas += 1
-            total_filas_año += datos['total_filas']
+            _, tablas_año = next(resultados)
+            tablas_año = iter(tablas_año)
             
-            print(f"  [{temáticas_procesadas:2d}] {tematica[:50]}... ({datos['total_filas']:6d} filas)")
+            temáticas_procesadas = 0
+            total_filas_año = 0
+            
+            # Por cada temática
+            for tematica, años_map in mapeo.items():
+                nombre_hoja = años_map.get(año)
+                
+                if not nombre_hoja:
+                    continue
+                
+                # Obtener estructura de esta temática y año
+                if tematica not in estructura or año not in estructura[tematica]:
+                    print(f"  ⚠ No hay estructura para {tematica[:50]}... en {año}")
+                    continue
+                
+                estructura_tabla = estructura[tematica][año]
+                
+                tematicas_extraidas.add(tematica)
+                
+                # Datos reutilizados de la caché o recién extraídos (en el orden del mapeo)
+                if (tematica, año) in en_cache:
+                    previo, entrada = en_cache.pop((tematica, año))
+                    total_filas = (entrada or previo)['total_filas']
+                    rendimiento = "sin cambios, desde caché"
+                    
+                    clave = f"{año}|{nombre_hoja}"
+                    df = None
+                    if sqlite and not base_sqlite.vigente(tematica, año, firmas[clave]):
+                        df = tabla_desde_cache(entrada, previo, estructura_tabla)
+                        guardar_tabla_sqlite(base_sqlite, tematica, año, df, estructura_tabla, nombre_hoja,
+                                             firmas[clave])
+                    if mmap and not almacen_mmap.vigente(tematica, año, firmas[clave]):
+                        if df is None:
+                            df = tabla_desde_cache(entrada, previo, estructura_tabla)
+                        guardar_tabla_mmap(almacen_mmap, tematica, año, df, nombre_hoja, firmas[clave])
+                else:
+                    datos, rendimiento = next(tablas_año)
+                    total_filas = datos['total_filas']
+                    clave = f"{año}|{nombre_hoja}"
+                    if 'error' in datos:
+                        manifiesto.olvidar('extraer_datos', clave)
+                    else:
+                        manifiesto.registrar('extraer_datos', clave, firmas[clave])
+                    
+                    previo = {
+                        'encabezados': datos['encabezados'],
+                        'datos': datos['datos'],
+                        'total_filas': datos['total_filas'],
+                        'tipo_tabla': estructura_tabla['tipo'],
+                        'hoja': nombre_hoja
+                    }
+                    
+                    # Cada tabla se escribe en su propio archivo en cuanto se extrae
+                    entrada = None
+                    df = None
+                    if exportar_columnar or sqlite or mmap:
+                        df = tabla_tipada(año, datos, estructura_tabla, nombre_hoja)
+                    if exportar_columnar:
+                        entrada = escritura.enviar(guardar_tabla_columnar, tematica, año, datos, estructura_tabla,
+                                                   nombre_hoja, df)
+                    if sqlite:
+                        guardar_tabla_sqlite(base_sqlite, tematica, año, df, estructura_tabla, nombre_hoja,
+                                             None if 'error' in datos else firmas[clave])
+                    if mmap:
+                        guardar_tabla_mmap(almacen_mmap, tematica, año, df, nombre_hoja,
+                                           None if 'error' in datos else firmas[clave])
+                
+                if exportar_json:
+                    escritor.agregar(tematica, año, previo)
+                if exportar_columnar:
+                    indice.setdefault(tematica, {})[año] = entrada
+                if sqlite:
+                    exportadas_sqlite.append((tematica, año))
+                if mmap:
+                    exportadas_mmap.append((tematica, año))
+                
+                temáticas_procesadas += 1
+                total_filas_año += total_filas
+                
+                print(f"  [{temáticas_procesadas:2d}] {tematica[:50]}... ({total_filas:6d} filas, {rendimiento})")
+            
+            resumen_años[año] = {
+                'procesadas': temáticas_procesadas,
+                'total_filas': total_filas_año
+            }
         
-        resumen_años[año] = {
-            'procesadas': temáticas_procesadas,
-            'total_filas': total_filas_año
-        }
-    
-    # Guardar resultado
-    print(f"\n{'='*80}")
-    print("GUARDANDO RESULTADO")
-    print(f"{'='*80}")
-    
-    with open(datos_json, 'w', encoding='utf-8') as f:
-        json.dump(datos_resultado, f, ensure_ascii=False, indent=2)
+        # Guardar resultado
+        print(f"\n{'='*80}")
+        print("GUARDANDO RESULTADO")
+        print(f"{'='*80}")
+        
+        if exportar_columnar:
+            escritura.cerrar()
+            indice = {tematica: {año: resultado_escritura(entrada) for año, entrada in años_indice.items()}
+                      for tematica, años_indice in indice.items()}
+            with perfilado.etapa('guardar_indice'):
+                guardar_indice(indice)
+                limpiar_huerfanos(indice)
+            print(f"\n✓ Datos columnares ({formato_disponible()}) guardados en: {DIRECTORIO_COLUMNAR}/")
+        
+        if exportar_json:
+            with perfilado.etapa('guardar_json'):
+                escritor.cerrar()
+            print(f"\n✓ Datos guardados en: {datos_json}")
+        
+        if sqlite:
+            base_sqlite.conservar(exportadas_sqlite)
+            base_sqlite.cerrar()
+            print(f"\n✓ Base SQLite guardada en: {RUTA_SQLITE}")
+        
+        if mmap:
+            almacen_mmap.conservar(exportadas_mmap)
+            almacen_mmap.guardar_indice()
+            print(f"\n✓ Tablas mapeables (np.memmap) guardadas en: {DIRECTORIO_MMAP}/")
+    except BaseException:
+        # Una falla a mitad de camino no deja .partes/.tmp de datos_completos ni escrituras en curso
+        if escritor is not None:
+            escritor.descartar()
+        if escritura is not None:
+            escritura.descartar()
+        if base_sqlite is not None:
+            base_sqlite.cerrar()
+        raise
     
-    print(f"\n✓ Datos guardados en: {datos_json}")
+    manifiesto.guardar()
     
     # Resumen
     print(f"\n{'='*80}")
@@ -200,11 +559,11 @@ def main():
             else:
                 print(f"  {año}: {info['procesadas']} temáticas, {info['total_filas']:,} filas totales")
     
-    total_temáticas = len(datos_resultado)
+    total_temáticas = len(tematicas_extraidas)
     total_filas_general = sum(
-        len(datos_resultado[t][a]['datos'])
-        for t in datos_resultado
-        for a in datos_resultado[t]
+        info['total_filas']
+        for info in resumen_años.values()
+        if 'error' not in info
     )
     
     print(f"\nTotal temáticas: {total_temáticas}")
@@ -214,5 +573,38 @@ def main():
     print("PROCESO COMPLETADO")
     print(f"{'='*80}")
 
+def agregar_argumentos(parser):
+    """Opciones de línea de comandos (las usa también defunciones.py datos)"""
+    parser.add_argument('--workers', type=int, default=1, help="Procesos en paralelo (por defecto 1, en serie)")
+    parser.add_argument('--por-hoja', action='store_true', help="Repartir por (año, hoja) en lugar de por año")
+    parser.add_argument('--forzar', action='store_true', help="Ignorar la caché y reprocesar todas las hojas")
+    parser.add_argument('--formato', choices=['columnar', 'json', 'ambos'], default='columnar',
+                        help="Salida: archivos columnares por tabla, datos_completos.json o ambos")
+    parser.add_argument('--json-modo', choices=['indentado', 'compacto', 'jsonl'], default='indentado',
+                        help="Formato de datos_completos: JSON indentado, JSON compacto o JSON Lines (.jsonl)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Medir cada etapa y guardar data/json/perfil_extraer_datos.json")
+    parser.add_argument('--profile-etapa', default=None,
+                        help="Además perfilar con cProfile una etapa (carga_libro, leer_filas, tipar_tabla, ...)")
+    parser.add_argument('--sqlite', action='store_true',
+                        help="Exportar además cada tabla a la base SQLite de data/sqlite (ver AlmacenSQLite)")
+    parser.add_argument('--mmap', action='store_true',
+                        help="Exportar además cada tabla a data/mmap para abrirla con np.memmap (ver AlmacenMmap)")
+    parser.add_argument('--lector', choices=LECTORES, default='openpyxl',
+                        help="Lector de los libros: openpyxl (referencia) o rapido (XML directo, solo valores)")
+
+def ejecutar(args):
+    """Corre el script con los argumentos ya interpretados"""
+    if args.profile or args.profile_etapa:
+        perfilado.activar(args.profile_etapa)
+    
+    main(workers=args.workers, por_hoja=args.por_hoja, forzar=args.forzar, formato=args.formato,
+         modo_json=args.json_modo, sqlite=args.sqlite, lector=args.lector, mmap=args.mmap)
+    
+    if perfilado.activo():
+        perfilado.guardar_reporte('data/json/perfil_extraer_datos.json', 'extraer_datos')
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Extrae los datos de todas las tablas mapeadas")
+    agregar_argumentos(parser)
+    ejecutar(parser.parse_args())
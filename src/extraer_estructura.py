@@ -1,12 +1,54 @@
-import openpyxl
-from openpyxl.utils import get_column_letter
+import argparse
 import json
 import os
 from pathlib import Path
 
-def detectar_tipo_encabezado(ws):
+import perfilado
+from sesion_libros import LECTORES, SesionLibros
+from paralelo import ejecutar_por_año
+from cache_build import ManifiestoBuild, cargar_json_previo
+from huellas_encabezado import CacheHuellas, cambios_de_diseño, estructura_guardada, huella_bloque
+
+# Columnas que se revisan en las filas de encabezado (8 y 9)
+MAX_COL_ENCABEZADO = 99
+
+def leer_bloque_encabezados(ws, max_col=MAX_COL_ENCABEZADO):
+    """
+    Lee una sola vez el bloque de encabezados de la hoja: filas 8 y 9 como
+    listas de valores (índice 0 = columna A) y las celdas combinadas
+    horizontales de la fila 8 como {columna: valor de la combinada}.
+    
+    El resto del análisis de encabezados trabaja sobre este bloque en memoria.
+    """
+    filas = list(ws.iter_rows(min_row=8, max_row=9, max_col=max_col, values_only=True))
+    filas += [()] * (2 - len(filas))
+    fila8, fila9 = [list(fila) + [None] * (max_col - len(fila)) for fila in filas]
+    
+    # Mapear celdas combinadas (las hojas read_only no las exponen)
+    rangos = ws.merged_cells.ranges if hasattr(ws, 'merged_cells') else ()
+    combinadas = {}
+    for rango_combinado in rangos:
+        min_col = rango_combinado.min_col
+        max_col_rango = rango_combinado.max_col
+        
+        # Si es una celda combinada horizontal en fila 8
+        if rango_combinado.min_row == 8 and rango_combinado.max_row == 8 and min_col < max_col_rango:
+            valor = fila8[min_col - 1] if min_col <= max_col else None
+            for col in range(min_col, max_col_rango + 1):
+                combinadas[col] = valor
+    
+    return {'fila8': fila8, 'fila9': fila9, 'combinadas': combinadas}
+
+def _como_bloque(ws_o_bloque):
+    """Acepta una hoja (se lee su bloque) o un bloque ya leído"""
+    if isinstance(ws_o_bloque, dict):
+        return ws_o_bloque
+    return leer_bloque_encabezados(ws_o_bloque)
+
+def detectar_tipo_encabezado(bloque):
     """
     Detecta si una tabla tiene encabezados simples (1 fila) o agrupados (2 filas).
+    Recibe el bloque de leer_bloque_encabezados (o la hoja directamente).
     
     Lógica:
     - AGRUPADA: Fila 9 tiene sub-encabezados donde fila 8 está vacío (estructura multi-nivel)
@@ -14,17 +56,15 @@ def detectar_tipo_encabezado(ws):
     
     Retorna: 'simple' o 'agrupado'
     """
+    bloque = _como_bloque(bloque)
+    
     # Contar patrones
     fila8_con_valor = 0
     fila9_con_valor = 0
     fila9_donde_fila8_vacio = 0  # Columnas donde 8 es vacío pero 9 tiene valor (sub-encabezados)
     fila9_donde_fila8_lleno = 0   # Columnas donde ambas tienen valor
     
-    for col in range(1, 100):
-        col_letter = get_column_letter(col)
-        valor8 = ws[f'{col_letter}8'].value
-        valor9 = ws[f'{col_letter}9'].value
-        
+    for col, (valor8, valor9) in enumerate(zip(bloque['fila8'], bloque['fila9']), 1):
         if valor8:
             fila8_con_valor += 1
         
@@ -54,29 +94,25 @@ def detectar_tipo_encabezado(ws):
         # Fila 9 probablemente tiene datos, no sub-encabezados
         return 'simple'
 
-def leer_encabezados_simple(ws, max_col=50):
+def leer_encabezados_simple(bloque, max_col=50):
     """
     Lee encabezados de una tabla simple (una sola fila).
     Los encabezados están SOLO en fila 8.
     Fila 9 contiene datos, no sub-encabezados.
     """
+    bloque = _como_bloque(bloque)
     encabezados = []
     
-    col = 1
-    while col <= max_col:
-        col_letter = get_column_letter(col)
-        valor = ws[f'{col_letter}8'].value
-        
+    for valor in bloque['fila8'][:max_col]:
         if not valor:
             break
         
         nombre_col = str(valor).strip()
         encabezados.append(nombre_col)
-        col += 1
     
     return encabezados
 
-def leer_encabezados_agrupado(ws, max_col=50):
+def leer_encabezados_agrupado(bloque, max_col=50):
     """
     Lee encabezados de una tabla agrupada (dos filas).
     Los encabezados principales están en fila 8, los sub-encabezados en fila 9.
@@ -86,32 +122,16 @@ def leer_encabezados_agrupado(ws, max_col=50):
     - Si tiene subtítulos reales: {"titulo_principal": ["subtitulo1", "subtitulo2"]}
     - Si NO tiene subtítulos: {"titulo_principal": "solo_nombre"}
     """
+    bloque = _como_bloque(bloque)
+    mapa_combinadas = bloque['combinadas']
+    
     estructura = {}
     grupos_con_subtitulos = {}  # Para rastrear si un grupo tiene subtítulos reales
     
-    # Mapear celdas combinadas
-    mapa_combinadas = {}
-    for rango_combinado in ws.merged_cells.ranges:
-        min_col = rango_combinado.min_col
-        max_col_rango = rango_combinado.max_col
-        min_row = rango_combinado.min_row
-        max_row = rango_combinado.max_row
-        
-        # Si es una celda combinada horizontal en fila 8
-        if min_row == 8 and max_row == 8 and min_col < max_col_rango:
-            col_letter = get_column_letter(min_col)
-            valor = ws[f'{col_letter}8'].value
-            
-            for col in range(min_col, max_col_rango + 1):
-                mapa_combinadas[col] = valor
-    
     # Leer encabezados
-    col = 1
-    while col <= max_col:
-        col_letter = get_column_letter(col)
-        
-        valor_principal = ws[f'{col_letter}8'].value
-        valor_secundario = ws[f'{col_letter}9'].value
+    for col in range(1, max_col + 1):
+        valor_principal = bloque['fila8'][col - 1]
+        valor_secundario = bloque['fila9'][col - 1]
         
         # Aplicar mapeo de combinadas
         if col in mapa_combinadas:
@@ -142,8 +162,6 @@ def leer_encabezados_agrupado(ws, max_col=50):
                     estructura["sin_grupo"] = []
                     grupos_con_subtitulos["sin_grupo"] = True
                 estructura["sin_grupo"].append(valor_secundario)
-        
-        col += 1
     
     # Convertir a strings aquellos grupos sin subtítulos reales
     resultado = {}
@@ -157,51 +175,115 @@ def leer_encabezados_agrupado(ws, max_col=50):
     
     return resultado
 
-def extraer_estructura_tabla(archivo_excel, nombre_hoja):
+def extraer_estructura_tabla(archivo_excel, nombre_hoja, sesion=None, lector='openpyxl', estructuras=None):
     """
     Extrae solo la estructura (encabezados) de una tabla.
     Detecta automáticamente si es simple o agrupada.
     
+    Si se pasa una `SesionLibros`, la hoja se toma del libro ya abierto
+    en lugar de volver a cargar el archivo. Sin sesión, el libro se abre
+    con `lector` ('openpyxl' o 'rapido', ver LibroXLSX).
+    
+    estructuras: {huella: estructura} de CacheHuellas; si la huella del
+    bloque de encabezados ya está, se reutiliza sin volver a detectar.
+    
     Retorna para SIMPLE: 
         {'tipo': 'simple', 'encabezados': [...], 'total_columnas': int}
     
     Retorna para AGRUPADO:
         {'tipo': 'agrupado', 'encabezados': {titulo: [subtitulos] o titulo: "nombre"}, 'total_columnas': int}
     """
+    estructura, _ = estructura_y_huella(archivo_excel, nombre_hoja, sesion, lector, estructuras)
+    return estructura
+
+def estructura_y_huella(archivo_excel, nombre_hoja, sesion=None, lector='openpyxl', estructuras=None):
+    """
+    Como extraer_estructura_tabla, pero retorna (estructura, huella) para
+    registrar la huella del diseño en CacheHuellas (huella None si hubo error).
+    """
+    sesion_propia = sesion is None
+    if sesion_propia:
+        sesion = SesionLibros(lector=lector)
+    
     try:
-        wb = openpyxl.load_workbook(archivo_excel, data_only=True)
-        ws = wb[nombre_hoja]
+        ws = sesion.hoja(archivo_excel, nombre_hoja)
         
-        # Detectar tipo de encabezado
-        tipo = detectar_tipo_encabezado(ws)
+        # Una sola lectura de las filas 8-9 y de las celdas combinadas
+        with perfilado.etapa('leer_encabezados', archivo_excel, nombre_hoja):
+            bloque = leer_bloque_encabezados(ws)
+            huella = huella_bloque(bloque)
         
-        # Leer encabezados según tipo
-        if tipo == 'agrupado':
-            encabezados = leer_encabezados_agrupado(ws)
-            # Contar total de columnas (suma de subtítulos + strings individuales)
-            total_cols = 0
-            for valor in encabezados.values():
-                if isinstance(valor, list):
-                    total_cols += len(valor)
-                else:  # Es un string sin subtítulos
-                    total_cols += 1
-        else:
-            encabezados = leer_encabezados_simple(ws)
-            total_cols = len(encabezados)
+        # Mismo diseño que una hoja ya detectada: no hace falta volver a detectar
+        guardada = estructura_guardada(estructuras, huella)
+        if guardada is not None:
+            return guardada, huella
         
-        wb.close()
+        with perfilado.etapa('detectar_encabezados', archivo_excel, nombre_hoja):
+            # Detectar tipo de encabezado
+            tipo = detectar_tipo_encabezado(bloque)
+            
+            # Leer encabezados según tipo
+            if tipo == 'agrupado':
+                encabezados = leer_encabezados_agrupado(bloque)
+                # Contar total de columnas (suma de subtítulos + strings individuales)
+                total_cols = 0
+                for valor in encabezados.values():
+                    if isinstance(valor, list):
+                        total_cols += len(valor)
+                    else:  # Es un string sin subtítulos
+                        total_cols += 1
+            else:
+                encabezados = leer_encabezados_simple(bloque)
+                total_cols = len(encabezados)
         
         return {
             'tipo': tipo,
             'encabezados': encabezados,
             'total_columnas': total_cols
-        }
+        }, huella
     
     except Exception as e:
         print(f"  Error: {e}")
-        return {'tipo': 'error', 'encabezados': {}, 'error': str(e), 'total_columnas': 0}
+        return {'tipo': 'error', 'encabezados': {}, 'error': str(e), 'total_columnas': 0}, None
+    
+    finally:
+        if sesion_propia:
+            sesion.cerrar()
 
-def main():
+def extraer_estructuras_hojas(archivo_año, hojas, lector='openpyxl', estructuras=None):
+    """
+    Extrae la estructura de varias hojas de un mismo libro, abriéndolo una vez.
+    Se ejecuta en el proceso actual o en un worker del pool.
+    
+    hojas: lista de (temática, nombre_hoja)
+    lector: 'openpyxl' o 'rapido' (ver SesionLibros)
+    estructuras: {huella: estructura} conocidas (ver CacheHuellas)
+    Retorna: lista de (temática, estructura, huella) en el mismo orden
+    """
+    resultado = []
+    
+    with SesionLibros(lector=lector) as sesion:
+        if hojas:
+            with perfilado.etapa('carga_libro', archivo_año):
+                try:
+                    sesion.libro(archivo_año)
+                except Exception:
+                    pass  # El error se reporta en cada hoja
+        
+        for tematica, nombre_hoja in hojas:
+            estructura, huella = estructura_y_huella(archivo_año, nombre_hoja, sesion, estructuras=estructuras)
+            estructura['hoja'] = nombre_hoja
+            resultado.append((tematica, estructura, huella))
+    
+    return resultado
+
+def main(workers=1, por_hoja=False, forzar=False, lector='openpyxl'):
+    """
+    workers: procesos para repartir los años (1 = en serie)
+    por_hoja: repartir cada (año, hoja) como tarea independiente
+    forzar: ignorar la caché incremental y reprocesar todas las hojas
+    lector: 'openpyxl' (referencia) o 'rapido' (LibroXLSX)
+    """
     # Configuración
     directorio_data = 'data/defunciones'
     mapeo_json = 'data/json/mapeo_hojas.json'
@@ -226,7 +308,45 @@ def main():
     estructura_resultado = {}
     resumen_años = {}
     
-    # Por cada año
+    # Caché incremental: firma por (año, hoja) = contenido del archivo + hoja
+    manifiesto = ManifiestoBuild()
+    # Y por diseño: las hojas que sí se leen reutilizan la estructura si sus
+    # encabezados (filas 8-9 y combinadas) ya se vieron en otro año
+    huellas = CacheHuellas()
+    reutilizadas = 0
+    estructura_previa = {} if forzar else cargar_json_previo(estructura_json)
+    firmas = {}
+    en_cache = {}
+    
+    # Preparar el trabajo de cada año: [(temática, hoja)] pendientes, en el orden del mapeo
+    trabajos = []
+    for año in años_procesamiento:
+        archivo_año = os.path.join(directorio_data, f'{año}.xlsx')
+        if not os.path.exists(archivo_año):
+            continue
+        
+        hash_año = manifiesto.hash_archivo(archivo_año)
+        hojas = []
+        for tematica, años_map in mapeo.items():
+            nombre_hoja = años_map.get(año)
+            if not nombre_hoja:
+                continue
+            
+            clave = f"{año}|{nombre_hoja}"
+            firmas[clave] = manifiesto.firma(hash_año, nombre_hoja)
+            previa = estructura_previa.get(tematica, {}).get(año)
+            
+            if (previa and previa.get('hoja') == nombre_hoja and previa['tipo'] != 'error'
+                    and manifiesto.vigente('extraer_estructura', clave, firmas[clave])):
+                en_cache[(tematica, año)] = previa
+            else:
+                hojas.append((tematica, nombre_hoja))
+        
+        trabajos.append((año, archivo_año, hojas))
+    
+    resultados = ejecutar_por_año(extraer_estructuras_hojas, trabajos, workers, por_hoja,
+                                  extra=(lector, huellas.estructuras))
+    
     for año in años_procesamiento:
         print(f"\n{'='*70}")
         print(f"PROCESANDO AÑO {año}")
@@ -241,6 +361,9 @@ def main():
         
         print(f"✓ Procesando {año}.xlsx...")
         
+        _, estructuras = next(resultados)
+        estructuras = iter(estructuras)
+        
         temáticas_procesadas = 0
         agrupadas_año = 0
         simples_año = 0
@@ -253,14 +376,24 @@ def main():
             if not nombre_hoja:
                 continue
             
+            # Estructura reutilizada de la caché o recién extraída
+            if (tematica, año) in en_cache:
+                estructura = en_cache[(tematica, año)]
+            else:
+                _, estructura, huella = next(estructuras)
+                if huella in huellas.estructuras:
+                    reutilizadas += 1
+                huellas.registrar(tematica, año, nombre_hoja, huella, estructura)
+                clave = f"{año}|{nombre_hoja}"
+                if estructura['tipo'] == 'error':
+                    manifiesto.olvidar('extraer_estructura', clave)
+                else:
+                    manifiesto.registrar('extraer_estructura', clave, firmas[clave])
+            
             # Inicializar entrada para temática si no existe
             if tematica not in estructura_resultado:
                 estructura_resultado[tematica] = {}
             
-            # Extraer estructura
-            estructura = extraer_estructura_tabla(archivo_año, nombre_hoja)
-            
-            estructura['hoja'] = nombre_hoja
             estructura_resultado[tematica][año] = estructura
             
             temáticas_procesadas += 1
@@ -285,10 +418,18 @@ def main():
     print("GUARDANDO RESULTADO")
     print("=" * 70)
     
-    with open(estructura_json, 'w', encoding='utf-8') as f:
-        json.dump(estructura_resultado, f, ensure_ascii=False, indent=2)
+    with perfilado.etapa('guardar_json'):
+        with open(estructura_json, 'w', encoding='utf-8') as f:
+            json.dump(estructura_resultado, f, ensure_ascii=False, indent=2)
+    
+    manifiesto.guardar()
+    huellas.guardar()
     
     print(f"\n✓ Estructura guardada en: {estructura_json}")
+    if en_cache:
+        print(f"  ({len(en_cache)} hojas sin cambios reutilizadas desde caché)")
+    if reutilizadas:
+        print(f"  ({reutilizadas} hojas con un diseño de encabezados ya visto, sin volver a detectar)")
     
     # Resumen general
     print("\n" + "=" * 70)
@@ -310,6 +451,12 @@ def main():
     print(f"\nTotal temáticas: {total_temáticas}")
     print(f"Años completos: {total_años_completos}/{len(años_procesamiento)}")
     
+    # Cambios de diseño de encabezados entre años consecutivos
+    cambios = cambios_de_diseño(estructura_resultado)
+    print(f"\nCambios de diseño de encabezados: {len(cambios)}")
+    for tematica, año_anterior, año, descripcion in cambios:
+        print(f"  🔀 {tematica[:50]}... {año_anterior} → {año}: {descripcion}")
+    
     print("\n" + "=" * 70)
     print("PROCESO COMPLETADO")
     print("=" * 70)
@@ -320,5 +467,29 @@ def leer_estructura_columnas(archivo_excel, nombre_hoja):
     """
     pass
 
+def agregar_argumentos(parser):
+    """Opciones de línea de comandos (las usa también defunciones.py estructura)"""
+    parser.add_argument('--workers', type=int, default=1, help="Procesos en paralelo (por defecto 1, en serie)")
+    parser.add_argument('--por-hoja', action='store_true', help="Repartir por (año, hoja) en lugar de por año")
+    parser.add_argument('--forzar', action='store_true', help="Ignorar la caché y reprocesar todas las hojas")
+    parser.add_argument('--profile', action='store_true',
+                        help="Medir cada etapa y guardar data/json/perfil_extraer_estructura.json")
+    parser.add_argument('--profile-etapa', default=None,
+                        help="Además perfilar con cProfile una etapa (carga_libro, leer_encabezados, ...)")
+    parser.add_argument('--lector', choices=LECTORES, default='openpyxl',
+                        help="Lector de los libros: openpyxl (referencia) o rapido (XML directo, solo valores)")
+
+def ejecutar(args):
+    """Corre el script con los argumentos ya interpretados"""
+    if args.profile or args.profile_etapa:
+        perfilado.activar(args.profile_etapa)
+    
+    main(workers=args.workers, por_hoja=args.por_hoja, forzar=args.forzar, lector=args.lector)
+    
+    if perfilado.activo():
+        perfilado.guardar_reporte('data/json/perfil_extraer_estructura.json', 'extraer_estructura')
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Extrae la estructura de columnas de cada temática y año")
+    agregar_argumentos(parser)
+    ejecutar(parser.parse_args())
@@ -1,39 +1,93 @@
-import openpyxl
+import argparse
 import json
 import os
-from difflib import SequenceMatcher
 
-def generar_mapeo_hojas():
+import perfilado
+from sesion_libros import SesionLibros
+from paralelo import ejecutar_en_orden
+from cache_build import ManifiestoBuild, cargar_json_previo
+from indice_titulos import IndiceTitulos
+
+# Las 16 temáticas que buscamos
+TEMATICAS = [
+    "Defunciones por año de ocurrencia, según departamento de residencia del difunto(a)",
+    "Defunciones por departamento de ocurrencia, según departamento de residencia del difunto(a)",
+    "Defunciones por sexo, según departamento de residencia del difunto(a) y edades simples",
+    "Defunciones por sexo, según departamento de residencia del difunto(a) y grupos de edad",
+    "Defunciones por sexo, según departamento de residencia del difunto(a), estado civil y grupos de edad",
+    "Defunciones por sexo, según edad y causas de muerte",
+    "Defunciones por sexo, según departamento de residencia del difunto(a) y causas de muerte",
+    "Defunciones por tipo de certificación, según departamento y municipio de residencia del difunto(a)",
+    "Defunciones por tipo de asistencia recibida, según departamento y municipio de residencia del difunto(a)",
+    "Defunciones por lugar de ocurrencia, según departamento y municipio de residencia del difunto(a)",
+    "Defunciones infantiles, neonatales y postneonatales por sexo, según departamento de residencia y edad",
+    "Defunciones neonatales por sexo, según edad y causas de muerte",
+    "Defunciones postneonatales por sexo, según edad y causas de muerte",
+    "Defunciones por mes de ocurrencia,  según día de ocurrencia",
+    "Defunciones por pueblo de pertenencia del difunto(a), según departamento de residencia",
+    "Defunciones por causas externas y sexo, según departamento de residencia del difunto(a)"
+]
+
+def titulos_de_libro(wb):
+    """
+    Lee el título (fila 6, columna A) de cada hoja de un libro ya abierto.
+    Solo se recorren las primeras 6 filas de cada hoja.
+    
+    Retorna: {nombre_hoja: titulo}
+    """
+    titulos_por_hoja = {}
+    
+    for nombre_hoja in wb.sheetnames:
+        try:
+            ws = wb[nombre_hoja]
+            # Leer título en fila 6 (iter_rows se detiene ahí)
+            fila = next(ws.iter_rows(min_row=6, max_row=6, max_col=1, values_only=True), (None,))
+            titulo = fila[0] if fila else None
+            if titulo:
+                titulos_por_hoja[nombre_hoja] = str(titulo).strip()
+        except:
+            pass
+    
+    return titulos_por_hoja
+
+def leer_titulos_hojas(archivo):
+    """
+    Lee el título (fila 6, columna A) de cada hoja de un libro.
+    El libro se abre en modo read_only y de cada hoja solo se recorren
+    las primeras 6 filas, sin cargar el resto.
+    Se ejecuta en el proceso actual o en un worker del pool.
+    
+    Retorna: ({nombre_hoja: titulo}, error o None)
+    """
+    try:
+        with SesionLibros(read_only=True) as sesion:
+            with perfilado.etapa('carga_libro', archivo):
+                wb = sesion.libro(archivo)
+            with perfilado.etapa('leer_titulos', archivo):
+                return titulos_de_libro(wb), None
+    
+    except Exception as e:
+        return {}, str(e)
+
+def generar_mapeo_hojas(workers=1, forzar=False):
     """
     Lee todos los archivos Excel y crea un mapeo de cada temática
     a la hoja correspondiente en cada año.
     
-    Lee el título de las tablas directamente desde la fila 6 de cada hoja.
+    Lee el título de las tablas directamente desde la fila 6 de cada hoja
+    y lo busca en un índice de trigramas (ver IndiceTitulos).
+    Con workers > 1 los libros de cada año se leen en paralelo.
+    Los años cuyo archivo no cambió desde la última ejecución se toman
+    del mapeo anterior (ver ManifiestoBuild), salvo con forzar=True.
+    
     Guarda: mapeo_hojas.json
     Estructura: {temática: {año: nombre_hoja}}
     """
     
-    # Las 16 temáticas que buscamos
-    tematicas = [
-        "Defunciones por año de ocurrencia, según departamento de residencia del difunto(a)",
-        "Defunciones por departamento de ocurrencia, según departamento de residencia del difunto(a)",
-        "Defunciones por sexo, según departamento de residencia del difunto(a) y edades simples",
-        "Defunciones por sexo, según departamento de residencia del difunto(a) y grupos de edad",
-        "Defunciones por sexo, según departamento de residencia del difunto(a), estado civil y grupos de edad",
-        "Defunciones por sexo, según edad y causas de muerte",
-        "Defunciones por sexo, según departamento de residencia del difunto(a) y causas de muerte",
-        "Defunciones por tipo de certificación, según departamento y municipio de residencia del difunto(a)",
-        "Defunciones por tipo de asistencia recibida, según departamento y municipio de residencia del difunto(a)",
-        "Defunciones por lugar de ocurrencia, según departamento y municipio de residencia del difunto(a)",
-        "Defunciones infantiles, neonatales y postneonatales por sexo, según departamento de residencia y edad",
-        "Defunciones neonatales por sexo, según edad y causas de muerte",
-        "Defunciones postneonatales por sexo, según edad y causas de muerte",
-        "Defunciones por mes de ocurrencia,  según día de ocurrencia",
-        "Defunciones por pueblo de pertenencia del difunto(a), según departamento de residencia",
-        "Defunciones por causas externas y sexo, según departamento de residencia del difunto(a)"
-    ]
+    tematicas = TEMATICAS
     
     directorio_data = 'data/defunciones'
+    mapeo_json = 'data/json/mapeo_hojas.json'
     años = ['2015', '2016', '2017', '2018', '2019', '2020', '2021', '2022', '2023', '2024']
     
     print("=" * 80)
@@ -42,63 +96,73 @@ def generar_mapeo_hojas():
     
     mapeo_resultado = {tematica: {} for tematica in tematicas}
     
-    def similitud_texto(texto1, texto2):
-        """Calcula la similitud entre dos textos (0-1)"""
-        return SequenceMatcher(None, texto1.lower(), texto2.lower()).ratio()
+    # Caché incremental: firma = contenido del archivo + lista de temáticas
+    manifiesto = ManifiestoBuild()
+    mapeo_previo = {} if forzar else cargar_json_previo(mapeo_json)
+    firmas = {}
+    en_cache = set()
+    
+    archivos = [(os.path.join(directorio_data, f'{año}.xlsx'),) for año in años]
+    for año, (archivo,) in zip(años, archivos):
+        if not os.path.exists(archivo):
+            continue
+        firmas[año] = manifiesto.firma(manifiesto.hash_archivo(archivo), tematicas)
+        if (manifiesto.vigente('generar_mapeo', año, firmas[año])
+                and all(año in mapeo_previo.get(tematica, {}) for tematica in tematicas)):
+            en_cache.add(año)
+    
+    # Leer los títulos de cada año pendiente (en paralelo si workers > 1)
+    pendientes = [(archivo,) for año, (archivo,) in zip(años, archivos) if año in firmas and año not in en_cache]
+    titulos_años = ejecutar_en_orden(leer_titulos_hojas, pendientes, workers)
     
     # Por cada año
-    for año in años:
+    for año, (archivo,) in zip(años, archivos):
         print(f"\n{'='*80}")
         print(f"PROCESANDO {año}")
         print(f"{'='*80}")
         
-        archivo = os.path.join(directorio_data, f'{año}.xlsx')
-        
         if not os.path.exists(archivo):
             print(f"⚠ {archivo} no existe")
             continue
         
-        try:
-            wb = openpyxl.load_workbook(archivo, data_only=True)
-            nombres_hojas = wb.sheetnames
+        if año in en_cache:
+            print(f"✓ Archivo: {año}.xlsx (sin cambios, desde caché)")
             
-            print(f"✓ Archivo: {año}.xlsx")
-            
-            # Leer los títulos de cada hoja (fila 6, columna A)
-            titulos_por_hoja = {}
-            for nombre_hoja in nombres_hojas:
-                try:
-                    ws = wb[nombre_hoja]
-                    titulo = ws['A6'].value  # Leer título en fila 6
-                    if titulo:
-                        titulos_por_hoja[nombre_hoja] = str(titulo).strip()
-                except:
-                    pass
-            
-            wb.close()
-            
-            # Por cada temática
             for idx, tematica in enumerate(tematicas, 1):
-                hoja_encontrada = None
-                
-                # Buscar por similitud de título
-                mejores = []
-                for nombre_hoja, titulo in titulos_por_hoja.items():
-                    similitud = similitud_texto(tematica, titulo)
-                    if similitud >= 0.75:  # Umbral alto
-                        mejores.append((similitud, nombre_hoja))
-                
-                if mejores:
-                    mejores.sort(reverse=True)
-                    hoja_encontrada = mejores[0][1]
-                
-                # Si se encuentra, guardar
+                hoja_encontrada = mapeo_previo[tematica][año]
+                mapeo_resultado[tematica][año] = hoja_encontrada
                 if hoja_encontrada:
-                    mapeo_resultado[tematica][año] = hoja_encontrada
                     print(f"    [{idx:2d}] ✓ {tematica[:60]}... → {hoja_encontrada}")
                 else:
-                    mapeo_resultado[tematica][año] = None
                     print(f"    [{idx:2d}] ❌ {tematica[:60]}... → NO ENCONTRADO")
+            continue
+        
+        try:
+            titulos_por_hoja, error = next(titulos_años)
+            if error:
+                manifiesto.olvidar('generar_mapeo', año)
+                raise Exception(error)
+            
+            print(f"✓ Archivo: {año}.xlsx")
+            
+            with perfilado.etapa('buscar_hojas', archivo):
+                # Índice de trigramas sobre los títulos del año
+                indice_titulos = IndiceTitulos(titulos_por_hoja)
+                
+                # Por cada temática
+                for idx, tematica in enumerate(tematicas, 1):
+                    # Buscar por similitud de título (umbral alto: 0.75)
+                    hoja_encontrada = indice_titulos.mejor_hoja(tematica, umbral=0.75)
+                    
+                    # Si se encuentra, guardar
+                    if hoja_encontrada:
+                        mapeo_resultado[tematica][año] = hoja_encontrada
+                        print(f"    [{idx:2d}] ✓ {tematica[:60]}... → {hoja_encontrada}")
+                    else:
+                        mapeo_resultado[tematica][año] = None
+                        print(f"    [{idx:2d}] ❌ {tematica[:60]}... → NO ENCONTRADO")
+            
+            manifiesto.registrar('generar_mapeo', año, firmas[año])
         
         except Exception as e:
             print(f"❌ Error procesando {año}: {e}")
@@ -108,8 +172,11 @@ def generar_mapeo_hojas():
     print("GUARDANDO MAPEO")
     print(f"{'='*80}")
     
-    with open('data/json/mapeo_hojas.json', 'w', encoding='utf-8') as f:
-        json.dump(mapeo_resultado, f, ensure_ascii=False, indent=2)
+    with perfilado.etapa('guardar_json'):
+        with open(mapeo_json, 'w', encoding='utf-8') as f:
+            json.dump(mapeo_resultado, f, ensure_ascii=False, indent=2)
+    
+    manifiesto.guardar()
     
     print(f"\n✓ Mapeo guardado en: mapeo_hojas.json")
     
@@ -144,5 +211,26 @@ def generar_mapeo_hojas():
     print("PROCESO COMPLETADO")
     print(f"{'='*80}")
 
+def agregar_argumentos(parser):
+    """Opciones de línea de comandos (las usa también defunciones.py mapeo)"""
+    parser.add_argument('--workers', type=int, default=1, help="Procesos en paralelo (por defecto 1, en serie)")
+    parser.add_argument('--forzar', action='store_true', help="Ignorar la caché y reprocesar todos los años")
+    parser.add_argument('--profile', action='store_true',
+                        help="Medir cada etapa y guardar data/json/perfil_generar_mapeo.json")
+    parser.add_argument('--profile-etapa', default=None,
+                        help="Además perfilar con cProfile una etapa (carga_libro, leer_titulos, buscar_hojas, ...)")
+
+def ejecutar(args):
+    """Corre el script con los argumentos ya interpretados"""
+    if args.profile or args.profile_etapa:
+        perfilado.activar(args.profile_etapa)
+    
+    generar_mapeo_hojas(workers=args.workers, forzar=args.forzar)
+    
+    if perfilado.activo():
+        perfilado.guardar_reporte('data/json/perfil_generar_mapeo.json', 'generar_mapeo')
+
 if __name__ == "__main__":
-    generar_mapeo_hojas()
+    parser = argparse.ArgumentParser(description="Genera el mapeo de temáticas a hojas por año")
+    agregar_argumentos(parser)
+    ejecutar(parser.parse_args())
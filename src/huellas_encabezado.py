@@ -0,0 +1,144 @@
+import copy
+import hashlib
+import json
+import os
+
+RUTA_HUELLAS = 'data/json/huellas_encabezado.json'
+
+# Cambiar si cambia la detección de encabezados (invalida las estructuras guardadas)
+VERSION_HUELLAS = 1
+
+def _recortar(fila):
+    """Fila sin las celdas vacías del final"""
+    fin = len(fila)
+    while fin and fila[fin - 1] is None:
+        fin -= 1
+    return list(fila[:fin])
+
+def huella_bloque(bloque):
+    """
+    Firma barata del diseño de encabezados de una hoja: los valores de las
+    filas 8 y 9 y las celdas combinadas del bloque de
+    leer_bloque_encabezados. Dos hojas con la misma huella producen la
+    misma estructura, así que la detección puede saltarse.
+    """
+    partes = [
+        VERSION_HUELLAS,
+        _recortar(bloque['fila8']),
+        _recortar(bloque['fila9']),
+        sorted(bloque['combinadas'].items())
+    ]
+    texto = json.dumps(partes, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+class CacheHuellas:
+    """
+    Caché de estructuras de encabezado por huella de diseño.
+    
+    Guarda en un JSON pequeño la estructura detectada para cada huella y
+    la huella de cada (temática, año), de modo que una hoja cuyo diseño
+    no cambió respecto de cualquier año anterior reutiliza la estructura
+    sin volver a detectar tipo ni leer encabezados.
+    
+    Estructura:
+        {
+            'version': int,
+            'estructuras': {huella: {'tipo', 'encabezados', 'total_columnas'}},
+            'hojas': {temática: {año: {'hoja': str, 'huella': str}}}
+        }
+    """
+    
+    def __init__(self, ruta=RUTA_HUELLAS):
+        self.ruta = ruta
+        self.datos = {'version': VERSION_HUELLAS, 'estructuras': {}, 'hojas': {}}
+        
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+                if datos.get('version') == VERSION_HUELLAS:
+                    self.datos = datos
+            except (OSError, ValueError):
+                # Caché dañada: se vuelve a detectar todo
+                pass
+    
+    @property
+    def estructuras(self):
+        """{huella: estructura}; se puede pasar a los workers (solo lectura)"""
+        return self.datos['estructuras']
+    
+    def registrar(self, tematica, año, nombre_hoja, huella, estructura):
+        """Guarda la huella de (temática, año) y, si es nueva, su estructura"""
+        if huella is None or estructura['tipo'] == 'error':
+            return
+        
+        self.datos['estructuras'].setdefault(huella, {
+            'tipo': estructura['tipo'],
+            'encabezados': estructura['encabezados'],
+            'total_columnas': estructura['total_columnas']
+        })
+        self.datos['hojas'].setdefault(tematica, {})[año] = {'hoja': nombre_hoja, 'huella': huella}
+    
+    def guardar(self):
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        
+        with open(self.ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.datos, f, ensure_ascii=False, indent=2)
+
+def estructura_guardada(estructuras, huella):
+    """Copia de la estructura guardada para `huella`, o None"""
+    estructura = estructuras.get(huella) if estructuras else None
+    return copy.deepcopy(estructura) if estructura is not None else None
+
+def _diseño(estructura):
+    # Los encabezados se comparan en orden (el orden de las columnas importa)
+    encabezados = estructura['encabezados']
+    if isinstance(encabezados, dict):
+        encabezados = list(encabezados.items())
+    return estructura['tipo'], encabezados
+
+def describir_cambio(anterior, nueva):
+    """Texto corto con lo que cambió entre dos estructuras de encabezado"""
+    partes = []
+    if anterior['tipo'] != nueva['tipo']:
+        partes.append(f"{anterior['tipo']} → {nueva['tipo']}")
+    if anterior['total_columnas'] != nueva['total_columnas']:
+        partes.append(f"{anterior['total_columnas']} → {nueva['total_columnas']} cols")
+    
+    titulos_antes = list(anterior['encabezados'])
+    titulos_ahora = list(nueva['encabezados'])
+    nuevos = [t for t in titulos_ahora if t not in anterior['encabezados']]
+    quitados = [t for t in titulos_antes if t not in nueva['encabezados']]
+    if nuevos:
+        partes.append("nuevos: " + ", ".join(map(str, nuevos)))
+    if quitados:
+        partes.append("quitados: " + ", ".join(map(str, quitados)))
+    if not nuevos and not quitados and titulos_antes != titulos_ahora:
+        partes.append("orden de columnas")
+    if not partes:
+        partes.append("subtítulos")
+    
+    return "; ".join(partes)
+
+def cambios_de_diseño(estructura_resultado):
+    """
+    Cambios de diseño de encabezados entre años consecutivos de cada
+    temática, a partir de {temática: {año: estructura}} (el formato de
+    estructura_completa.json). Las estructuras con error se ignoran.
+    
+    Retorna: lista de (temática, año_anterior, año, descripción)
+    """
+    cambios = []
+    for tematica, por_año in estructura_resultado.items():
+        anterior = año_anterior = None
+        for año in sorted(por_año):
+            estructura = por_año[año]
+            if estructura['tipo'] == 'error':
+                continue
+            if anterior is not None and _diseño(anterior) != _diseño(estructura):
+                cambios.append((tematica, año_anterior, año, describir_cambio(anterior, estructura)))
+            anterior, año_anterior = estructura, año
+    
+    return cambios
@@ -0,0 +1,88 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+# Si la hoja k+1 queda a menos de este margen del mejor Dice, el corte en k
+# no separa a los candidatos y se compara con todas las hojas
+MARGEN_DICE = 0.1
+
+def normalizar_titulo(texto):
+    """Minúsculas, sin acentos y con espacios simples"""
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', texto.lower()).strip()
+
+def trigramas(texto):
+    """Conjunto de trigramas de caracteres de un texto ya normalizado"""
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def similitud_texto(texto1, texto2):
+    """Calcula la similitud entre dos textos (0-1)"""
+    return SequenceMatcher(None, texto1.lower(), texto2.lower()).ratio()
+
+class IndiceTitulos:
+    """
+    Índice invertido de trigramas sobre los títulos de las hojas de un libro.
+    
+    Para cada temática se preseleccionan las `k` hojas con más trigramas en
+    común (coeficiente de Dice) y solo sobre esas se calcula SequenceMatcher,
+    que sigue decidiendo el umbral y el desempate. El costo deja de crecer
+    como temáticas × hojas al sumar más publicaciones.
+    
+    Con títulos casi repetidos (muchas hojas empatadas o cerca del mejor
+    Dice) el orden de Dice no anticipa el de SequenceMatcher, así que se
+    vuelve a comparar con todas las hojas, como sin índice.
+    """
+    
+    def __init__(self, titulos_por_hoja):
+        self.titulos = dict(titulos_por_hoja)
+        self._trigramas = {}
+        self._invertido = defaultdict(list)
+        
+        for nombre_hoja, titulo in self.titulos.items():
+            grams = trigramas(normalizar_titulo(titulo))
+            self._trigramas[nombre_hoja] = len(grams)
+            for gram in grams:
+                self._invertido[gram].append(nombre_hoja)
+    
+    def candidatos(self, consulta, k=5):
+        """Las `k` hojas más parecidas a `consulta` según el índice: [(dice, nombre_hoja)]"""
+        return self._puntajes(consulta)[:k]
+    
+    def _puntajes(self, consulta):
+        # Dice de todas las hojas con algún trigrama en común, de mayor a menor
+        grams = trigramas(normalizar_titulo(consulta))
+        comunes = Counter()
+        for gram in grams:
+            comunes.update(self._invertido.get(gram, ()))
+        
+        puntajes = [
+            (2 * n / (len(grams) + self._trigramas[nombre_hoja]), nombre_hoja)
+            for nombre_hoja, n in comunes.items()
+        ]
+        puntajes.sort(reverse=True)
+        return puntajes
+    
+    def mejor_hoja(self, tematica, umbral=0.75, k=5):
+        """
+        Hoja cuyo título corresponde a `tematica`, o None si ninguna supera el umbral.
+        Entre los candidatos gana la mayor similitud de SequenceMatcher.
+        """
+        puntajes = self._puntajes(tematica)
+        if len(puntajes) > k and puntajes[k][0] >= puntajes[0][0] - MARGEN_DICE:
+            hojas = list(self.titulos)
+        else:
+            hojas = [nombre_hoja for _, nombre_hoja in puntajes[:k]]
+        
+        mejores = []
+        for nombre_hoja in hojas:
+            similitud = similitud_texto(tematica, self.titulos[nombre_hoja])
+            if similitud >= umbral:
+                mejores.append((similitud, nombre_hoja))
+        
+        if not mejores:
+            return None
+        
+        mejores.sort(reverse=True)
+        return mejores[0][1]
@@ -0,0 +1,402 @@
+import argparse
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+NS_HOJA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PAQUETE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+FILA = NS_HOJA + 'row'
+CELDA = NS_HOJA + 'c'
+VALOR = NS_HOJA + 'v'
+TEXTO_EN_LINEA = NS_HOJA + 'is'
+TEXTO = NS_HOJA + 't'
+TRAMO = NS_HOJA + 'r'
+CADENA = NS_HOJA + 'si'
+
+# Bytes que se leen del inicio de la hoja para buscar <dimension>
+BYTES_CABECERA = 64 * 1024
+
+PATRON_DIMENSION = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+PATRON_COMBINADA = re.compile(rb'<(?:\w+:)?mergeCell\s+ref="([A-Z]+)(\d+):([A-Z]+)(\d+)"')
+
+_columnas = {}
+
+def indice_columna(letras):
+    """'A' -> 1, 'AB' -> 28 (con caché: las mismas letras se repiten en cada fila)"""
+    indice = _columnas.get(letras)
+    if indice is None:
+        indice = 0
+        for letra in letras:
+            indice = indice * 26 + ord(letra) - 64
+        _columnas[letras] = indice
+    return indice
+
+def _numero(texto):
+    # Igual que openpyxl: float si tiene punto o exponente, si no int
+    if '.' in texto or 'E' in texto or 'e' in texto:
+        return float(texto)
+    return int(texto)
+
+def _texto(nodo):
+    # Texto de un <si> o <is>: <t> directo más los <t> de cada tramo <r> (sin <rPh>)
+    partes = []
+    directo = nodo.find(TEXTO)
+    if directo is not None and directo.text:
+        partes.append(directo.text)
+    for tramo in nodo.iter(TRAMO):
+        texto = tramo.find(TEXTO)
+        if texto is not None and texto.text:
+            partes.append(texto.text)
+    return ''.join(partes)
+
+class RangoCombinado:
+    """Rango de celdas combinadas con la misma interfaz que el de openpyxl (min/max de fila y columna)"""
+    
+    __slots__ = ('min_row', 'min_col', 'max_row', 'max_col')
+    
+    def __init__(self, min_row, min_col, max_row, max_col):
+        self.min_row, self.min_col, self.max_row, self.max_col = min_row, min_col, max_row, max_col
+
+class _CeldasCombinadas:
+    __slots__ = ('ranges',)
+    
+    def __init__(self, rangos):
+        self.ranges = rangos
+
+class HojaXLSX:
+    """
+    Hoja de un LibroXLSX. Expone lo que usan los scripts de una hoja de
+    openpyxl en modo read_only: iter_rows(..., values_only=True), max_row,
+    max_column y reset_dimensions(); además merged_cells.ranges, que se lee
+    del final del XML de la hoja sin parsear las celdas.
+    
+    Cada iter_rows recorre el XML de la hoja desde el inicio y se detiene
+    en cuanto pasa `max_row`.
+    """
+    
+    def __init__(self, libro, titulo, ruta):
+        self.parent = libro
+        self.title = titulo
+        self._ruta = ruta
+        self._dimensiones = None
+        self._combinadas = None
+    
+    def _leer_dimensiones(self):
+        if self._dimensiones is None:
+            with self.parent._zip.open(self._ruta) as f:
+                cabecera = f.read(BYTES_CABECERA)
+            coincidencia = PATRON_DIMENSION.search(cabecera)
+            if coincidencia is None:
+                self._dimensiones = (None, None)
+            else:
+                col_fin, fila_fin = coincidencia.group(3, 4) if coincidencia.group(3) else coincidencia.group(1, 2)
+                self._dimensiones = (int(fila_fin), indice_columna(col_fin.decode('ascii')))
+        return self._dimensiones
+    
+    @property
+    def max_row(self):
+        return self._leer_dimensiones()[0]
+    
+    @property
+    def max_column(self):
+        return self._leer_dimensiones()[1]
+    
+    def reset_dimensions(self):
+        """Ignora las dimensiones declaradas (iter_rows lee hasta la última fila)"""
+        self._dimensiones = (None, None)
+    
+    @property
+    def merged_cells(self):
+        if self._combinadas is None:
+            self._combinadas = _CeldasCombinadas(self._leer_combinadas())
+        return self._combinadas
+    
+    def _leer_combinadas(self):
+        # <mergeCells> va después de <sheetData>: se busca en los bytes sin parsear el XML
+        resto = b''
+        encontrado = False
+        with self.parent._zip.open(self._ruta) as f:
+            while True:
+                bloque = f.read(1024 * 1024)
+                if not bloque:
+                    break
+                resto += bloque
+                if not encontrado:
+                    posicion = resto.find(b'mergeCells')
+                    if posicion < 0:
+                        resto = resto[-32:]
+                        continue
+                    encontrado = True
+                    resto = resto[max(0, posicion - 16):]
+        
+        return [
+            RangoCombinado(int(fila_ini), indice_columna(col_ini.decode('ascii')),
+                           int(fila_fin), indice_columna(col_fin.decode('ascii')))
+            for col_ini, fila_ini, col_fin, fila_fin in PATRON_COMBINADA.findall(resto)
+        ]
+    
+    def _filas(self):
+        """Genera (número de fila, [(columna, valor)]) en el orden del XML"""
+        libro = self.parent
+        cadenas = libro.cadenas
+        fechas, duraciones = libro.formatos_fecha
+        
+        numero_fila = 0
+        with libro._zip.open(self._ruta) as f:
+            for _, nodo in iterparse(f):
+                if nodo.tag != FILA:
+                    continue
+                
+                numero = nodo.get('r')
+                numero_fila = int(numero) if numero else numero_fila + 1
+                columna = 0
+                celdas = []
+                for celda in nodo:
+                    if celda.tag != CELDA:
+                        continue
+                    referencia = celda.get('r')
+                    columna = indice_columna(referencia.rstrip('0123456789')) if referencia else columna + 1
+                    
+                    tipo = celda.get('t', 'n')
+                    if tipo == 'inlineStr':
+                        en_linea = celda.find(TEXTO_EN_LINEA)
+                        valor = _texto(en_linea) if en_linea is not None else None
+                    else:
+                        valor = celda.findtext(VALOR) or None
+                        if valor is not None:
+                            if tipo == 'n':
+                                valor = _numero(valor)
+                                estilo = celda.get('s')
+                                if estilo and int(estilo) in fechas:
+                                    try:
+                                        valor = from_excel(valor, libro.epoca, timedelta=int(estilo) in duraciones)
+                                    except (OverflowError, ValueError):
+                                        valor = '#VALUE!'
+                            elif tipo == 's':
+                                valor = cadenas[int(valor)]
+                            elif tipo == 'b':
+                                valor = bool(int(valor))
+                            elif tipo == 'd':
+                                valor = from_ISO8601(valor)
+                    celdas.append((columna, valor))
+                
+                nodo.clear()
+                yield numero_fila, celdas
+    
+    def iter_rows(self, min_row=None, max_row=None, min_col=None, max_col=None, values_only=True):
+        """
+        Filas como tuplas de valores, con las mismas reglas que openpyxl en
+        modo read_only: las filas y celdas que faltan en el XML se completan
+        con None y, con `max_col`, todas las filas tienen el mismo largo.
+        Solo entrega valores (values_only=True).
+        """
+        if not values_only:
+            raise ValueError("HojaXLSX solo entrega valores (values_only=True)")
+        
+        min_col = min_col or 1
+        min_row = min_row or 1
+        max_col = max_col or self.max_column
+        max_row = max_row or self.max_row
+        return self._por_fila(min_row, max_row, min_col, max_col)
+    
+    def _por_fila(self, min_row, max_row, min_col, max_col):
+        # Igual que openpyxl: sin max_col las filas faltantes son [] (y las vacías del XML, ())
+        vacia = [] if max_col is None else (None,) * (max_col + 1 - min_col)
+        
+        siguiente = min_row
+        numero_fila = 1
+        for numero_fila, celdas in self._filas():
+            if max_row is not None and numero_fila > max_row:
+                break
+            
+            while siguiente < numero_fila:
+                siguiente += 1
+                yield vacia
+            
+            if siguiente <= numero_fila:
+                siguiente += 1
+                if not celdas and not max_col:
+                    yield ()
+                    continue
+                ultima = max_col or celdas[-1][0]
+                valores = [None] * (ultima + 1 - min_col)
+                for columna, valor in celdas:
+                    if min_col <= columna <= ultima:
+                        valores[columna - min_col] = valor
+                yield tuple(valores)
+        
+        if max_row is not None and max_row < numero_fila:
+            for _ in range(siguiente, max_row + 1):
+                yield vacia
+
+class LibroXLSX:
+    """
+    Lector mínimo de .xlsx que saca los valores directamente del zip, sin
+    el modelo de objetos de openpyxl (ni Cell ni estilos por celda):
+    sharedStrings.xml y cada hoja se recorren con iterparse.
+    
+    Equivale a openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    para lo que usan los scripts (sheetnames, wb[nombre], iter_rows con
+    values_only, max_row, merged_cells.ranges). De los estilos solo se leen
+    los formatos de fecha, para convertir esas celdas en datetime igual que
+    openpyxl. openpyxl sigue siendo el lector de referencia; para comparar
+    ambos sobre un libro: python src/libro_xlsx.py data/defunciones/2019.xlsx
+    
+    `archivo` es una ruta o un archivo binario (p. ej. BytesIO).
+    """
+    
+    def __init__(self, archivo):
+        self._zip = zipfile.ZipFile(archivo)
+        self._cadenas = None
+        self._formatos_fecha = None
+        self._hojas = {}
+        self.epoca = CALENDAR_WINDOWS_1900
+        
+        relaciones = self._relaciones('xl/workbook.xml')
+        self._rutas_partes = {tipo.rsplit('/', 1)[-1]: ruta for ruta, tipo in relaciones.values()}
+        
+        self._rutas_hojas = {}
+        with self._zip.open('xl/workbook.xml') as f:
+            for _, nodo in iterparse(f):
+                if nodo.tag == NS_HOJA + 'workbookPr' and nodo.get('date1904') in ('1', 'true'):
+                    self.epoca = CALENDAR_MAC_1904
+                elif nodo.tag == NS_HOJA + 'sheet':
+                    ruta, _ = relaciones.get(nodo.get(NS_REL + 'id'), (None, None))
+                    if ruta is not None and ruta in self._zip.NameToInfo:
+                        self._rutas_hojas[nodo.get('name')] = ruta
+    
+    def _relaciones(self, parte):
+        """{id: (ruta dentro del zip, tipo)} de las relaciones de una parte"""
+        directorio, nombre = posixpath.split(parte)
+        ruta_rels = posixpath.join(directorio, '_rels', nombre + '.rels')
+        relaciones = {}
+        if ruta_rels not in self._zip.NameToInfo:
+            return relaciones
+        
+        with self._zip.open(ruta_rels) as f:
+            for _, nodo in iterparse(f):
+                if nodo.tag == NS_PAQUETE + 'Relationship':
+                    destino = nodo.get('Target')
+                    if destino.startswith('/'):
+                        ruta = destino.lstrip('/')
+                    else:
+                        ruta = posixpath.normpath(posixpath.join(directorio, destino))
+                    relaciones[nodo.get('Id')] = (ruta, nodo.get('Type', ''))
+        return relaciones
+    
+    @property
+    def sheetnames(self):
+        return list(self._rutas_hojas)
+    
+    def __getitem__(self, nombre):
+        if nombre not in self._rutas_hojas:
+            raise KeyError(f"Worksheet {nombre} does not exist.")
+        if nombre not in self._hojas:
+            self._hojas[nombre] = HojaXLSX(self, nombre, self._rutas_hojas[nombre])
+        return self._hojas[nombre]
+    
+    @property
+    def cadenas(self):
+        """Tabla de textos compartidos (se lee una vez, al primer uso)"""
+        if self._cadenas is None:
+            self._cadenas = []
+            ruta = self._rutas_partes.get('sharedStrings')
+            if ruta in self._zip.NameToInfo:
+                with self._zip.open(ruta) as f:
+                    for _, nodo in iterparse(f):
+                        if nodo.tag == CADENA:
+                            self._cadenas.append(_texto(nodo).replace('x005F_', ''))
+                            nodo.clear()
+        return self._cadenas
+    
+    @property
+    def formatos_fecha(self):
+        """(estilos con formato de fecha, estilos con formato de duración), como en openpyxl"""
+        if self._formatos_fecha is None:
+            fechas, duraciones = set(), set()
+            ruta = self._rutas_partes.get('styles')
+            if ruta in self._zip.NameToInfo:
+                personalizados = {}
+                with self._zip.open(ruta) as f:
+                    en_celdas = False
+                    indice = 0
+                    for evento, nodo in iterparse(f, events=('start', 'end')):
+                        if nodo.tag == NS_HOJA + 'numFmt' and evento == 'end':
+                            personalizados[int(nodo.get('numFmtId'))] = nodo.get('formatCode')
+                        elif nodo.tag == NS_HOJA + 'cellXfs':
+                            en_celdas = evento == 'start'
+                        elif nodo.tag == NS_HOJA + 'xf' and en_celdas and evento == 'end':
+                            id_formato = int(nodo.get('numFmtId', 0))
+                            formato = personalizados.get(id_formato) or builtin_format_code(id_formato)
+                            if formato and is_date_format(formato):
+                                fechas.add(indice)
+                            if formato and is_timedelta_format(formato):
+                                duraciones.add(indice)
+                            indice += 1
+            self._formatos_fecha = (fechas, duraciones)
+        return self._formatos_fecha
+    
+    def close(self):
+        self._zip.close()
+
+def comparar_con_openpyxl(archivo):
+    """
+    Lee todas las hojas de `archivo` con LibroXLSX y con openpyxl
+    (read_only para los valores, completo para las combinadas) y retorna
+    la lista de diferencias (vacía si coinciden).
+    """
+    import openpyxl
+    
+    diferencias = []
+    rapido = LibroXLSX(archivo)
+    referencia = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    completo = openpyxl.load_workbook(archivo, data_only=True)
+    
+    try:
+        if rapido.sheetnames != referencia.sheetnames:
+            diferencias.append(('sheetnames', rapido.sheetnames, referencia.sheetnames))
+        
+        for nombre in referencia.sheetnames:
+            hoja, hoja_ref = rapido[nombre], referencia[nombre]
+            if hoja.max_row != hoja_ref.max_row:
+                diferencias.append((nombre, 'max_row', hoja.max_row, hoja_ref.max_row))
+            
+            for args in ({'values_only': True}, {'min_row': 8, 'max_row': 9, 'max_col': 99, 'values_only': True},
+                         {'min_row': 10, 'max_col': 12, 'values_only': True}):
+                filas = list(hoja.iter_rows(**args))
+                filas_ref = list(hoja_ref.iter_rows(**args))
+                if filas != filas_ref:
+                    primera = next((i for i, (a, b) in enumerate(zip(filas, filas_ref)) if a != b),
+                                   min(len(filas), len(filas_ref)))
+                    diferencias.append((nombre, f'iter_rows {args}', f'fila {primera}', len(filas), len(filas_ref)))
+            
+            combinadas = sorted((r.min_row, r.min_col, r.max_row, r.max_col) for r in hoja.merged_cells.ranges)
+            combinadas_ref = sorted((r.min_row, r.min_col, r.max_row, r.max_col)
+                                    for r in completo[nombre].merged_cells.ranges)
+            if combinadas != combinadas_ref:
+                diferencias.append((nombre, 'merged_cells', len(combinadas), len(combinadas_ref)))
+    finally:
+        rapido.close()
+        referencia.close()
+    
+    return diferencias
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el lector rápido de .xlsx con openpyxl")
+    parser.add_argument('archivos', nargs='+', help="Libros .xlsx a comparar")
+    args = parser.parse_args()
+    
+    for archivo in args.archivos:
+        diferencias = comparar_con_openpyxl(archivo)
+        if diferencias:
+            print(f"❌ {archivo}: {len(diferencias)} diferencias")
+            for diferencia in diferencias[:20]:
+                print(f"   {diferencia}")
+        else:
+            print(f"✓ {archivo}: mismos valores, dimensiones y celdas combinadas que openpyxl")
@@ -0,0 +1,105 @@
+import argparse
+import os
+import random
+
+from openpyxl import Workbook
+
+from generar_mapeo import TEMATICAS
+
+# Fila del título y filas de encabezado que asumen los scripts
+FILA_TITULO = 6
+FILA_ENCABEZADO = 8
+FILA_SUBENCABEZADO = 9
+FILA_DATOS = 10
+
+def _escribir_hoja(ws, titulo, agrupada, filas, columnas, rng):
+    """
+    Escribe una hoja con la forma de los cuadros del INE:
+    título en A6, encabezados en filas 8-9 y datos desde la fila 10,
+    seguidos de una fila vacía y la nota de fuente.
+    
+    Las tablas agrupadas llevan la primera columna combinada en vertical
+    (A8:A9) y un grupo combinado en horizontal sobre el resto de columnas,
+    con los subtítulos en la fila 9.
+    """
+    ws.cell(1, 1, "Instituto Nacional de Estadística")
+    ws.cell(FILA_TITULO, 1, titulo)
+    ws.cell(FILA_ENCABEZADO, 1, "Departamento")
+    
+    if agrupada:
+        ws.merge_cells(start_row=FILA_ENCABEZADO, start_column=1, end_row=FILA_SUBENCABEZADO, end_column=1)
+        ws.cell(FILA_ENCABEZADO, 2, "Total")
+        ws.merge_cells(start_row=FILA_ENCABEZADO, start_column=2, end_row=FILA_SUBENCABEZADO, end_column=2)
+        if columnas > 2:
+            ws.cell(FILA_ENCABEZADO, 3, "Grupos de edad")
+            if columnas > 3:
+                ws.merge_cells(start_row=FILA_ENCABEZADO, start_column=3,
+                               end_row=FILA_ENCABEZADO, end_column=columnas)
+            for col in range(3, columnas + 1):
+                ws.cell(FILA_SUBENCABEZADO, col, f"{(col - 3) * 5}-{(col - 3) * 5 + 4}")
+    else:
+        for col in range(2, columnas + 1):
+            ws.cell(FILA_ENCABEZADO, col, "Total" if col == 2 else f"Categoría {col - 2}")
+    
+    for fila in range(FILA_DATOS, FILA_DATOS + filas):
+        ws.cell(fila, 1, f"Departamento {fila - FILA_DATOS + 1}")
+        for col in range(2, columnas + 1):
+            # Los cuadros del INE usan '-' para "sin casos"
+            ws.cell(fila, col, '-' if rng.random() < 0.1 else rng.randint(1, 5000))
+    
+    ws.cell(FILA_DATOS + filas + 1, 1, "Fuente: Instituto Nacional de Estadística (INE), datos sintéticos")
+
+def generar_libro(archivo, filas=500, columnas=12, hojas=None, semilla=0):
+    """
+    Genera un <año>.xlsx sintético con una hoja por temática de TEMATICAS.
+    
+    filas: filas de datos por hoja
+    columnas: columnas por hoja (la primera es la dimensión)
+    hojas: total de hojas; las que superan las 16 temáticas llevan títulos
+           que no corresponden a ninguna (como los cuadros extra del INE)
+    semilla: semilla del generador, para libros reproducibles
+    """
+    rng = random.Random(semilla)
+    hojas = len(TEMATICAS) if hojas is None else hojas
+    columnas = max(columnas, 2)
+    
+    wb = Workbook()
+    wb.remove(wb.active)
+    
+    for idx in range(hojas):
+        ws = wb.create_sheet(f"Cuadro {idx + 1}")
+        if idx < len(TEMATICAS):
+            titulo = TEMATICAS[idx]
+        else:
+            titulo = f"Nacimientos por grupo de edad de la madre, cuadro complementario {idx + 1}"
+        _escribir_hoja(ws, titulo, idx % 2 == 1, filas, columnas, rng)
+    
+    directorio = os.path.dirname(archivo)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    wb.save(archivo)
+
+def generar_libros(directorio, años, filas=500, columnas=12, hojas=None, semilla=0):
+    """
+    Genera un libro sintético por año en `directorio` (<año>.xlsx).
+    Retorna la lista de archivos generados.
+    """
+    archivos = []
+    for desplazamiento, año in enumerate(años):
+        archivo = os.path.join(directorio, f'{año}.xlsx')
+        generar_libro(archivo, filas, columnas, hojas, semilla + desplazamiento)
+        archivos.append(archivo)
+    return archivos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera libros Excel sintéticos con el formato del INE")
+    parser.add_argument('--directorio', default='data/defunciones', help="Carpeta de salida")
+    parser.add_argument('--años', nargs='+', default=['2015', '2016'], help="Años a generar")
+    parser.add_argument('--filas', type=int, default=500, help="Filas de datos por hoja")
+    parser.add_argument('--columnas', type=int, default=12, help="Columnas por hoja")
+    parser.add_argument('--hojas', type=int, default=len(TEMATICAS), help="Hojas por libro")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla del generador")
+    args = parser.parse_args()
+    
+    for archivo in generar_libros(args.directorio, args.años, args.filas, args.columnas, args.hojas, args.semilla):
+        print(f"✓ {archivo}")
@@ -0,0 +1,42 @@
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows no tiene el módulo resource
+    resource = None
+
+def memoria_pico_mb():
+    """
+    Retorna la memoria residente máxima (RSS pico) del proceso en MB,
+    o None si la plataforma no permite consultarla.
+    """
+    if resource is None:
+        return None
+    
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS reporta bytes
+    if sys.platform == 'darwin':
+        return pico / (1024 * 1024)
+    return pico / 1024
+
+def memoria_actual_mb():
+    """
+    Retorna la memoria residente actual (RSS) del proceso en MB,
+    o None si la plataforma no permite consultarla (solo Linux).
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def formatear_rendimiento(filas, segundos):
+    """Texto corto con filas/segundo y RSS pico para los logs por tabla"""
+    filas_seg = filas / segundos if segundos > 0 else 0
+    pico = memoria_pico_mb()
+    texto = f"{filas_seg:,.0f} filas/s"
+    if pico is not None:
+        texto += f", RSS pico {pico:,.1f} MB"
+    return texto
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import perfilado
+import segundo_plano
+
+def ejecutar_en_orden(funcion, tareas, workers=1):
+    """
+    Ejecuta `funcion(*tarea)` para cada tarea y genera los resultados
+    en el mismo orden de `tareas`.
+    
+    Con workers <= 1 todo corre en el proceso actual (sin pool) y, si el
+    primer elemento de las tareas es la ruta de un libro, el libro de la
+    tarea siguiente se lee del disco mientras se procesa la actual
+    (ver segundo_plano.anticipar).
+    Con workers > 1 las tareas se reparten en un ProcessPoolExecutor;
+    `funcion` debe estar definida a nivel de módulo para poder enviarse.
+    
+    Con el perfilado activo, los registros de cada worker vuelven junto
+    con su resultado y se suman a los del proceso principal.
+    """
+    if workers <= 1 or len(tareas) <= 1:
+        archivos = [tarea[0] for tarea in tareas if tarea and _es_libro(tarea[0])]
+        with segundo_plano.anticipar(archivos if len(archivos) > 1 else []):
+            for tarea in tareas:
+                yield funcion(*tarea)
+        return
+    
+    if perfilado.activo():
+        configuracion = perfilado.configuracion()
+        with ProcessPoolExecutor(max_workers=workers) as ejecutor:
+            futuros = [ejecutor.submit(perfilado.ejecutar_perfilado, configuracion, funcion, *tarea)
+                       for tarea in tareas]
+            for futuro in futuros:
+                resultado, exportado = futuro.result()
+                perfilado.incorporar(exportado)
+                yield resultado
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as ejecutor:
+        futuros = [ejecutor.submit(funcion, *tarea) for tarea in tareas]
+        for futuro in futuros:
+            yield futuro.result()
+
+def _es_libro(valor):
+    return isinstance(valor, str) and valor.endswith('.xlsx') and os.path.exists(valor)
+
+def ejecutar_por_año(funcion, trabajos, workers=1, por_hoja=False, extra=()):
+    """
+    Reparte el trabajo de cada año y devuelve los resultados agrupados por año.
+    
+    trabajos: lista de (año, archivo, items) en el orden deseado.
+    `funcion(archivo, items)` debe retornar una lista alineada con `items`.
+    
+    Con por_hoja=True cada item se envía como tarea separada
+    (funcion(archivo, [item])), útil cuando hay pocos años y muchos núcleos.
+    Los argumentos de `extra` se agregan al final de cada llamada
+    (funcion(archivo, items, *extra)).
+    
+    Genera (año, resultados) en el orden de `trabajos`, de modo que la
+    salida combinada es idéntica a una ejecución en serie.
+    """
+    tareas = []
+    for año, archivo, items in trabajos:
+        if por_hoja:
+            tareas.extend((archivo, [item], *extra) for item in items)
+        else:
+            tareas.append((archivo, items, *extra))
+    
+    resultados = ejecutar_en_orden(funcion, tareas, workers)
+    
+    for año, archivo, items in trabajos:
+        if por_hoja:
+            yield año, [next(resultados)[0] for _ in items]
+        else:
+            yield año, next(resultados)
@@ -0,0 +1,237 @@
+import cProfile
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from metricas import memoria_actual_mb, memoria_pico_mb
+
+class _Estado:
+    """
+    Estado del perfilado en el proceso actual (uno por proceso). Las etapas
+    pueden correr en varios hilos (p. ej. escribir_columnar en el hilo de
+    EscritorSegundoPlano): las listas compartidas se tocan con `cerrojo` y
+    cada hilo usa su propio cProfile.Profile (en `hilo`).
+    """
+    
+    def __init__(self):
+        self.activo = False
+        self.etapa_cprofile = None
+        self.registros = []
+        self.inicio = None
+        self.perfiles = []
+        self.archivos_perfil = []
+        self.cerrojo = threading.Lock()
+        self.hilo = threading.local()
+
+_estado = _Estado()
+
+def activar(etapa_cprofile=None):
+    """
+    Activa la instrumentación en este proceso (y descarta registros previos).
+    
+    etapa_cprofile: nombre de una etapa (p. ej. 'leer_filas') cuyas
+                    ejecuciones se perfilan además con cProfile
+    """
+    global _estado
+    _estado = _Estado()
+    _estado.activo = True
+    _estado.etapa_cprofile = etapa_cprofile
+    _estado.inicio = time.perf_counter()
+
+def activo():
+    return _estado.activo
+
+def configuracion():
+    """Configuración a replicar en los workers del pool"""
+    return {'etapa_cprofile': _estado.etapa_cprofile}
+
+def año_de_archivo(archivo):
+    """'data/defunciones/2019.xlsx' -> '2019'"""
+    return os.path.splitext(os.path.basename(archivo))[0] if archivo else None
+
+def _iniciar_cprofile():
+    """
+    Activa el cProfile del hilo actual y lo retorna, o None si ya hay otro
+    activo (desde Python 3.12 cProfile es uno solo para todo el proceso).
+    """
+    hilo = _estado.hilo
+    if getattr(hilo, 'perfil', None) is None:
+        hilo.perfil = cProfile.Profile()
+        hilo.usado = False
+    
+    try:
+        hilo.perfil.enable()
+    except ValueError:
+        return None
+    
+    if not hilo.usado:
+        hilo.usado = True
+        with _estado.cerrojo:
+            _estado.perfiles.append(hilo.perfil)
+    return hilo.perfil
+
+def _perfiles_cprofile():
+    """Los cProfile.Profile usados por los hilos de este proceso"""
+    with _estado.cerrojo:
+        return list(_estado.perfiles)
+
+@contextmanager
+def etapa(nombre, archivo=None, hoja=None, año=None):
+    """
+    Mide una etapa: tiempo real, tiempo de CPU del hilo que la ejecuta y
+    variación de memoria (RSS, del proceso).
+    El registro se entrega al bloque para que pueda anotar las filas:
+        
+        with perfilado.etapa('leer_filas', archivo, hoja) as registro:
+            ...
+            registro['filas'] = len(datos)
+    
+    El año se toma del nombre de `archivo` si no se indica `año`.
+    Sin activar() solo se entrega un dict vacío, sin medir nada.
+    """
+    if not _estado.activo:
+        yield {}
+        return
+    
+    registro = {'etapa': nombre, 'año': año or año_de_archivo(archivo), 'hoja': hoja, 'filas': 0}
+    memoria_inicio = memoria_actual_mb()
+    inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+    
+    # Las ejecuciones anidadas de la etapa ya quedan dentro del perfil de la externa
+    perfil = None
+    if nombre == _estado.etapa_cprofile and not getattr(_estado.hilo, 'perfilando', False):
+        perfil = _iniciar_cprofile()
+        _estado.hilo.perfilando = perfil is not None
+    try:
+        yield registro
+    finally:
+        if perfil is not None:
+            perfil.disable()
+            _estado.hilo.perfilando = False
+        
+        memoria_fin = memoria_actual_mb()
+        registro.update({
+            'segundos': time.perf_counter() - inicio,
+            'segundos_cpu': time.thread_time() - inicio_cpu,
+            'memoria_delta_mb': None if memoria_inicio is None else memoria_fin - memoria_inicio,
+            'proceso': os.getpid(),
+            'hilo': threading.current_thread().name
+        })
+        with _estado.cerrojo:
+            _estado.registros.append(registro)
+
+def exportar():
+    """
+    Registros acumulados en este proceso (para enviarlos desde un worker).
+    Si hubo cProfile, sus estadísticas se vuelcan a un archivo temporal.
+    """
+    archivo_perfil = None
+    perfiles = _perfiles_cprofile()
+    if perfiles:
+        descriptor, archivo_perfil = tempfile.mkstemp(prefix='perfil_', suffix='.prof')
+        os.close(descriptor)
+        pstats.Stats(*perfiles).dump_stats(archivo_perfil)
+    
+    with _estado.cerrojo:
+        return {'registros': list(_estado.registros), 'perfil': archivo_perfil}
+
+def incorporar(exportado):
+    """Agrega los registros (y el perfil) que devolvió un worker"""
+    with _estado.cerrojo:
+        _estado.registros.extend(exportado['registros'])
+        if exportado['perfil']:
+            _estado.archivos_perfil.append(exportado['perfil'])
+
+def ejecutar_perfilado(configuracion_worker, funcion, *args):
+    """
+    Ejecuta `funcion(*args)` en un worker con la instrumentación activa.
+    Retorna: (resultado, registros exportados)
+    """
+    activar(configuracion_worker['etapa_cprofile'])
+    resultado = funcion(*args)
+    return resultado, exportar()
+
+def _totales(registros, clave):
+    totales = {}
+    for registro in registros:
+        total = totales.setdefault(registro[clave], {
+            'llamadas': 0, 'segundos': 0.0, 'segundos_cpu': 0.0, 'filas': 0, 'memoria_delta_mb': 0.0
+        })
+        total['llamadas'] += 1
+        total['segundos'] += registro['segundos']
+        total['segundos_cpu'] += registro['segundos_cpu']
+        total['filas'] += registro['filas']
+        total['memoria_delta_mb'] += registro['memoria_delta_mb'] or 0.0
+    return totales
+
+def guardar_reporte(ruta, script):
+    """
+    Escribe el reporte JSON de tiempos en `ruta`:
+    {
+        'script', 'fecha', 'segundos_total', 'rss_pico_mb',
+        'por_etapa': {etapa: totales}, 'por_año': {año: {etapa: totales}},
+        'registros': [{'etapa', 'año', 'hoja', 'segundos', 'segundos_cpu',
+                       'filas', 'memoria_delta_mb', 'proceso', 'hilo'}]
+    }
+    Con cProfile, las estadísticas quedan junto al reporte (.prof y .txt).
+    Las etapas anidadas se suman por separado (sus tiempos se solapan).
+    """
+    with _estado.cerrojo:
+        registros = list(_estado.registros)
+        archivos = list(_estado.archivos_perfil)
+    reporte = {
+        'script': script,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'segundos_total': time.perf_counter() - _estado.inicio,
+        'rss_pico_mb': memoria_pico_mb(),
+        'por_etapa': _totales(registros, 'etapa'),
+        'por_año': {
+            año: _totales([r for r in registros if r['año'] == año], 'etapa')
+            for año in sorted({r['año'] for r in registros if r['año']})
+        },
+        'registros': registros
+    }
+    
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    
+    print(f"\n{'='*80}")
+    print("PERFIL DE TIEMPOS")
+    print(f"{'='*80}\n")
+    
+    etapas = sorted(reporte['por_etapa'].items(), key=lambda item: item[1]['segundos'], reverse=True)
+    for nombre, total in etapas:
+        texto = f"  {nombre:24s} {total['segundos']:8.3f} s  (CPU {total['segundos_cpu']:8.3f} s, " \
+                f"{total['llamadas']:4d} llamadas"
+        if total['filas']:
+            texto += f", {total['filas']:,} filas"
+        print(texto + ")")
+    print(f"\n  Total: {reporte['segundos_total']:.3f} s")
+    print(f"✓ Reporte de tiempos guardado en: {ruta}")
+    
+    # Estadísticas de cProfile (de los hilos del proceso principal y de los workers)
+    fuentes = _perfiles_cprofile() + archivos
+    if fuentes:
+        estadisticas = pstats.Stats(*fuentes)
+        base = os.path.splitext(ruta)[0] + f"_{_estado.etapa_cprofile}"
+        estadisticas.dump_stats(base + '.prof')
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            pstats.Stats(base + '.prof', stream=f).sort_stats('cumulative').print_stats(40)
+        
+        for archivo in archivos:
+            os.remove(archivo)
+        
+        print(f"✓ cProfile de '{_estado.etapa_cprofile}' guardado en: {base}.prof ({base}.txt)")
+    elif _estado.etapa_cprofile:
+        print(f"⚠ La etapa '{_estado.etapa_cprofile}' no se ejecutó; no hay datos de cProfile")
+    
+    return reporte
@@ -0,0 +1,383 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Permite ejecutar como `python src/pipeline.py` o `python -m src.pipeline`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import perfilado
+from sesion_libros import LECTORES, SesionLibros
+from paralelo import ejecutar_en_orden
+from cache_build import ManifiestoBuild, cargar_json_previo
+from indice_titulos import IndiceTitulos
+from metricas import formatear_rendimiento
+from almacen_columnar import (DIRECTORIO_COLUMNAR, VERSION_FORMATO, cargar_indice, formato_disponible,
+                              guardar_indice, limpiar_huerfanos)
+from generar_mapeo import TEMATICAS, titulos_de_libro
+from extraer_estructura import extraer_estructura_tabla
+from extraer_datos import (VERSION_EXTRACCION, extraer_datos_tabla, guardar_tabla_columnar, guardar_tabla_mmap,
+                           guardar_tabla_sqlite, tabla_desde_cache, tabla_tipada)
+from segundo_plano import EscritorSegundoPlano, resultado as resultado_escritura
+from escritor_json import EscritorDatosJSON, cargar_datos_previos, ruta_datos
+
+def procesar_libro(archivo_año, tematicas, lector='openpyxl'):
+    """
+    Procesa un <año>.xlsx en una sola pasada: abre el libro una vez y,
+    para cada temática, busca su hoja por título, extrae la estructura de
+    encabezados y luego las filas de datos.
+    Se ejecuta en el proceso actual o en un worker del pool.
+    lector: 'openpyxl' o 'rapido' (ver SesionLibros)
+    
+    Retorna: {
+        'mapeo': {temática: hoja o None},
+        'tablas': [(temática, estructura, datos, texto_rendimiento)],
+        'error': str o None
+    }
+    """
+    resultado = {'mapeo': {}, 'tablas': [], 'error': None}
+    
+    try:
+        with SesionLibros(lector=lector) as sesion:
+            with perfilado.etapa('carga_libro', archivo_año):
+                wb = sesion.libro(archivo_año)
+            with perfilado.etapa('leer_titulos', archivo_año):
+                indice_titulos = IndiceTitulos(titulos_de_libro(wb))
+            
+            for tematica in tematicas:
+                with perfilado.etapa('buscar_hojas', archivo_año):
+                    nombre_hoja = indice_titulos.mejor_hoja(tematica, umbral=0.75)
+                resultado['mapeo'][tematica] = nombre_hoja
+                
+                if not nombre_hoja:
+                    continue
+                
+                estructura = extraer_estructura_tabla(archivo_año, nombre_hoja, sesion)
+                estructura['hoja'] = nombre_hoja
+                
+                inicio = time.perf_counter()
+                datos = extraer_datos_tabla(archivo_año, nombre_hoja, estructura, sesion)
+                segundos = time.perf_counter() - inicio
+                
+                resultado['tablas'].append(
+                    (tematica, estructura, datos, formatear_rendimiento(datos['total_filas'], segundos)))
+    
+    except Exception as e:
+        resultado['error'] = str(e)
+    
+    return resultado
+
+def main(workers=1, forzar=False, formato='columnar', modo_json='indentado', lector='openpyxl', sqlite=False,
+         mmap=False, validar_tablas=True):
+    """
+    Pipeline unificado: mapeo, estructura y datos en una pasada por libro.
+    Escribe las mismas salidas que generar_mapeo.py, extraer_estructura.py
+    y extraer_datos.py (mapeo_hojas.json, estructura_completa.json y
+    data/columnar y/o datos_completos.json) y, con salida columnar, la
+    tabla de hechos armonizada de armonizar.py, los agregados de cubo.py y
+    el reporte de validacion.py.
+    
+    workers: procesos para repartir los años (1 = en serie)
+    forzar: ignorar la caché incremental y reprocesar todos los años
+    formato: 'columnar', 'json' o 'ambos' (como en extraer_datos.py)
+    modo_json: 'indentado', 'compacto' o 'jsonl' (como en extraer_datos.py)
+    lector: 'openpyxl' (referencia) o 'rapido' (LibroXLSX)
+    sqlite, mmap: exportar además cada tabla a data/sqlite o data/mmap
+                  (como en extraer_datos.py); las tablas de años sin
+                  cambios se copian solo si faltan o cambió su firma
+    validar_tablas: correr validacion.py al final (solo con salida columnar)
+    """
+    # Configuración
+    directorio_data = 'data/defunciones'
+    mapeo_json = 'data/json/mapeo_hojas.json'
+    estructura_json = 'data/json/estructura_completa.json'
+    datos_json = ruta_datos('data/json/datos_completos.json', modo_json)
+    años = ['2015', '2016', '2017', '2018', '2019', '2020', '2021', '2022', '2023', '2024']
+    exportar_columnar = formato in ('columnar', 'ambos')
+    exportar_json = formato in ('json', 'ambos')
+    
+    print("=" * 80)
+    print("PIPELINE UNIFICADO: MAPEO + ESTRUCTURA + DATOS")
+    print("=" * 80)
+    
+    mapeo_resultado = {tematica: {} for tematica in TEMATICAS}
+    estructura_resultado = {}
+    indice = {}
+    resumen_años = {}
+    
+    # Caché incremental por año: firma = contenido del archivo + temáticas + formato + reglas de extracción
+    manifiesto = ManifiestoBuild()
+    mapeo_previo = {} if forzar else cargar_json_previo(mapeo_json)
+    estructura_previa = {} if forzar else cargar_json_previo(estructura_json)
+    datos_previos = cargar_datos_previos(datos_json) if exportar_json and not forzar else {}
+    indice_previo = cargar_indice() if exportar_columnar and not forzar else {}
+    firmas = {}
+    en_cache = set()
+    
+    def año_reutilizable(año):
+        if not all(año in mapeo_previo.get(tematica, {}) for tematica in TEMATICAS):
+            return False
+        for tematica in TEMATICAS:
+            if not mapeo_previo[tematica][año]:
+                continue
+            if año not in estructura_previa.get(tematica, {}):
+                return False
+            if exportar_json and año not in datos_previos.get(tematica, {}):
+                return False
+            if exportar_columnar and año not in indice_previo.get(tematica, {}):
+                return False
+        return True
+    
+    for año in años:
+        archivo_año = os.path.join(directorio_data, f'{año}.xlsx')
+        if not os.path.exists(archivo_año):
+            continue
+        firmas[año] = manifiesto.firma(manifiesto.hash_archivo(archivo_año), TEMATICAS, VERSION_FORMATO,
+                                        VERSION_EXTRACCION)
+        if manifiesto.vigente('pipeline', año, firmas[año]) and año_reutilizable(año):
+            en_cache.add(año)
+    
+    # Un libro por tarea, en paralelo si workers > 1
+    pendientes = [(os.path.join(directorio_data, f'{año}.xlsx'), TEMATICAS, lector)
+                  for año in años if año in firmas and año not in en_cache]
+    resultados = ejecutar_en_orden(procesar_libro, pendientes, workers)
+    
+    # Cada tabla se escribe en datos_completos en cuanto se procesa su año
+    escritor = EscritorDatosJSON(datos_json, modo_json) if exportar_json else None
+    # Los archivos columnares se escriben en un hilo aparte mientras se procesa lo siguiente
+    escritura = EscritorSegundoPlano() if exportar_columnar else None
+    # pandas (SQLite, mmap) se importa recién aquí y solo si se usa
+    base_sqlite = almacen_mmap = None
+    if sqlite:
+        from almacen_sqlite import RUTA_SQLITE, AlmacenSQLite
+        base_sqlite = AlmacenSQLite()
+    if mmap:
+        from almacen_mmap import DIRECTORIO_MMAP, AlmacenMmap
+        almacen_mmap = AlmacenMmap()
+    exportadas = []
+    
+    try:
+        for año in años:
+            print(f"\n{'='*80}")
+            print(f"PROCESANDO AÑO {año}")
+            print(f"{'='*80}")
+            
+            archivo_año = os.path.join(directorio_data, f'{año}.xlsx')
+            
+            if not os.path.exists(archivo_año):
+                print(f"⚠ {archivo_año} no existe, saltando...")
+                resumen_años[año] = {'procesadas': 0, 'error': 'Archivo no existe'}
+                continue
+            
+            if año in en_cache:
+                print(f"✓ {año}.xlsx sin cambios, desde caché")
+                tablas = []
+                for tematica in TEMATICAS:
+                    nombre_hoja = mapeo_previo[tematica][año]
+                    mapeo_resultado[tematica][año] = nombre_hoja
+                    if not nombre_hoja:
+                        continue
+                    estructura = estructura_previa[tematica][año]
+                    previo = datos_previos.get(tematica, {}).get(año)
+                    entrada = indice_previo.get(tematica, {}).get(año)
+                    tablas.append((tematica, estructura, previo, entrada))
+                    
+                    firma_tabla = manifiesto.firma(firmas[año], tematica)
+                    df = None
+                    if sqlite and not base_sqlite.vigente(tematica, año, firma_tabla):
+                        df = tabla_desde_cache(entrada, previo, estructura)
+                        guardar_tabla_sqlite(base_sqlite, tematica, año, df, estructura, nombre_hoja, firma_tabla)
+                    if mmap and not almacen_mmap.vigente(tematica, año, firma_tabla):
+                        if df is None:
+                            df = tabla_desde_cache(entrada, previo, estructura)
+                        guardar_tabla_mmap(almacen_mmap, tematica, año, df, nombre_hoja, firma_tabla)
+            else:
+                print(f"✓ Procesando {año}.xlsx...")
+                resultado = next(resultados)
+                
+                if resultado['error']:
+                    print(f"❌ Error procesando {año}: {resultado['error']}")
+                    manifiesto.olvidar('pipeline', año)
+                    resumen_años[año] = {'procesadas': 0, 'error': resultado['error']}
+                    continue
+                
+                for tematica, nombre_hoja in resultado['mapeo'].items():
+                    mapeo_resultado[tematica][año] = nombre_hoja
+                
+                tablas = []
+                for tematica, estructura, datos, rendimiento in resultado['tablas']:
+                    nombre_hoja = estructura['hoja']
+                    previo = {
+                        'encabezados': datos['encabezados'],
+                        'datos': datos['datos'],
+                        'total_filas': datos['total_filas'],
+                        'tipo_tabla': estructura['tipo'],
+                        'hoja': nombre_hoja
+                    }
+                    entrada = df = None
+                    if exportar_columnar or sqlite or mmap:
+                        df = tabla_tipada(año, datos, estructura, nombre_hoja)
+                    if exportar_columnar:
+                        entrada = escritura.enviar(guardar_tabla_columnar, tematica, año, datos, estructura,
+                                                   nombre_hoja, df)
+                    firma_tabla = None if 'error' in datos else manifiesto.firma(firmas[año], tematica)
+                    if sqlite:
+                        guardar_tabla_sqlite(base_sqlite, tematica, año, df, estructura, nombre_hoja, firma_tabla)
+                    if mmap:
+                        guardar_tabla_mmap(almacen_mmap, tematica, año, df, nombre_hoja, firma_tabla)
+                    tablas.append((tematica, estructura, previo, entrada))
+                    print(f"  {tematica[:50]}... → {nombre_hoja} ({estructura['tipo']}, "
+                          f"{datos['total_filas']:6d} filas, {rendimiento})")
+                
+                manifiesto.registrar('pipeline', año, firmas[año])
+            
+            total_filas_año = 0
+            for tematica, estructura, previo, entrada in tablas:
+                estructura_resultado.setdefault(tematica, {})[año] = estructura
+                if exportar_json:
+                    escritor.agregar(tematica, año, previo)
+                if exportar_columnar:
+                    indice.setdefault(tematica, {})[año] = entrada
+                exportadas.append((tematica, año))
+                total_filas_año += (previo or entrada)['total_filas']
+            
+            resumen_años[año] = {
+                'procesadas': len(tablas),
+                'total_filas': total_filas_año
+            }
+        
+        # Guardar resultado
+        print(f"\n{'='*80}")
+        print("GUARDANDO RESULTADO")
+        print(f"{'='*80}")
+        
+        with perfilado.etapa('guardar_json'):
+            with open(mapeo_json, 'w', encoding='utf-8') as f:
+                json.dump(mapeo_resultado, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ Mapeo guardado en: {mapeo_json}")
+        
+        with perfilado.etapa('guardar_json'):
+            with open(estructura_json, 'w', encoding='utf-8') as f:
+                json.dump(estructura_resultado, f, ensure_ascii=False, indent=2)
+        print(f"✓ Estructura guardada en: {estructura_json}")
+        
+        if exportar_columnar:
+            escritura.cerrar()
+            indice = {tematica: {año: resultado_escritura(entrada) for año, entrada in años_indice.items()}
+                      for tematica, años_indice in indice.items()}
+            with perfilado.etapa('guardar_indice'):
+                guardar_indice(indice)
+                limpiar_huerfanos(indice)
+            print(f"✓ Datos columnares ({formato_disponible()}) guardados en: {DIRECTORIO_COLUMNAR}/")
+            
+            # pandas se importa recién aquí: sin salida columnar no hace falta
+            from armonizar import DIRECTORIO_HECHOS, construir_hechos
+            from cubo import DIRECTORIO_CUBO, construir_cubo
+            from validacion import (RUTA_VALIDACION, VERSION_VALIDACION, cargar_reporte, guardar_reporte,
+                                    imprimir_reporte, valores_perdidos, validar)
+            
+            with perfilado.etapa('armonizar'):
+                construir_hechos(indice, estructura_resultado, forzar, manifiesto=manifiesto)
+            print(f"✓ Tabla de hechos armonizada guardada en: {DIRECTORIO_HECHOS}/")
+            
+            with perfilado.etapa('cubo'):
+                indice_cubo = construir_cubo(indice, estructura_resultado, forzar, manifiesto=manifiesto)
+            print(f"✓ Agregados (cubo) guardados en: {DIRECTORIO_CUBO}/")
+            
+            if validar_tablas:
+                # Misma firma que la última validación (tablas, estructura y reglas): se reutiliza el reporte
+                firma_validacion = manifiesto.firma(indice_cubo['firmas'], valores_perdidos(indice), VERSION_VALIDACION)
+                reporte = None
+                if not forzar and manifiesto.vigente('validacion', RUTA_VALIDACION, firma_validacion):
+                    reporte = cargar_reporte()
+                
+                if reporte is not None:
+                    print(f"✓ Validación entre tablas sin cambios, desde: {RUTA_VALIDACION}")
+                else:
+                    with perfilado.etapa('validacion'):
+                        reporte = validar(indice, estructura_resultado)
+                        guardar_reporte(reporte)
+                    manifiesto.registrar('validacion', RUTA_VALIDACION, firma_validacion)
+                    print(f"✓ Validación entre tablas guardada en: {RUTA_VALIDACION}")
+                imprimir_reporte(reporte, ejemplos=0)
+        
+        if exportar_json:
+            with perfilado.etapa('guardar_json'):
+                escritor.cerrar()
+            print(f"✓ Datos guardados en: {datos_json}")
+        
+        if sqlite:
+            base_sqlite.conservar(exportadas)
+            base_sqlite.cerrar()
+            print(f"✓ Base SQLite guardada en: {RUTA_SQLITE}")
+        
+        if mmap:
+            almacen_mmap.conservar(exportadas)
+            almacen_mmap.guardar_indice()
+            print(f"✓ Tablas mapeables (np.memmap) guardadas en: {DIRECTORIO_MMAP}/")
+    except BaseException:
+        # Una falla a mitad de camino no deja .partes/.tmp de datos_completos ni escrituras en curso
+        if escritor is not None:
+            escritor.descartar()
+        if escritura is not None:
+            escritura.descartar()
+        if base_sqlite is not None:
+            base_sqlite.cerrar()
+        raise
+    
+    manifiesto.guardar()
+    
+    # Resumen
+    print(f"\n{'='*80}")
+    print("RESUMEN")
+    print(f"{'='*80}")
+    
+    print(f"\nAños procesados: {len(años)}")
+    for año in años:
+        if año in resumen_años:
+            info = resumen_años[año]
+            if 'error' in info:
+                print(f"  {año}: ⚠ {info['error']}")
+            else:
+                print(f"  {año}: {info['procesadas']} temáticas, {info['total_filas']:,} filas totales")
+    
+    print(f"\n{'='*80}")
+    print("PROCESO COMPLETADO")
+    print(f"{'='*80}")
+
+def agregar_argumentos(parser):
+    """Opciones de línea de comandos (las usa también defunciones.py all)"""
+    parser.add_argument('--workers', type=int, default=1, help="Procesos en paralelo (por defecto 1, en serie)")
+    parser.add_argument('--forzar', action='store_true', help="Ignorar la caché y reprocesar todos los años")
+    parser.add_argument('--formato', choices=['columnar', 'json', 'ambos'], default='columnar',
+                        help="Salida de datos: archivos columnares por tabla, datos_completos.json o ambos")
+    parser.add_argument('--json-modo', choices=['indentado', 'compacto', 'jsonl'], default='indentado',
+                        help="Formato de datos_completos: JSON indentado, JSON compacto o JSON Lines (.jsonl)")
+    parser.add_argument('--sqlite', action='store_true',
+                        help="Exportar además cada tabla a la base SQLite de data/sqlite (ver AlmacenSQLite)")
+    parser.add_argument('--mmap', action='store_true',
+                        help="Exportar además cada tabla a data/mmap para abrirla con np.memmap (ver AlmacenMmap)")
+    parser.add_argument('--sin-validar', action='store_true', help="No correr la validación entre tablas al final")
+    parser.add_argument('--profile', action='store_true',
+                        help="Medir cada etapa y guardar data/json/perfil_pipeline.json")
+    parser.add_argument('--profile-etapa', default=None,
+                        help="Además perfilar con cProfile una etapa (carga_libro, leer_filas, tipar_tabla, ...)")
+    parser.add_argument('--lector', choices=LECTORES, default='openpyxl',
+                        help="Lector de los libros: openpyxl (referencia) o rapido (XML directo, solo valores)")
+
+def ejecutar(args):
+    """Corre el script con los argumentos ya interpretados"""
+    if args.profile or args.profile_etapa:
+        perfilado.activar(args.profile_etapa)
+    
+    main(workers=args.workers, forzar=args.forzar, formato=args.formato, modo_json=args.json_modo,
+         lector=args.lector, sqlite=args.sqlite, mmap=args.mmap, validar_tablas=not args.sin_validar)
+    
+    if perfilado.activo():
+        perfilado.guardar_reporte('data/json/perfil_pipeline.json', 'pipeline')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mapeo, estructura y datos en una sola pasada por libro")
+    agregar_argumentos(parser)
+    ejecutar(parser.parse_args())
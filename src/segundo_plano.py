@@ -0,0 +1,159 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+class LectorAnticipado:
+    """
+    Lee por adelantado, en un hilo aparte, el contenido de los libros que
+    se van a procesar, para que la lectura del disco (lenta en una unidad
+    de red) se solape con el parseo del libro actual, que ocupa la CPU.
+    
+    Se mantienen en memoria como mucho el libro en uso y `adelanto`
+    libros siguientes. Los archivos se piden en el orden de `archivos`;
+    pedir uno pone en cola la lectura del siguiente.
+    """
+    
+    def __init__(self, archivos, adelanto=1):
+        self.adelanto = adelanto
+        self._cola = deque()
+        for archivo in archivos:
+            clave = os.path.abspath(archivo)
+            if not self._cola or self._cola[-1] != clave:
+                self._cola.append(clave)
+        
+        self._futuros = {}
+        self._actual = (None, None)  # (clave, bytes) del último libro entregado
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lectura')
+        self._llenar()
+    
+    def _llenar(self):
+        while self._cola and len(self._futuros) < self.adelanto:
+            clave = self._cola.popleft()
+            self._futuros[clave] = self._ejecutor.submit(_leer_bytes, clave)
+    
+    def tomar(self, archivo):
+        """
+        Contenido de `archivo` como BytesIO si se leyó (o se está leyendo)
+        por adelantado; None si no estaba en la lista o si la lectura falló
+        (el error lo reporta entonces la carga normal).
+        """
+        clave = os.path.abspath(archivo)
+        if self._actual[0] == clave:
+            return io.BytesIO(self._actual[1])
+        
+        futuro = self._futuros.pop(clave, None)
+        if futuro is None:
+            if clave in self._cola:
+                # Se saltó algún libro: se descarta lo anterior y se sigue desde aquí
+                for saltado in self._futuros.values():
+                    saltado.cancel()
+                self._futuros.clear()
+                while self._cola.popleft() != clave:
+                    pass
+                self._llenar()
+            return None
+        self._actual = (None, None)
+        self._llenar()
+        
+        try:
+            contenido = futuro.result()
+        except OSError:
+            return None
+        
+        self._actual = (clave, contenido)
+        return io.BytesIO(contenido)
+    
+    def cerrar(self):
+        for futuro in self._futuros.values():
+            futuro.cancel()
+        self._futuros.clear()
+        self._cola.clear()
+        self._actual = (None, None)
+        self._ejecutor.shutdown(wait=True)
+
+def _leer_bytes(archivo):
+    with open(archivo, 'rb') as f:
+        return f.read()
+
+# Lector del proceso actual (lo consulta SesionLibros al abrir un libro)
+_lector = None
+
+@contextmanager
+def anticipar(archivos, adelanto=1):
+    """
+    Activa la lectura anticipada de `archivos` en este proceso mientras
+    dura el bloque. SesionLibros toma de aquí el contenido ya leído.
+        
+        with segundo_plano.anticipar(['data/defunciones/2015.xlsx', ...]):
+            for archivo in archivos:
+                procesar(archivo)
+    """
+    global _lector
+    anterior = _lector
+    _lector = LectorAnticipado(archivos, adelanto)
+    try:
+        yield _lector
+    finally:
+        _lector.cerrar()
+        _lector = anterior
+
+def tomar(archivo):
+    """Contenido anticipado de `archivo` (BytesIO) o None"""
+    return _lector.tomar(archivo) if _lector is not None else None
+
+class EscritorSegundoPlano:
+    """
+    Ejecuta funciones de escritura en un hilo aparte, en orden de llegada,
+    para que la escritura de salidas se solape con la extracción del
+    siguiente bloque.
+    
+    Como mucho `max_pendientes` escrituras esperan en cola (cada una
+    retiene sus datos en memoria); al superarlo, enviar() espera a la más
+    antigua. Los errores de una escritura se propagan en enviar(),
+    esperar() o cerrar().
+    
+    Uso:
+        escritura = EscritorSegundoPlano()
+        futuro = escritura.enviar(guardar_tabla, tematica, año, df)
+        ...
+        escritura.cerrar()
+        entrada = futuro.result()
+    """
+    
+    def __init__(self, max_pendientes=4):
+        self.max_pendientes = max_pendientes
+        self._pendientes = deque()
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='escritura')
+    
+    def enviar(self, funcion, *args, **kwargs):
+        """Encola funcion(*args, **kwargs); retorna su Future"""
+        while len(self._pendientes) >= self.max_pendientes:
+            self._pendientes.popleft().result()
+        
+        futuro = self._ejecutor.submit(funcion, *args, **kwargs)
+        self._pendientes.append(futuro)
+        return futuro
+    
+    def esperar(self):
+        """Espera a que terminen todas las escrituras encoladas"""
+        while self._pendientes:
+            self._pendientes.popleft().result()
+    
+    def cerrar(self):
+        try:
+            self.esperar()
+        finally:
+            self._ejecutor.shutdown(wait=True)
+    
+    def descartar(self):
+        """Cierra sin propagar errores (la salida se va a descartar)"""
+        for futuro in self._pendientes:
+            futuro.cancel()
+        self._pendientes.clear()
+        self._ejecutor.shutdown(wait=True)
+
+def resultado(valor):
+    """El resultado de un Future de EscritorSegundoPlano, o el valor tal cual"""
+    return valor.result() if isinstance(valor, Future) else valor
@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlencode, urlparse
+from urllib.request import Request, urlopen
+
+from sesion_libros import LECTORES, SesionLibros
+from indice_titulos import IndiceTitulos
+from generar_mapeo import TEMATICAS, titulos_de_libro
+from extraer_estructura import extraer_estructura_tabla
+from extraer_datos import extraer_datos_tabla
+
+HOST_SERVICIO = '127.0.0.1'
+PUERTO_SERVICIO = 8765
+
+class ServicioExtraccion:
+    """
+    Extracción bajo demanda con los libros y las tablas ya parseados en
+    memoria, para un proceso de larga duración (ver servidor()).
+    
+    Por cada (temática, año) se busca la hoja por título (como en
+    pipeline.py), se extrae su estructura y sus filas, y la respuesta ya
+    codificada (JSON por columnas) queda en una caché LRU limitada por
+    `limite_mb`. Cada entrada recuerda el mtime y tamaño del <año>.xlsx
+    del que salió: si el archivo cambia, se vuelve a extraer.
+    
+    Los libros abiertos se mantienen en una SesionLibros; la extracción
+    se serializa con un lock (openpyxl no es seguro entre hilos) y las
+    consultas que están en caché no lo esperan más que para leerla.
+    
+    Uso:
+        servicio = ServicioExtraccion()
+        payload = servicio.tabla(tematica, '2015')  # bytes JSON
+    """
+    
+    def __init__(self, directorio_data='data/defunciones', limite_mb=256, lector='openpyxl', max_abiertos=2):
+        self.directorio_data = directorio_data
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self.sesion = SesionLibros(max_abiertos=max_abiertos, lector=lector)
+        self._cache = OrderedDict()  # clave -> (firma_archivo, bytes)
+        self._bytes_cache = 0
+        self._firmas_abiertas = {}  # archivo -> firma con la que se abrió en la sesión
+        self._mapeos = {}  # archivo -> (firma, {temática: hoja})
+        self._lock_extraccion = threading.Lock()
+        self._lock_cache = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+    
+    def archivo_año(self, año):
+        # Solo dígitos: el año viene de la consulta HTTP y arma una ruta
+        año = str(año)
+        if not (año.isascii() and año.isdigit()):
+            raise ValueError(f"Año inválido: {año!r}")
+        archivo = os.path.join(self.directorio_data, f'{año}.xlsx')
+        if not os.path.exists(archivo):
+            raise LookupError(f"No existe {archivo}")
+        return archivo
+    
+    @staticmethod
+    def firma_archivo(archivo):
+        info = os.stat(archivo)
+        return (info.st_mtime_ns, info.st_size)
+    
+    def mapeo(self, año):
+        """{temática: hoja o None} de un año (bytes JSON)"""
+        archivo = self.archivo_año(año)
+        return self._consultar(('mapeo', año), archivo, lambda: self._mapeo(archivo))
+    
+    def estructura(self, tematica, año):
+        """Estructura de encabezados de (temática, año) (bytes JSON)"""
+        archivo = self.archivo_año(año)
+        return self._consultar(('estructura', tematica, año), archivo,
+                               lambda: self._estructura(archivo, tematica, año))
+    
+    def tabla(self, tematica, año):
+        """
+        Datos de (temática, año) por columnas (bytes JSON):
+            {'tematica', 'año', 'hoja', 'estructura', 'columnas': [nombres],
+             'datos': {nombre: [valores]}, 'total_filas'}
+        """
+        archivo = self.archivo_año(año)
+        return self._consultar(('tabla', tematica, año), archivo,
+                               lambda: self._tabla(archivo, tematica, año))
+    
+    def estado(self):
+        with self._lock_cache:
+            return {
+                'tablas_en_cache': len(self._cache),
+                'memoria_mb': round(self._bytes_cache / (1024 * 1024), 2),
+                'limite_mb': round(self.limite_bytes / (1024 * 1024), 2),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'lector': self.sesion.lector
+            }
+    
+    def limpiar_cache(self):
+        with self._lock_cache:
+            self._cache.clear()
+            self._bytes_cache = 0
+    
+    def cerrar(self):
+        with self._lock_extraccion:
+            self.sesion.cerrar()
+            self._firmas_abiertas.clear()
+    
+    def _consultar(self, clave, archivo, calcular):
+        firma = self.firma_archivo(archivo)
+        
+        payload = self._de_cache(clave, firma)
+        if payload is not None:
+            return payload
+        
+        with self._lock_extraccion:
+            # Otro hilo pudo calcularla mientras se esperaba el lock
+            payload = self._de_cache(clave, firma, contar=False)
+            if payload is not None:
+                return payload
+            
+            # Si el libro cambió en disco desde que se abrió, se vuelve a cargar
+            if self._firmas_abiertas.get(archivo) != firma:
+                self.sesion.cerrar(archivo)
+                self._firmas_abiertas[archivo] = firma
+            
+            payload = json.dumps(calcular(), ensure_ascii=False, default=str).encode('utf-8')
+        
+        self._a_cache(clave, firma, payload)
+        return payload
+    
+    def _mapeo(self, archivo):
+        # Mismo criterio que pipeline.py: mejor título con umbral 0.75
+        firma = self._firmas_abiertas[archivo]
+        if self._mapeos.get(archivo, (None,))[0] != firma:
+            indice_titulos = IndiceTitulos(titulos_de_libro(self.sesion.libro(archivo)))
+            self._mapeos[archivo] = (firma, {tematica: indice_titulos.mejor_hoja(tematica, umbral=0.75)
+                                             for tematica in TEMATICAS})
+        return self._mapeos[archivo][1]
+    
+    def _hoja(self, archivo, tematica, año):
+        if tematica not in TEMATICAS:
+            raise LookupError(f"Temática '{tematica}' no encontrada")
+        nombre_hoja = self._mapeo(archivo)[tematica]
+        if not nombre_hoja:
+            raise LookupError(f"'{tematica}' no tiene hoja en {año}")
+        return nombre_hoja
+    
+    def _estructura(self, archivo, tematica, año):
+        nombre_hoja = self._hoja(archivo, tematica, año)
+        estructura = extraer_estructura_tabla(archivo, nombre_hoja, self.sesion)
+        estructura['hoja'] = nombre_hoja
+        return estructura
+    
+    def _tabla(self, archivo, tematica, año):
+        estructura = self._estructura(archivo, tematica, año)
+        datos = extraer_datos_tabla(archivo, estructura['hoja'], estructura, self.sesion)
+        if 'error' in datos:
+            raise RuntimeError(datos['error'])
+        
+        columnas, valores = datos['datos'].columnas()
+        return {
+            'tematica': tematica,
+            'año': año,
+            'hoja': estructura['hoja'],
+            'estructura': estructura,
+            'columnas': columnas,
+            'datos': valores,
+            'total_filas': datos['total_filas']
+        }
+    
+    def _de_cache(self, clave, firma, contar=True):
+        with self._lock_cache:
+            entrada = self._cache.get(clave)
+            if entrada is None or entrada[0] != firma:
+                if contar:
+                    self.fallos += 1
+                return None
+            self._cache.move_to_end(clave)
+            if contar:
+                self.aciertos += 1
+            return entrada[1]
+    
+    def _a_cache(self, clave, firma, payload):
+        with self._lock_cache:
+            anterior = self._cache.pop(clave, None)
+            if anterior is not None:
+                self._bytes_cache -= len(anterior[1])
+            self._cache[clave] = (firma, payload)
+            self._bytes_cache += len(payload)
+            
+            # Descartar los menos usados, conservando siempre el recién agregado
+            while self._bytes_cache > self.limite_bytes and len(self._cache) > 1:
+                _, (_, viejo) = self._cache.popitem(last=False)
+                self._bytes_cache -= len(viejo)
+
+class _Manejador(BaseHTTPRequestHandler):
+    """
+    GET /salud                          estado de la caché
+    GET /tematicas                      lista de temáticas
+    GET /mapeo?año=2015                 {temática: hoja}
+    GET /estructura?tematica=...&año=   estructura de encabezados
+    GET /tabla?tematica=...&año=        datos por columnas
+    POST /limpiar                       vaciar la caché
+    """
+    
+    servicio = None
+    silencioso = False
+    
+    def do_GET(self):
+        inicio = time.perf_counter()
+        url = urlparse(self.path)
+        parametros = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+        
+        try:
+            if url.path == '/salud':
+                payload = json.dumps(self.servicio.estado()).encode('utf-8')
+            elif url.path == '/tematicas':
+                payload = json.dumps(TEMATICAS, ensure_ascii=False).encode('utf-8')
+            elif url.path == '/mapeo':
+                payload = self.servicio.mapeo(self._requerido(parametros, 'año'))
+            elif url.path == '/estructura':
+                payload = self.servicio.estructura(self._requerido(parametros, 'tematica'),
+                                                   self._requerido(parametros, 'año'))
+            elif url.path == '/tabla':
+                payload = self.servicio.tabla(self._requerido(parametros, 'tematica'),
+                                              self._requerido(parametros, 'año'))
+            else:
+                return self._error(404, f"Ruta desconocida: {url.path}")
+        except ValueError as e:
+            return self._error(400, str(e))
+        except LookupError as e:
+            return self._error(404, str(e))
+        except Exception as e:
+            return self._error(500, str(e))
+        
+        self._responder(200, payload)
+        if not self.silencioso:
+            print(f"  {url.path} {parametros.get('año', '')} "
+                  f"{len(payload) / 1024:.1f} KB en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    
+    def do_POST(self):
+        if urlparse(self.path).path != '/limpiar':
+            return self._error(404, f"Ruta desconocida: {self.path}")
+        self.servicio.limpiar_cache()
+        self._responder(200, json.dumps(self.servicio.estado()).encode('utf-8'))
+    
+    @staticmethod
+    def _requerido(parametros, nombre):
+        if not parametros.get(nombre):
+            raise ValueError(f"Falta el parámetro '{nombre}'")
+        return parametros[nombre]
+    
+    def _responder(self, codigo, payload):
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def _error(self, codigo, mensaje):
+        self._responder(codigo, json.dumps({'error': mensaje}, ensure_ascii=False).encode('utf-8'))
+    
+    def log_message(self, formato, *args):
+        # Los accesos se reportan en do_GET con su tiempo; se silencia el log por defecto
+        pass
+
+def servidor(servicio, host=HOST_SERVICIO, puerto=PUERTO_SERVICIO, silencioso=False):
+    """ThreadingHTTPServer que atiende las consultas con `servicio`"""
+    manejador = type('Manejador', (_Manejador,), {'servicio': servicio, 'silencioso': silencioso})
+    return ThreadingHTTPServer((host, puerto), manejador)
+
+class ClienteServicio:
+    """
+    Cliente para el notebook o scripts: consulta un servicio ya levantado
+    con `python src/servicio.py`.
+    
+    Uso:
+        cliente = ClienteServicio()
+        df = cliente.dataframe(tematica, '2015')
+    """
+    
+    def __init__(self, url=f'http://{HOST_SERVICIO}:{PUERTO_SERVICIO}', timeout=300):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+    
+    def _get(self, ruta, **parametros):
+        consulta = f"?{urlencode(parametros, quote_via=quote)}" if parametros else ''
+        return self._pedir(Request(f"{self.url}{ruta}{consulta}"))
+    
+    def _pedir(self, peticion):
+        with urlopen(peticion, timeout=self.timeout) as respuesta:
+            return json.loads(respuesta.read().decode('utf-8'))
+    
+    def salud(self):
+        return self._get('/salud')
+    
+    def tematicas(self):
+        return self._get('/tematicas')
+    
+    def mapeo(self, año):
+        return self._get('/mapeo', año=año)
+    
+    def estructura(self, tematica, año):
+        return self._get('/estructura', tematica=tematica, año=año)
+    
+    def tabla(self, tematica, año):
+        """Respuesta por columnas tal cual (ver ServicioExtraccion.tabla)"""
+        return self._get('/tabla', tematica=tematica, año=año)
+    
+    def dataframe(self, tematica, año):
+        """La tabla como DataFrame (columnas en el orden de la hoja)"""
+        import pandas as pd
+        
+        respuesta = self.tabla(tematica, año)
+        return pd.DataFrame(respuesta['datos'], columns=respuesta['columnas'])
+    
+    def limpiar(self):
+        return self._pedir(Request(f"{self.url}/limpiar", data=b'', method='POST'))
+
+def main(host=HOST_SERVICIO, puerto=PUERTO_SERVICIO, limite_mb=256, lector='openpyxl', precargar=False,
+         silencioso=False):
+    """
+    Levanta el servicio y atiende consultas hasta Ctrl+C.
+    
+    precargar: extraer al inicio todas las tablas mapeadas de los años
+               disponibles (las primeras consultas ya salen de la caché)
+    """
+    servicio = ServicioExtraccion(limite_mb=limite_mb, lector=lector)
+    
+    print("=" * 80)
+    print("SERVICIO DE EXTRACCIÓN")
+    print("=" * 80)
+    
+    if precargar:
+        inicio = time.perf_counter()
+        tablas = 0
+        for nombre in sorted(os.listdir(servicio.directorio_data)):
+            año, extension = os.path.splitext(nombre)
+            if extension != '.xlsx' or not año.isdigit():
+                continue
+            
+            mapeo = json.loads(servicio.mapeo(año))
+            for tematica, nombre_hoja in mapeo.items():
+                if nombre_hoja:
+                    try:
+                        servicio.tabla(tematica, año)
+                        tablas += 1
+                    except Exception as e:
+                        print(f"  ⚠ {año} {tematica[:50]}...: {e}")
+        
+        estado = servicio.estado()
+        print(f"✓ {tablas} tablas precargadas en {time.perf_counter() - inicio:.1f}s ({estado['memoria_mb']} MB)")
+    
+    http = servidor(servicio, host, puerto, silencioso)
+    print(f"✓ Escuchando en http://{host}:{http.server_address[1]} (lector: {lector}, caché: {limite_mb} MB)")
+    print("  Rutas: /salud, /tematicas, /mapeo?año=, /estructura?tematica=&año=, /tabla?tematica=&año=")
+    
+    try:
+        http.serve_forever()
+    except KeyboardInterrupt:
+        print("\n✓ Servicio detenido")
+    finally:
+        http.server_close()
+        servicio.cerrar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio local que extrae y sirve tablas por (temática, año)")
+    parser.add_argument('--host', default=HOST_SERVICIO, help="Dirección de escucha (por defecto solo local)")
+    parser.add_argument('--puerto', type=int, default=PUERTO_SERVICIO, help="Puerto HTTP")
+    parser.add_argument('--limite-mb', type=int, default=256, help="Memoria máxima de la caché de tablas")
+    parser.add_argument('--lector', choices=LECTORES, default='openpyxl',
+                        help="Lector de los libros: openpyxl (referencia) o rapido (XML directo, solo valores)")
+    parser.add_argument('--precargar', action='store_true', help="Extraer todas las tablas al iniciar")
+    parser.add_argument('--silencioso', action='store_true', help="No imprimir cada consulta")
+    args = parser.parse_args()
+    
+    main(host=args.host, puerto=args.puerto, limite_mb=args.limite_mb, lector=args.lector,
+         precargar=args.precargar, silencioso=args.silencioso)
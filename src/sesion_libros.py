@@ -0,0 +1,83 @@
+import os
+from collections import OrderedDict
+
+import segundo_plano
+
+# 'openpyxl': lector de referencia; 'rapido': LibroXLSX (solo valores, sin objetos Cell)
+LECTORES = ('openpyxl', 'rapido')
+
+class SesionLibros:
+    """
+    Mantiene abiertos los libros Excel durante una ejecución para que cada
+    archivo se parsee una sola vez y sus hojas se compartan entre temáticas.
+    
+    Los libros se guardan por ruta absoluta. Cuando se supera `max_abiertos`
+    se cierra el libro usado hace más tiempo.
+    
+    Con lector='rapido' los libros se abren con LibroXLSX en lugar de
+    openpyxl (las opciones de carga se ignoran: siempre solo valores).
+    
+    Uso:
+        with SesionLibros() as sesion:
+            ws = sesion.hoja('data/defunciones/2015.xlsx', 'Serie histórica')
+    """
+    
+    def __init__(self, max_abiertos=1, lector='openpyxl', **opciones_carga):
+        if lector not in LECTORES:
+            raise ValueError(f"Lector desconocido: {lector}")
+        
+        self.max_abiertos = max_abiertos
+        self.lector = lector
+        self.opciones_carga = {'data_only': True}
+        self.opciones_carga.update(opciones_carga)
+        self._libros = OrderedDict()
+    
+    def libro(self, archivo_excel):
+        """Retorna el libro abierto para `archivo_excel`, cargándolo si hace falta"""
+        clave = os.path.abspath(archivo_excel)
+        
+        if clave in self._libros:
+            self._libros.move_to_end(clave)
+            return self._libros[clave]
+        
+        # Si el contenido ya se leyó por adelantado (segundo_plano.anticipar) se parsea desde memoria
+        origen = segundo_plano.tomar(archivo_excel) or archivo_excel
+        
+        # Los lectores se importan al abrir el primer libro: una corrida que
+        # reutiliza todo desde la caché no carga openpyxl
+        if self.lector == 'rapido':
+            from libro_xlsx import LibroXLSX
+            wb = LibroXLSX(origen)
+        else:
+            import openpyxl
+            wb = openpyxl.load_workbook(origen, **self.opciones_carga)
+        self._libros[clave] = wb
+        
+        while len(self._libros) > self.max_abiertos:
+            _, viejo = self._libros.popitem(last=False)
+            viejo.close()
+        
+        return wb
+    
+    def hoja(self, archivo_excel, nombre_hoja):
+        """Retorna la hoja `nombre_hoja` del libro `archivo_excel`"""
+        return self.libro(archivo_excel)[nombre_hoja]
+    
+    def cerrar(self, archivo_excel=None):
+        """Cierra un libro concreto o, si no se indica, todos los abiertos"""
+        if archivo_excel is not None:
+            wb = self._libros.pop(os.path.abspath(archivo_excel), None)
+            if wb is not None:
+                wb.close()
+            return
+        
+        while self._libros:
+            _, wb = self._libros.popitem(last=False)
+            wb.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+        return False
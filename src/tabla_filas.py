@@ -0,0 +1,67 @@
+from collections.abc import Sequence
+
+class TablaFilas(Sequence):
+    """
+    Filas extraídas de una tabla: una sola lista de encabezados compartida
+    y una tupla de valores por fila, en lugar de un dict por fila que
+    repite todas las claves.
+    
+    Para el código que aún espera la lista de dicts, se comporta como ella:
+    len(), tabla[i] y la iteración entregan dicts {encabezado: valor}
+    (armados al vuelo) y == compara contra una lista de dicts.
+    Para convertir a columnas sin pasar por dicts, usar columnas().
+    
+    Uso:
+        tabla = TablaFilas(['Departamento', 'Total'], [('Guatemala', 120), ...])
+        nombres, columnas = tabla.columnas()
+    """
+    
+    __slots__ = ('encabezados', 'filas')
+    
+    def __init__(self, encabezados, filas=None):
+        self.encabezados = list(encabezados)
+        self.filas = [] if filas is None else filas
+    
+    def __len__(self):
+        return len(self.filas)
+    
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return TablaFilas(self.encabezados, self.filas[indice])
+        return dict(zip(self.encabezados, self.filas[indice]))
+    
+    def __iter__(self):
+        encabezados = self.encabezados
+        return (dict(zip(encabezados, fila)) for fila in self.filas)
+    
+    def __eq__(self, otra):
+        if isinstance(otra, TablaFilas):
+            return self.encabezados == otra.encabezados and self.filas == otra.filas
+        if isinstance(otra, list):
+            return len(self) == len(otra) and all(fila == dict_fila for fila, dict_fila in zip(self, otra))
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"TablaFilas({len(self.encabezados)} columnas, {len(self.filas)} filas)"
+    
+    def columnas(self):
+        """
+        Valores por columna, transponiendo las tuplas de una vez.
+        Los nombres repetidos se comportan igual que en los dicts de fila:
+        una sola columna, en la posición de su primera aparición y con
+        los valores de la última.
+        
+        Retorna: (nombres, {nombre: [valores]})
+        """
+        posiciones = {}
+        for posicion, nombre in enumerate(self.encabezados):
+            posiciones[nombre] = posicion
+        
+        transpuestas = list(zip(*self.filas)) if self.filas else [()] * len(self.encabezados)
+        return list(posiciones), {nombre: list(transpuestas[posicion]) for nombre, posicion in posiciones.items()}
+    
+    def como_dicts(self):
+        """La lista de dicts completa (para serializar o código antiguo)"""
+        return list(self)
@@ -0,0 +1,179 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from tabla_filas import TablaFilas
+
+# Celdas que en los cuadros del INE significan "sin casos"
+MARCADORES_CERO = {'-', '–', '—'}
+
+# Celdas que no aportan valor (se tratan como vacías)
+MARCADORES_VACIO = {'', '...', '…', 'nd', 'n.d.', 'na', 'n/a'}
+
+# Encabezados que siempre son dimensiones aunque sus valores sean números
+PALABRAS_DIMENSION = ('departamento', 'municipio', 'edad', 'grupo', 'ano', 'mes', 'dia',
+                      'causa', 'codigo', 'sexo', 'pueblo', 'estado civil', 'lugar', 'tipo')
+
+# Proporción mínima de valores numéricos para considerar una columna como conteo
+UMBRAL_NUMERICO = 0.95
+
+# Llamadas a notas al pie pegadas a un número: '12*', '12 1/', '12 (1)'
+PATRON_LLAMADA = r'\s*(\*+|\d{1,2}/|\(\d{1,2}\))$'
+
+# Números con separador de miles: '1,234', '12 345', '1,234.5'
+PATRON_MILES = r'[-+]?\d{1,3}([,\s]\d{3})+(\.\d+)?'
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', texto.lower()).strip()
+
+def columnas_desde_filas(encabezados, datos):
+    """
+    Convierte las filas en columnas. `datos` es una TablaFilas (tuplas,
+    recién extraída) o una lista de dicts (p. ej. leída de datos_completos).
+    Los nombres repetidos se comportan igual que en los dicts de fila:
+    una sola columna, en la posición de su primera aparición.
+    
+    Retorna: (nombres, {nombre: [valores]})
+    """
+    if isinstance(datos, TablaFilas):
+        return datos.columnas()
+    
+    nombres = list(dict.fromkeys(encabezados))
+    columnas = {nombre: [fila.get(nombre) for fila in datos] for nombre in nombres}
+    return nombres, columnas
+
+def columnas_de_medida(estructura_tabla):
+    """
+    Nombres planos de las columnas que el encabezado marca como medidas:
+    en tablas agrupadas, las que cuelgan de un grupo con subtítulos
+    (p. ej. 'Año de ocurrencia_2019', 'Sexo_Hombres').
+    """
+    if estructura_tabla.get('tipo') != 'agrupado':
+        return set()
+    
+    return {
+        f"{titulo}_{subtitulo}"
+        for titulo, valores in estructura_tabla['encabezados'].items()
+        if isinstance(valores, list)
+        for subtitulo in valores
+    }
+
+def es_dimension_por_nombre(nombre):
+    """True si el encabezado nombra una dimensión (departamento, edad, causa, ...)"""
+    normalizado = _normalizar(nombre)
+    return any(normalizado.startswith(palabra) for palabra in PALABRAS_DIMENSION)
+
+def entero_compacto(serie):
+    """int16/int32/int64 más pequeño que contiene la serie (nullable si hay vacíos)"""
+    minimo, maximo = (serie.min(), serie.max()) if serie.notna().any() else (0, 0)
+    
+    for tipo, tipo_nullable in ((np.int16, 'Int16'), (np.int32, 'Int32'), (np.int64, 'Int64')):
+        info = np.iinfo(tipo)
+        if info.min <= minimo and maximo <= info.max:
+            break
+    
+    if serie.isna().any():
+        return serie.astype(tipo_nullable)
+    return serie.astype(tipo)
+
+def texto_numerico(texto):
+    """
+    Texto de las celdas listo para pd.to_numeric: sin llamadas a notas al pie
+    y sin separadores de miles ('1,234*' -> '1234'). Los demás textos no cambian.
+    """
+    texto = texto.str.replace(PATRON_LLAMADA, '', regex=True)
+    miles = texto.str.fullmatch(PATRON_MILES)
+    return texto.mask(miles, texto.str.replace(r'[,\s]', '', regex=True))
+
+def tipar_columna(valores, es_medida=False, es_dimension=False):
+    """
+    Convierte una columna de valores crudos en una Serie con tipo compacto.
+    
+    - Conteos: enteros (int16/int32, 'Int32' si hay vacíos); '-' se toma como 0
+      y los textos como '1,234' o '12*' se leen como números (texto_numerico)
+    - Medidas no enteras: float32
+    - Dimensiones de texto: category
+    - Dimensiones numéricas (edad, año, código): enteros compactos, solo si
+      todos sus valores no vacíos son números
+    
+    Todo se hace con operaciones vectorizadas de pandas.
+    """
+    serie = pd.Series(valores, dtype=object)
+    texto = serie.astype(str).str.strip()
+    texto_min = texto.str.lower()
+    
+    vacios = serie.isna() | texto_min.isin(MARCADORES_VACIO)
+    ceros = texto.isin(MARCADORES_CERO)
+    
+    # Las etiquetas de una dimensión se leen tal cual: '12*' no es el código 12
+    crudos = serie if es_dimension and not es_medida else texto_numerico(texto)
+    numeros = pd.to_numeric(crudos.where(~(vacios | ceros)), errors='coerce')
+    candidatos = int((~(vacios | ceros)).sum())
+    convertibles = int(numeros.notna().sum())
+    
+    numerica = candidatos > 0 and convertibles / candidatos >= UMBRAL_NUMERICO
+    if es_medida and candidatos == 0 and ceros.any():
+        numerica = True  # columna de conteos con solo '-'
+    
+    if numerica and (es_medida or not es_dimension):
+        numeros = numeros.mask(ceros, 0)
+        if np.all(np.mod(numeros.dropna(), 1) == 0):
+            return entero_compacto(numeros)
+        return numeros.astype(np.float32)
+    
+    # Una dimensión solo pasa a entero si todos sus valores son números: con
+    # etiquetas como 'Total', 'Menor de 1 año' o 'Ignorado' queda como category
+    if (es_dimension and candidatos > 0 and convertibles == candidatos and not ceros.any()
+            and np.all(np.mod(numeros.dropna(), 1) == 0)):
+        return entero_compacto(numeros)
+    
+    # Dimensión de texto
+    return texto.where(~serie.isna()).astype('category')
+
+def _es_dimension(posicion, nombre, medidas):
+    return nombre not in medidas and (posicion == 0 or es_dimension_por_nombre(nombre))
+
+def perdidos_al_tipar(encabezados, datos, df):
+    """
+    Celdas que tenían contenido en la hoja y quedaron vacías en `df` (la
+    tabla ya tipada con tipar_tabla): etiquetas de dimensión o conteos que
+    no se pudieron leer como números. Se calcula con los valores crudos,
+    antes de que el tipado los pierda.
+    
+    Retorna: {columna: cantidad} solo con las columnas que perdieron valores
+    """
+    nombres, columnas = columnas_desde_filas(encabezados, datos)
+    
+    perdidos = {}
+    for nombre in nombres:
+        crudos = pd.Series(columnas[nombre], dtype=object)
+        con_valor = crudos.notna() & ~crudos.astype(str).str.strip().str.lower().isin(MARCADORES_VACIO)
+        cantidad = int((con_valor.to_numpy() & df[nombre].isna().to_numpy()).sum())
+        if cantidad:
+            perdidos[nombre] = cantidad
+    
+    return perdidos
+
+def tipar_tabla(encabezados, datos, estructura_tabla):
+    """
+    Etapa de tipado: convierte las filas extraídas en un DataFrame con
+    tipos compactos, usando la estructura de encabezados para distinguir
+    dimensiones de medidas.
+    
+    La primera columna y las columnas con nombre de dimensión
+    (departamento, edad, causa, ...) se tratan como dimensiones; las
+    columnas bajo un grupo con subtítulos se tratan como medidas.
+    """
+    nombres, columnas = columnas_desde_filas(encabezados, datos)
+    medidas = columnas_de_medida(estructura_tabla)
+    
+    tipadas = {}
+    for posicion, nombre in enumerate(nombres):
+        es_medida = nombre in medidas
+        es_dimension = _es_dimension(posicion, nombre, medidas)
+        tipadas[nombre] = tipar_columna(columnas[nombre], es_medida, es_dimension)
+    
+    return pd.DataFrame(tipadas, columns=nombres)
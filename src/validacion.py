@@ -0,0 +1,497 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from almacen_columnar import DIRECTORIO_COLUMNAR, cargar_indice, leer_tabla
+from armonizar import COLUMNAS_FIJAS, COLUMNAS_MEDIDA, tabla_larga
+from cubo import EJES_CUBO, SIN_DATO, TODOS, TOTAL, es_total, ubicar_en_ejes
+from indice_titulos import normalizar_titulo
+
+RUTA_VALIDACION = 'data/json/validacion.json'
+
+# Cambia cuando cambian las verificaciones (el pipeline vuelve a validar aunque las tablas no cambien)
+VERSION_VALIDACION = 3
+
+# Temáticas que cuentan solo una parte de las defunciones del año (no se comparan entre tablas)
+TEMATICAS_PARCIALES = ('infantiles', 'neonatales', 'postneonatales', 'causas externas')
+
+# Medidas que no se suman (su total no es la suma de las partes)
+MEDIDAS_NO_ADITIVAS = ('tasa', 'porcentaje', '%', 'promedio', 'razon', 'indice')
+
+# Dimensiones con los mismos valores en todas las temáticas que las desglosan
+DIMENSIONES_CERRADAS = ('departamento', 'departamento_residencia', 'departamento_ocurrencia', 'municipio', 'sexo',
+                        'mes', 'dia')
+
+# Diferencia tolerada: absoluta (redondeos) o relativa al valor de referencia
+TOLERANCIA_ABSOLUTA = 0.5
+TOLERANCIA_RELATIVA = 0.001
+
+# Proporción de totales de medida que no cuadran en una tabla a partir de la cual se sospecha corrimiento
+UMBRAL_CORRIMIENTO = 0.5
+
+# Proporción de valores numéricos para tratar una dimensión como numérica (o como texto, por debajo de 1 - umbral)
+UMBRAL_NUMERICA = 0.9
+
+# Cuántos casos mostrar por verificación en la consola
+MAX_EJEMPLOS = 5
+
+VERIFICACIONES = {
+    'totales_publicados': "Totales publicados vs. suma de sus partes",
+    'totales_entre_tablas': "Totales del año entre temáticas",
+    'conteos': "Valores distintos por dimensión entre temáticas",
+    'corrimientos': "Posibles corrimientos de columnas",
+    'valores_perdidos': "Valores perdidos al tipar"
+}
+
+def es_parcial(tematica):
+    """True si la temática cubre solo una parte de las defunciones (infantiles, causas externas, ...)"""
+    normalizada = normalizar_titulo(tematica)
+    return any(palabra in normalizada for palabra in TEMATICAS_PARCIALES)
+
+def _no_cuadra(valor, referencia):
+    return np.abs(valor - referencia) > np.maximum(TOLERANCIA_ABSOLUTA, TOLERANCIA_RELATIVA * np.abs(referencia))
+
+def _codificar(serie):
+    """
+    Códigos enteros de una columna de texto (-1 = la tabla no tiene esa
+    dimensión) y, por fila, si es un total ('Total República', 'Ambos
+    sexos', ...; también la dimensión ausente) y si su valor es un número.
+    Cada valor distinto se revisa una sola vez.
+    """
+    texto = serie.astype('string').str.strip()
+    codigos, unicos = pd.factorize(texto.replace('', pd.NA))
+    unicos = pd.Series(np.asarray(unicos, dtype=object))
+    
+    # La última posición corresponde al código -1 (vacío)
+    total = np.append(unicos.map(lambda valor: es_total(normalizar_titulo(valor))).to_numpy(dtype=bool), True)
+    numero = np.append(pd.to_numeric(unicos, errors='coerce').notna().to_numpy(dtype=bool), False)
+    return codigos, total[codigos], numero[codigos]
+
+def _marcar_vacios(larga):
+    """
+    Copia de la tabla larga con las celdas vacías de sus dimensiones como
+    SIN_DATO, para no confundirlas (al concatenar tablas) con una dimensión
+    que la tabla no tiene ni contarlas como total.
+    """
+    larga = larga.copy()
+    for columna in larga.columns:
+        if columna in COLUMNAS_FIJAS + COLUMNAS_MEDIDA:
+            continue
+        texto = larga[columna].astype('string').str.strip()
+        larga[columna] = texto.mask(texto.fillna('').eq(''), SIN_DATO).astype(object)
+    return larga
+
+def cargar_tablas(indice, estructura, directorio=DIRECTORIO_COLUMNAR):
+    """
+    Lee una sola vez cada (temática, año) del índice columnar.
+    
+    Retorna (larga, filas):
+    - larga: todas las tablas en formato largo (tabla_larga), concatenadas
+    - filas: las mismas celdas ubicadas en los ejes del cubo (filas_cubo),
+      con la columna tematica
+    """
+    largas = []
+    # Años de una temática con las mismas columnas: se ubican en los ejes de una vez
+    por_diseño = {}
+    for tematica, años in indice.items():
+        for año, entrada in años.items():
+            if entrada['total_filas'] == 0:
+                continue
+            df = leer_tabla(entrada, directorio)
+            larga = tabla_larga(df, tematica, año, estructura.get(tematica, {}).get(año, {}))
+            largas.append(_marcar_vacios(larga))
+            por_diseño.setdefault((tematica, tuple(larga.columns)), []).append(larga)
+    
+    if not largas:
+        return None, None
+    
+    partes = []
+    for (tematica, _), tablas in por_diseño.items():
+        filas = ubicar_en_ejes(pd.concat(tablas, ignore_index=True), tematica)
+        filas.insert(0, 'tematica', tematica)
+        partes.append(filas)
+    
+    return pd.concat(largas, ignore_index=True, sort=False), pd.concat(partes, ignore_index=True)
+
+def totales_por_tabla(filas):
+    """
+    Total del año y totales por departamento, sexo y grupo de edad de cada
+    (temática, año), con las mismas reglas que cubo.resumir pero para
+    todas las tablas a la vez.
+    
+    Retorna DataFrame: tematica, año, nivel, departamento, sexo, grupo_edad, valor
+    (TODOS en los ejes sumados)
+    """
+    llaves = ['tematica', 'año']
+    tabla = filas.groupby(llaves, sort=False).ngroup().to_numpy()
+    totales = {eje: (filas[eje] == TOTAL).to_numpy() for eje in ('categoria', 'causa') + EJES_CUBO}
+    
+    partes = []
+    for por in ((),) + tuple((eje,) for eje in EJES_CUBO):
+        # Cada eje fuera de `por` se reduce a su fila TOTAL en las tablas que la publican
+        incluidas = np.ones(len(filas), dtype=bool)
+        for eje in ('categoria', 'causa') + EJES_CUBO:
+            if eje in por:
+                continue
+            publica = (np.bincount(tabla, weights=totales[eje] & incluidas) > 0)[tabla]
+            incluidas &= totales[eje] | ~publica
+        for eje in por:
+            incluidas &= ~totales[eje]
+        
+        parte = filas[incluidas].groupby(llaves + list(por), sort=False)['valor'].sum().reset_index()
+        for eje in EJES_CUBO:
+            if eje not in por:
+                parte[eje] = TODOS
+        parte['nivel'] = por[0] if por else 'año'
+        partes.append(parte)
+    
+    return pd.concat(partes, ignore_index=True)
+
+def marcar(larga):
+    """
+    Tabla de trabajo para las verificaciones, una fila por celda de medida
+    aditiva: tematica, año, valor y, por cada dimensión más 'grupo' y
+    'medida', su código entero (<campo>), si es total (<campo>_total) y si
+    es un número (<campo>_numero).
+    
+    Retorna (marcas, dimensiones)
+    """
+    dimensiones = [columna for columna in larga.columns if columna not in COLUMNAS_FIJAS + COLUMNAS_MEDIDA]
+    
+    # Solo conteos: las tasas y porcentajes no suman
+    nombres = (larga['grupo'].fillna('').astype(str) + ' ' + larga['medida'].fillna('').astype(str))
+    no_aditivas = {nombre for nombre in nombres.unique()
+                   if any(palabra in normalizar_titulo(nombre) for palabra in MEDIDAS_NO_ADITIVAS)}
+    larga = larga[~nombres.isin(no_aditivas).to_numpy()]
+    
+    marcas = pd.DataFrame({
+        'tematica': pd.Categorical(larga['tematica']),
+        'año': larga['año'].to_numpy(),
+        'valor': larga['valor'].fillna(0).to_numpy(dtype=np.float64)
+    })
+    for campo in dimensiones + ['grupo', 'medida']:
+        codigos, total, numero = _codificar(larga[campo])
+        marcas[campo] = codigos
+        marcas[f'{campo}_total'] = total
+        marcas[f'{campo}_numero'] = numero
+    
+    return marcas, dimensiones
+
+def totales_publicados(marcas, dimensiones):
+    """
+    Compara cada total publicado con la suma de sus partes, en todas las
+    tablas a la vez: para cada dimensión (y para las columnas de medida,
+    p. ej. 'Total' frente a 'Hombres' + 'Mujeres'), las filas que
+    coinciden en todo lo demás forman un grupo; si el grupo tiene una sola
+    fila de total y al menos una parte, se comparan ('Total República' con
+    la suma de los departamentos, 'Ambos sexos' con hombres y mujeres, ...).
+    
+    Retorna DataFrame: tematica, año, eje, revisados, fallas, diferencia_maxima
+    """
+    campos = dimensiones + ['grupo', 'medida']
+    resultados = []
+    for eje in dimensiones + ['medida']:
+        llaves = ['tematica', 'año'] + [campo for campo in campos if campo != eje]
+        total = marcas[f'{eje}_total'].to_numpy()
+        valor = marcas['valor'].to_numpy()
+        
+        grupos = pd.DataFrame({
+            **{llave: marcas[llave] for llave in llaves},
+            'publicado': np.where(total, valor, 0.0),
+            'suma': np.where(total, 0.0, valor),
+            'filas_total': total,
+            'partes': ~total
+        }).groupby(llaves, sort=False, observed=True).sum()
+        grupos = grupos[(grupos['filas_total'] == 1) & (grupos['partes'] > 0)]
+        if grupos.empty:
+            continue
+        
+        diferencia = np.abs(grupos['publicado'] - grupos['suma'])
+        revision = pd.DataFrame({
+            'revisados': 1,
+            'fallas': _no_cuadra(grupos['suma'], grupos['publicado']),
+            'diferencia_maxima': diferencia.where(_no_cuadra(grupos['suma'], grupos['publicado']), 0.0)
+        }).groupby(level=['tematica', 'año'], observed=True).agg(
+            {'revisados': 'sum', 'fallas': 'sum', 'diferencia_maxima': 'max'})
+        revision['eje'] = eje
+        resultados.append(revision.reset_index())
+    
+    columnas = ['tematica', 'año', 'eje', 'revisados', 'fallas', 'diferencia_maxima']
+    if not resultados:
+        return pd.DataFrame(columns=columnas)
+    return pd.concat(resultados, ignore_index=True)[columnas]
+
+def totales_entre_tablas(totales):
+    """
+    Compara entre temáticas los totales de un mismo año (del año y por
+    departamento, sexo y grupo de edad): todas cuentan las mismas
+    defunciones, así que cada valor se compara con la mediana de las
+    temáticas que lo publican. Las temáticas parciales no participan.
+    
+    Retorna DataFrame: tematica, año, nivel, revisados, fallas, diferencia_maxima
+    """
+    columnas = ['tematica', 'año', 'nivel', 'revisados', 'fallas', 'diferencia_maxima']
+    parciales = {tematica for tematica in totales['tematica'].unique() if es_parcial(tematica)}
+    totales = totales[~totales['tematica'].isin(parciales)]
+    
+    llaves = ['año', 'nivel'] + list(EJES_CUBO)
+    por_valor = totales.groupby(llaves, sort=False)['valor']
+    referencia = por_valor.transform('median')
+    comparables = (por_valor.transform('size') >= 2).to_numpy()
+    if not comparables.any():
+        return pd.DataFrame(columns=columnas)
+    
+    fallas = _no_cuadra(totales['valor'], referencia)
+    revision = pd.DataFrame({
+        'tematica': totales['tematica'],
+        'año': totales['año'],
+        'nivel': totales['nivel'],
+        'revisados': 1,
+        'fallas': fallas,
+        'diferencia_maxima': np.abs(totales['valor'] - referencia).where(fallas, 0.0)
+    })[comparables]
+    return revision.groupby(['tematica', 'año', 'nivel'], sort=False).agg(
+        {'revisados': 'sum', 'fallas': 'sum', 'diferencia_maxima': 'max'}).reset_index()[columnas]
+
+def conteos(marcas, dimensiones):
+    """
+    Valores distintos (sin totales) de cada dimensión cerrada por
+    (temática, año), comparados con el valor más frecuente entre las
+    temáticas del mismo año: 22 departamentos en una tabla y 21 en otra
+    indican filas perdidas o leídas de más.
+    
+    Retorna DataFrame: tematica, año, dimension, valores, esperado
+    """
+    columnas = ['tematica', 'año', 'dimension', 'valores', 'esperado']
+    partes = []
+    for dimension in DIMENSIONES_CERRADAS:
+        if dimension not in dimensiones:
+            continue
+        filas = marcas.loc[~marcas[f'{dimension}_total'], ['tematica', 'año', dimension]]
+        valores = filas.drop_duplicates().groupby(['tematica', 'año'], observed=True).size()
+        valores = valores.rename('valores').reset_index()
+        valores['dimension'] = dimension
+        partes.append(valores)
+    
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    
+    valores = pd.concat(partes, ignore_index=True)
+    # El más frecuente; en empate, el mayor
+    frecuencias = valores.groupby(['año', 'dimension', 'valores']).size().rename('frecuencia').reset_index()
+    esperado = frecuencias.sort_values(['frecuencia', 'valores'], ascending=False).drop_duplicates(
+        ['año', 'dimension']).rename(columns={'valores': 'esperado'})[['año', 'dimension', 'esperado']]
+    valores = valores.merge(esperado, on=['año', 'dimension'])
+    return valores[valores['valores'] != valores['esperado']][columnas].reset_index(drop=True)
+
+def corrimientos(marcas, dimensiones, publicados):
+    """
+    Señales de encabezados mal detectados que corren las columnas:
+    - en la mayoría de filas de una tabla la columna de total no es la
+      suma de las demás medidas (cada medida quedó bajo otro encabezado)
+    - una dimensión con números en un año y texto en los demás años de la
+      temática (una columna de conteos quedó como dimensión o al revés)
+    
+    Retorna DataFrame: tematica, año, motivo
+    """
+    columnas = ['tematica', 'año', 'motivo']
+    avisos = []
+    
+    medidas = publicados[publicados['eje'] == 'medida']
+    sospechosas = medidas[(medidas['revisados'] >= 3)
+                          & (medidas['fallas'] >= UMBRAL_CORRIMIENTO * medidas['revisados'])]
+    for fila in sospechosas.itertuples(index=False):
+        avisos.append((fila.tematica, fila.año,
+                       f"el total de las medidas no cuadra en {fila.fallas} de {fila.revisados} filas"))
+    
+    for dimension in dimensiones:
+        presentes = marcas[dimension].to_numpy() >= 0
+        if not presentes.any():
+            continue
+        proporcion = pd.DataFrame({
+            'tematica': marcas['tematica'][presentes],
+            'año': marcas['año'][presentes],
+            'numero': marcas[f'{dimension}_numero'][presentes]
+        }).groupby(['tematica', 'año'], observed=True)['numero'].mean().rename('proporcion').reset_index()
+        proporcion['mediana'] = proporcion.groupby('tematica', observed=True)['proporcion'].transform('median')
+        proporcion['años'] = proporcion.groupby('tematica', observed=True)['año'].transform('size')
+        
+        numerica = ((proporcion['años'] >= 2) & (proporcion['proporcion'] >= UMBRAL_NUMERICA)
+                    & (proporcion['mediana'] <= 1 - UMBRAL_NUMERICA))
+        for fila in proporcion[numerica].itertuples(index=False):
+            avisos.append((fila.tematica, fila.año,
+                           f"'{dimension}' tiene números este año y texto en los demás"))
+    
+    return pd.DataFrame(avisos, columns=columnas)
+
+def valores_perdidos(indice):
+    """
+    Celdas (de dimensión o de medida) que tenían contenido en la hoja y
+    quedaron vacías al tipar ('perdidos' de cada entrada del índice, calculado en la
+    extracción con los valores crudos). Las entradas de una extracción
+    anterior sin ese dato no se revisan.
+    
+    Retorna lista de dicts: tematica, año, columna, perdidos
+    """
+    return [
+        {'tematica': tematica, 'año': año, 'columna': columna, 'perdidos': cantidad}
+        for tematica, años in indice.items()
+        for año, entrada in años.items()
+        for columna, cantidad in (entrada.get('perdidos') or {}).items()
+    ]
+
+def _registros(df):
+    """Filas de un resultado como lista de dicts para el JSON (años como texto)"""
+    registros = []
+    for registro in df.to_dict('records'):
+        registro = {clave: (valor.item() if isinstance(valor, np.generic) else valor)
+                    for clave, valor in registro.items()}
+        registro['año'] = str(registro['año'])
+        registros.append(registro)
+    return registros
+
+def validar(indice, estructura, directorio=DIRECTORIO_COLUMNAR):
+    """
+    Verificaciones de consistencia entre tablas sobre todas las temáticas
+    y años del índice columnar, en una sola pasada de lectura.
+    
+    Retorna el reporte:
+        {
+            'resumen': {'tablas', 'celdas', 'segundos', 'avisos': {verificación: n}},
+            verificación: [casos que no cuadran, ...]
+        }
+    Las verificaciones de totales solo listan los (temática, año, eje)
+    con alguna falla.
+    """
+    inicio = time.perf_counter()
+    tablas = sum(1 for años in indice.values() for entrada in años.values() if entrada['total_filas'] > 0)
+    larga, filas = cargar_tablas(indice, estructura, directorio)
+    
+    resultados = {verificacion: [] for verificacion in VERIFICACIONES}
+    celdas = 0
+    if larga is not None:
+        marcas, dimensiones = marcar(larga)
+        celdas = len(marcas)
+        
+        publicados = totales_publicados(marcas, dimensiones)
+        entre_tablas = totales_entre_tablas(totales_por_tabla(filas))
+        resultados['totales_publicados'] = _registros(publicados[publicados['fallas'] > 0])
+        resultados['totales_entre_tablas'] = _registros(entre_tablas[entre_tablas['fallas'] > 0])
+        resultados['conteos'] = _registros(conteos(marcas, dimensiones))
+        resultados['corrimientos'] = _registros(corrimientos(marcas, dimensiones, publicados))
+    resultados['valores_perdidos'] = valores_perdidos(indice)
+    
+    reporte = {
+        'resumen': {
+            'tablas': tablas,
+            'celdas': celdas,
+            'segundos': round(time.perf_counter() - inicio, 3),
+            'avisos': {verificacion: len(casos) for verificacion, casos in resultados.items()}
+        }
+    }
+    reporte.update(resultados)
+    return reporte
+
+def total_avisos(reporte):
+    return sum(reporte['resumen']['avisos'].values())
+
+def cargar_reporte(ruta=RUTA_VALIDACION):
+    """Reporte guardado o None si no existe o no se puede leer"""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            reporte = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return reporte if all(verificacion in reporte for verificacion in VERIFICACIONES) else None
+
+def guardar_reporte(reporte, ruta=RUTA_VALIDACION):
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+
+def _describir(verificacion, caso):
+    if verificacion == 'totales_publicados':
+        return (f"eje {caso['eje']}: {caso['fallas']} de {caso['revisados']} totales no cuadran "
+                f"(diferencia máxima {caso['diferencia_maxima']:,.0f})")
+    if verificacion == 'totales_entre_tablas':
+        return (f"{caso['nivel']}: {caso['fallas']} de {caso['revisados']} totales difieren de las demás "
+                f"temáticas (diferencia máxima {caso['diferencia_maxima']:,.0f})")
+    if verificacion == 'conteos':
+        return f"{caso['dimension']}: {caso['valores']} valores, las demás temáticas tienen {caso['esperado']}"
+    if verificacion == 'valores_perdidos':
+        return f"'{caso['columna']}': {caso['perdidos']} valores quedaron vacíos al tipar"
+    return caso['motivo']
+
+def imprimir_reporte(reporte, ejemplos=MAX_EJEMPLOS):
+    """Una línea por verificación y hasta `ejemplos` casos de cada una"""
+    resumen = reporte['resumen']
+    for verificacion, titulo in VERIFICACIONES.items():
+        casos = reporte[verificacion]
+        if not casos:
+            print(f"  ✓ {titulo}: sin avisos")
+            continue
+        
+        print(f"  ⚠ {titulo}: {len(casos)} avisos")
+        for caso in casos[:ejemplos]:
+            print(f"      {caso['año']} {caso['tematica'][:50]}... {_describir(verificacion, caso)}")
+        if len(casos) > ejemplos > 0:
+            print(f"      ... y {len(casos) - ejemplos} más")
+    
+    print(f"\n  {resumen['tablas']} tablas, {resumen['celdas']:,} celdas revisadas en {resumen['segundos']:.2f} s")
+
+def main(ruta=RUTA_VALIDACION, ejemplos=MAX_EJEMPLOS, estricto=False):
+    estructura_json = 'data/json/estructura_completa.json'
+    
+    print("=" * 80)
+    print("VALIDANDO CONSISTENCIA ENTRE TABLAS")
+    print("=" * 80)
+    
+    indice = cargar_indice()
+    if not indice:
+        print(f"\n❌ Error: no hay índice columnar en {DIRECTORIO_COLUMNAR}. Ejecuta primero extraer_datos.py")
+        return
+    
+    if not os.path.exists(estructura_json):
+        print(f"\n❌ Error: {estructura_json} no existe")
+        return
+    
+    with open(estructura_json, 'r', encoding='utf-8') as f:
+        estructura = json.load(f)
+    
+    reporte = validar(indice, estructura)
+    guardar_reporte(reporte, ruta)
+    
+    print()
+    imprimir_reporte(reporte, ejemplos)
+    print(f"\n✓ Reporte guardado en: {ruta}")
+    
+    print(f"\n{'='*80}")
+    print("PROCESO COMPLETADO")
+    print(f"{'='*80}")
+    
+    if estricto and total_avisos(reporte):
+        sys.exit(1)
+
+def agregar_argumentos(parser):
+    """Opciones de línea de comandos (las usa también defunciones.py validar)"""
+    parser.add_argument('--salida', default=RUTA_VALIDACION, help=f"Ruta del reporte (por defecto {RUTA_VALIDACION})")
+    parser.add_argument('--ejemplos', type=int, default=MAX_EJEMPLOS,
+                        help=f"Casos a mostrar por verificación (por defecto {MAX_EJEMPLOS})")
+    parser.add_argument('--estricto', action='store_true', help="Terminar con código 1 si hay avisos")
+
+def ejecutar(args):
+    """Corre el script con los argumentos ya interpretados"""
+    main(ruta=args.salida, ejemplos=args.ejemplos, estricto=args.estricto)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica totales y conteos entre temáticas y años")
+    agregar_argumentos(parser)
+    ejecutar(parser.parse_args())
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from almacen_columnar import guardar_tabla
+from armonizar import TablaHechos, construir_hechos
+from cache_build import ManifiestoBuild
+
+TEMATICA = 'Defunciones por sexo, según departamento de residencia del difunto(a)'
+ESTRUCTURA_TABLA = {'tipo': 'simple', 'encabezados': ['Departamento', 'Total']}
+
+def tabla(totales):
+    return pd.DataFrame({
+        'Departamento': pd.Categorical(['Escuintla', 'Guatemala']),
+        'Total': totales
+    })
+
+def test_valores_nuevos_con_las_mismas_filas_reconstruyen_los_hechos(tmp_path):
+    directorio = str(tmp_path)
+    estructura = {TEMATICA: {'2015': ESTRUCTURA_TABLA, '2016': ESTRUCTURA_TABLA}}
+    manifiesto = ManifiestoBuild(str(tmp_path / 'manifiesto.json'))
+    
+    def construir(totales_2016):
+        indice = {TEMATICA: {
+            '2015': guardar_tabla(TEMATICA, '2015', tabla([10, 20]), directorio),
+            '2016': guardar_tabla(TEMATICA, '2016', tabla(totales_2016), directorio)
+        }}
+        construir_hechos(indice, estructura, directorio=directorio, manifiesto=manifiesto)
+        return TablaHechos(str(tmp_path / 'hechos')).consultar(TEMATICA, años=['2016'])['valor'].tolist()
+    
+    assert sorted(construir([30, 40])) == [30, 40]
+    # Se republica 2016 con otros valores y el mismo número de filas
+    assert sorted(construir([31, 41])) == [31, 41]
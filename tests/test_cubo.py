@@ -0,0 +1,74 @@
+import pandas as pd
+
+from almacen_columnar import guardar_tabla, leer_tabla
+from armonizar import nombre_canonico
+from cache_build import ManifiestoBuild
+from cubo import SIN_DATO, TODOS, TOTAL, construir_cubo, filas_cubo, resumir, ubicar_en_ejes
+
+TEMATICA = 'Defunciones por sexo, según departamento de residencia del difunto(a) y edades simples'
+
+def tabla_edades():
+    return pd.DataFrame({
+        'Edad': pd.Categorical(['Total', 'Menor de 1 año', '1', '2', None]),
+        'Total': [1000, 20, 500, 480, 0]
+    })
+
+def test_solo_las_etiquetas_de_total_son_total():
+    filas = filas_cubo(tabla_edades(), TEMATICA, '2015', {'tipo': 'simple', 'encabezados': ['Edad', 'Total']})
+    
+    assert filas['grupo_edad'].tolist() == [TOTAL, 'Menor de 1 año', '1', '2', SIN_DATO]
+    assert resumir(filas, ())['valor'].tolist() == [1000]
+    assert resumir(filas, ('grupo_edad',))['valor'].sum() == 1000
+
+def test_eje_que_la_tabla_no_desglosa_es_total():
+    filas = filas_cubo(tabla_edades(), TEMATICA, '2015', {'tipo': 'simple', 'encabezados': ['Edad', 'Total']})
+    
+    assert (filas['departamento'] == TOTAL).all()
+
+def test_departamento_de_residencia_y_de_ocurrencia_no_se_mezclan():
+    assert nombre_canonico('Departamento') == 'departamento'
+    assert nombre_canonico('Departamento de residencia') == 'departamento_residencia'
+    assert nombre_canonico('Departamento de ocurrencia') == 'departamento_ocurrencia'
+    
+    larga = pd.DataFrame({
+        'departamento_residencia': ['Guatemala', 'Guatemala', 'Guatemala', 'Escuintla', 'Escuintla'],
+        'grupo': ['Departamento de ocurrencia'] * 5,
+        'medida': ['Total', 'Guatemala', 'Escuintla', 'Total', 'Escuintla'],
+        'valor': [7.0, 6.0, 1.0, 3.0, 3.0],
+        'año': [2015] * 5
+    })
+    filas = ubicar_en_ejes(larga, 'Defunciones por departamento de ocurrencia, según departamento de residencia')
+    
+    # El eje departamento es el de residencia; la ocurrencia queda como categoría
+    assert filas['departamento'].tolist() == ['Guatemala'] * 3 + ['Escuintla'] * 2
+    assert filas['categoria'].tolist() == [TOTAL, 'Guatemala', 'Escuintla', TOTAL, 'Escuintla']
+    por_departamento = resumir(filas, ('departamento',)).set_index('departamento')['valor']
+    assert por_departamento.to_dict() == {'Guatemala': 7.0, 'Escuintla': 3.0}
+
+def test_reconstruccion_parcial_con_tabla_previa_vacia(tmp_path):
+    estructura_tabla = {'tipo': 'simple', 'encabezados': ['Edad', 'Total']}
+    estructura = {TEMATICA: {'2015': estructura_tabla, '2016': estructura_tabla}}
+    directorio = str(tmp_path)
+    
+    def guardar(año, df):
+        return guardar_tabla(TEMATICA, año, df, directorio)
+    
+    def totales(indice_cubo):
+        cubo = leer_tabla(indice_cubo['agregados'], str(tmp_path / 'cubo'))
+        cubo = cubo[(cubo[['departamento', 'sexo', 'grupo_edad']] == TODOS).all(axis=1)]
+        return dict(zip(cubo['año'].tolist(), cubo['valor'].tolist()))
+    
+    indice = {TEMATICA: {'2015': guardar('2015', tabla_edades()), '2016': guardar('2016', tabla_edades())}}
+    manifiesto = ManifiestoBuild(str(tmp_path / 'manifiesto.json'))
+    # Sin causas, la tabla de causas guardada queda vacía
+    assert construir_cubo(indice, estructura, directorio=directorio, manifiesto=manifiesto)['causas']['total_filas'] == 0
+    
+    # Solo cambia 2016: el resto se toma de las tablas guardadas
+    cambiada = tabla_edades()
+    cambiada['Total'] = [2000, 40, 1000, 960, 0]
+    indice[TEMATICA]['2016'] = guardar('2016', cambiada)
+    indice_cubo = construir_cubo(indice, estructura, directorio=directorio, manifiesto=manifiesto)
+    
+    assert totales(indice_cubo) == {2015: 1000, 2016: 2000}
+    assert totales(indice_cubo) == totales(construir_cubo(indice, estructura, forzar=True, directorio=directorio,
+                                                          manifiesto=manifiesto))
@@ -0,0 +1,35 @@
+import pytest
+
+from escritor_json import EscritorDatosJSON, cargar_datos_previos
+from tabla_filas import TablaFilas
+
+def bloques():
+    encabezados = ['Departamento', 'Total']
+    return {
+        ('Defunciones por sexo', '2015'): {
+            'encabezados': encabezados,
+            'datos': TablaFilas(encabezados, [('Guatemala', 10), ('Escuintla', 4)]),
+            'total_filas': 2,
+            'tipo_tabla': 'simple',
+            'hoja': 'Cuadro 1'
+        },
+        ('Defunciones por sexo', '2016'): {
+            'encabezados': encabezados,
+            'datos': [],
+            'total_filas': 0,
+            'tipo_tabla': 'simple',
+            'hoja': 'Cuadro 1'
+        }
+    }
+
+@pytest.mark.parametrize('modo', ['indentado', 'compacto', 'jsonl'])
+def test_tablas_vacias_se_recuperan(tmp_path, modo):
+    ruta = str(tmp_path / ('datos_completos.jsonl' if modo == 'jsonl' else 'datos_completos.json'))
+    with EscritorDatosJSON(ruta, modo) as escritor:
+        for (tematica, año), bloque in bloques().items():
+            escritor.agregar(tematica, año, bloque)
+    
+    previos = cargar_datos_previos(ruta)
+    
+    for (tematica, año), bloque in bloques().items():
+        assert previos[tematica][año] == bloque
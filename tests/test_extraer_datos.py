@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+
+import extraer_datos
+import pipeline
+from extraer_datos import es_pie_de_tabla, iterar_filas
+from libros_sinteticos import generar_libros
+
+def hoja(filas, fila_inicio=10):
+    ws = Workbook().active
+    for numero, fila in enumerate(filas, fila_inicio):
+        for columna, valor in enumerate(fila, 1):
+            ws.cell(row=numero, column=columna, value=valor)
+    return ws
+
+def test_filas_de_datos_con_rotulo_de_llamada_no_cortan_la_tabla():
+    filas = [
+        ('Guatemala', 120, 80),
+        ('*Escuintla', 40, 25),
+        ('12) Sacatepéquez', 30, '15'),
+        ('1/ Petén', 10, 5),
+        ('Fuente: INE, Estadísticas Vitales', None, None),
+        ('Jutiapa', 1, 1)
+    ]
+    
+    leidas = list(iterar_filas(hoja(filas), 3))
+    
+    assert [fila[0] for fila in leidas] == ['Guatemala', '*Escuintla', '12) Sacatepéquez', '1/ Petén']
+
+def test_pie_sin_numeros():
+    assert es_pie_de_tabla(('* Cifras preliminares', None, None), 3)
+    assert es_pie_de_tabla((None, '1/ Incluye ignorados', 'ver anexo'), 3)
+    assert not es_pie_de_tabla(('*Escuintla', None, '1,234'), 3)
+    # Lo que queda fuera de la tabla no cuenta
+    assert es_pie_de_tabla(('Nota: revisado', None, None, 2024), 3)
+
+def test_una_falla_no_deja_archivos_a_medio_escribir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generar_libros('data/defunciones', ['2015'], filas=20, columnas=4, hojas=3)
+    pipeline.main(formato='ambos', validar_tablas=False)
+    anteriores = sorted(os.listdir('data/json'))
+    
+    def fallar(*args, **kwargs):
+        raise RuntimeError('falla al tipar')
+    monkeypatch.setattr(extraer_datos, 'tabla_tipada', fallar)
+    
+    with pytest.raises(RuntimeError):
+        extraer_datos.main(forzar=True, formato='ambos')
+    
+    assert sorted(os.listdir('data/json')) == anteriores
@@ -0,0 +1,43 @@
+from indice_titulos import IndiceTitulos, similitud_texto
+
+TEMATICA = 'Defunciones por sexo, según departamento de residencia del difunto(a) y grupos de edad'
+
+def mejor_hoja_sin_indice(titulos, tematica, umbral=0.75):
+    """La búsqueda original: SequenceMatcher contra todas las hojas"""
+    mejores = [(similitud_texto(tematica, titulo), nombre_hoja) for nombre_hoja, titulo in titulos.items()]
+    mejores = [mejor for mejor in mejores if mejor[0] >= umbral]
+    return max(mejores)[1] if mejores else None
+
+def test_titulos_casi_repetidos_dan_la_misma_hoja_que_sin_indice():
+    # Las mismas frases en otro orden tienen casi todos los trigramas (Dice alto)
+    # pero poca similitud de SequenceMatcher; el título con erratas es al revés
+    titulos = {
+        'Cuadro 1': 'y grupos de edad, del difunto(a), Defunciones por sexo, según departamento de residencia',
+        'Cuadro 2': 'según departamento de residencia, Defunciones por sexo, del difunto(a), y grupos de edad',
+        'Cuadro 3': 'y grupos de edad, del difunto(a), según departamento de residencia, Defunciones por sexo',
+        'Cuadro 4': 'y grupos de edad, del difunto(a), Defunciones por sexo, según departamento de residencia',
+        'Cuadro 5': 'según departamento de residencia, del difunto(a), y grupos de edad, Defunciones por sexo',
+        'Cuadro 6': 'según departamento de residencia, del difunto(a), y grupos de edad, Defunciones por sexo',
+        'Cuadro 7': 'zefuncixnes pox sexo,qsegún xepartaqento dq residxncia dzl difuqto(a) x grupox de edxd'
+    }
+    indice = IndiceTitulos(titulos)
+    
+    assert 'Cuadro 7' not in [nombre_hoja for _, nombre_hoja in indice.candidatos(TEMATICA)]
+    assert indice.mejor_hoja(TEMATICA) == mejor_hoja_sin_indice(titulos, TEMATICA) == 'Cuadro 7'
+
+def test_variantes_de_un_titulo():
+    variantes = [
+        'Defunciones por sexo, según departamento de residencia del difunto(a)',
+        'Defunciones por sexo, según departamento de ocurrencia',
+        'Defunciones por sexo y grupos de edad, según departamento de residencia',
+        'Defunciones por grupos de edad, según departamento de residencia del difunto(a)',
+        'Defunciones por sexo, según municipio de residencia del difunto(a)',
+        'Defunciones por mes de ocurrencia, según departamento de residencia',
+        'Defunciones por sexo, según departamento de residencia y municipio',
+        'Defunciones fetales por sexo, según departamento de residencia'
+    ]
+    titulos = {f'Cuadro {n}': titulo for n, titulo in enumerate(variantes, 1)}
+    indice = IndiceTitulos(titulos)
+    
+    for tematica in variantes + [TEMATICA]:
+        assert indice.mejor_hoja(tematica) == mejor_hoja_sin_indice(titulos, tematica)
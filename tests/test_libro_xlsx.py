@@ -0,0 +1,158 @@
+import re
+import zipfile
+from datetime import date, datetime
+
+import openpyxl
+import pytest
+from openpyxl.utils.datetime import CALENDAR_MAC_1904
+
+from libro_xlsx import LibroXLSX, comparar_con_openpyxl
+
+def cuadro(ws):
+    """Hoja con el diseño de los cuadros: título, encabezados en filas 8-9 y datos desde la 10"""
+    ws['A1'] = 'Cuadro 1'
+    ws['A2'] = 'Defunciones por sexo, según departamento de residencia'
+    ws['A8'] = 'Departamento'
+    ws['B8'] = 'Sexo'
+    ws['B9'] = 'Hombres'
+    ws['C9'] = 'Mujeres'
+    ws.merge_cells('A8:A9')
+    ws.merge_cells('B8:C8')
+    for fila, (departamento, hombres, mujeres) in enumerate(
+            [('Total República', 30, 25), ('Guatemala', 20, 15), ('Petén', 10, 10)], start=10):
+        ws.cell(fila, 1, departamento)
+        ws.cell(fila, 2, hombres)
+        ws.cell(fila, 3, mujeres)
+
+def guardar(wb, tmp_path, nombre='libro.xlsx'):
+    ruta = tmp_path / nombre
+    wb.save(ruta)
+    return str(ruta)
+
+def reescribir(ruta, cambios):
+    """Reemplaza partes del libro: {nombre: (xml -> xml)}; las partes que no existen se crean desde ''"""
+    with zipfile.ZipFile(ruta) as origen:
+        partes = {info.filename: origen.read(info.filename).decode('utf-8') for info in origen.infolist()}
+    for nombre, cambio in cambios.items():
+        partes[nombre] = cambio(partes.get(nombre, ''))
+    with zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED) as destino:
+        for nombre, contenido in partes.items():
+            destino.writestr(nombre, contenido.encode('utf-8'))
+
+def hojas(ruta):
+    with zipfile.ZipFile(ruta) as libro:
+        return [nombre for nombre in libro.namelist() if nombre.startswith('xl/worksheets/sheet')]
+
+def reescribir_hojas(ruta, cambio):
+    reescribir(ruta, {nombre: cambio for nombre in hojas(ruta)})
+
+def a_cadenas_compartidas(ruta):
+    """
+    Pasa las cadenas en línea (las que escribe openpyxl) a xl/sharedStrings.xml,
+    como las guarda Excel; la primera cadena queda en dos tramos de texto enriquecido
+    """
+    cadenas = []
+    
+    def compartir(xml):
+        def reemplazo(m):
+            cadenas.append(m.group(2))
+            return f'<c {m.group(1)} t="s"><v>{len(cadenas) - 1}</v></c>'
+        return re.sub(r'<c ([^>]*?) ?t="inlineStr"><is><t>([^<]*)</t></is></c>', reemplazo, xml)
+    
+    cambios = {nombre: compartir for nombre in hojas(ruta)}
+    reescribir(ruta, cambios)
+    
+    elementos = [f'<si><t xml:space="preserve">{texto}</t></si>' for texto in cadenas]
+    if cadenas and ' ' in cadenas[0]:
+        inicio, resto = cadenas[0].split(' ', 1)
+        elementos[0] = f'<si><r><t xml:space="preserve">{inicio} </t></r><r><rPr><b/></rPr><t>{resto}</t></r></si>'
+    reescribir(ruta, {
+        'xl/sharedStrings.xml': lambda _: (
+            '<?xml version="1.0" encoding="UTF-8"?><sst xmlns="http://schemas.openxmlformats.org/'
+            f'spreadsheetml/2006/main" count="{len(cadenas)}" uniqueCount="{len(cadenas)}">'
+            + ''.join(elementos) + '</sst>'),
+        '[Content_Types].xml': lambda xml: xml.replace('</Types>', (
+            '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-'
+            'officedocument.spreadsheetml.sharedStrings+xml"/></Types>')),
+        'xl/_rels/workbook.xml.rels': lambda xml: xml.replace('</Relationships>', (
+            '<Relationship Id="rIdCadenas" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/sharedStrings" Target="sharedStrings.xml"/></Relationships>'))
+    })
+    return cadenas
+
+def test_cadenas_en_linea_y_combinadas(tmp_path):
+    wb = openpyxl.Workbook()
+    cuadro(wb.active)
+    wb.create_sheet('Segunda')['B3'] = 'Guatemala'
+    
+    assert comparar_con_openpyxl(guardar(wb, tmp_path)) == []
+
+def test_cadenas_compartidas(tmp_path):
+    wb = openpyxl.Workbook()
+    cuadro(wb.active)
+    wb.create_sheet('Segunda')['B3'] = 'Guatemala'
+    ruta = guardar(wb, tmp_path)
+    
+    assert len(a_cadenas_compartidas(ruta)) > 5
+    with zipfile.ZipFile(ruta) as libro:
+        assert 'inlineStr' not in libro.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    assert comparar_con_openpyxl(ruta) == []
+
+def test_filas_dispersas(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws['A1'] = 'Título'
+    ws['D5'] = 4
+    ws['B30'] = 'suelta'
+    ws['L40'] = 1.5
+    ws['A41'] = None
+    
+    assert comparar_con_openpyxl(guardar(wb, tmp_path)) == []
+
+def test_fechas_y_formatos(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws['A10'] = datetime(2020, 3, 1, 14, 30)
+    ws['B10'] = date(2019, 12, 31)
+    ws['C10'] = 0.25
+    ws['C10'].number_format = '0.00%'
+    ws['D10'] = 44000
+    ws['D10'].number_format = 'dd/mm/yyyy'
+    ws['E10'] = True
+    
+    assert comparar_con_openpyxl(guardar(wb, tmp_path)) == []
+
+def test_epoca_1904(tmp_path):
+    wb = openpyxl.Workbook()
+    wb.epoch = CALENDAR_MAC_1904
+    ws = wb.active
+    ws['A10'] = datetime(2021, 6, 15)
+    ws['B10'] = 12
+    
+    ruta = guardar(wb, tmp_path)
+    assert comparar_con_openpyxl(ruta) == []
+    
+    libro = LibroXLSX(ruta)
+    try:
+        assert list(libro[libro.sheetnames[0]].iter_rows(min_row=10, max_row=10)) == [(datetime(2021, 6, 15), 12)]
+    finally:
+        libro.close()
+
+@pytest.mark.parametrize('dimension', ['', '<dimension ref="A1:A1"/>'])
+def test_hojas_sin_dimension(tmp_path, dimension):
+    wb = openpyxl.Workbook()
+    cuadro(wb.active)
+    ruta = guardar(wb, tmp_path)
+    reescribir_hojas(ruta, lambda xml: re.sub(r'<dimension ref="[^"]*"\s*/>', dimension, xml))
+    
+    libro = LibroXLSX(ruta)
+    try:
+        hoja = libro[libro.sheetnames[0]]
+        hoja.reset_dimensions()
+        assert list(hoja.iter_rows(min_row=10, max_col=3)) == [
+            ('Total República', 30, 25), ('Guatemala', 20, 15), ('Petén', 10, 10)]
+    finally:
+        libro.close()
+    
+    if not dimension:
+        assert comparar_con_openpyxl(ruta) == []
@@ -0,0 +1,34 @@
+import os
+import threading
+
+import perfilado
+
+def trabajo(n):
+    return sum(i * i for i in range(n))
+
+def test_etapas_en_varios_hilos(tmp_path, monkeypatch):
+    # activar() reemplaza el estado del módulo; monkeypatch lo restaura al terminar
+    monkeypatch.setattr(perfilado, '_estado', perfilado._Estado())
+    perfilado.activar('escribir_columnar')
+    
+    def escribir():
+        for _ in range(50):
+            with perfilado.etapa('escribir_columnar', año='2015') as registro:
+                registro['filas'] = 1
+                trabajo(2000)
+    
+    hilos = [threading.Thread(target=escribir, name=f'escritor-{n}') for n in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    with perfilado.etapa('escribir_columnar', año='2016'):
+        trabajo(2000)
+    for hilo in hilos:
+        hilo.join()
+    
+    reporte = perfilado.guardar_reporte(str(tmp_path / 'perfil.json'), 'prueba')
+    
+    assert reporte['por_etapa']['escribir_columnar']['llamadas'] == 4 * 50 + 1
+    assert reporte['por_etapa']['escribir_columnar']['filas'] == 4 * 50
+    assert {registro['hilo'] for registro in reporte['registros']} == {f'escritor-{n}' for n in range(4)} | {
+        threading.current_thread().name}
+    assert os.path.exists(tmp_path / 'perfil_escribir_columnar.prof')
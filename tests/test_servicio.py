@@ -0,0 +1,19 @@
+import pytest
+
+from servicio import ServicioExtraccion
+
+@pytest.mark.parametrize('año', ['../otro', '..', '2015/../../otro', '', '２０１５'])
+def test_año_que_no_es_numero_se_rechaza(tmp_path, año):
+    (tmp_path / 'otro.xlsx').write_bytes(b'')
+    servicio = ServicioExtraccion(directorio_data=str(tmp_path / 'defunciones'))
+    
+    with pytest.raises(ValueError):
+        servicio.archivo_año(año)
+    servicio.cerrar()
+
+def test_año_sin_libro_no_existe(tmp_path):
+    servicio = ServicioExtraccion(directorio_data=str(tmp_path))
+    
+    with pytest.raises(LookupError):
+        servicio.archivo_año('2015')
+    servicio.cerrar()
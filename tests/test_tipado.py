@@ -0,0 +1,53 @@
+import pandas as pd
+
+from tipado import perdidos_al_tipar, tipar_columna, tipar_tabla
+
+def test_dimension_mixta_queda_como_categoria():
+    valores = ['Total', 'Menor de 1 año'] + list(range(100)) + ['100 y más', 'Ignorado']
+    
+    serie = tipar_columna(valores, es_dimension=True)
+    
+    assert isinstance(serie.dtype, pd.CategoricalDtype)
+    assert serie.isna().sum() == 0
+    assert {'Total', 'Menor de 1 año', '100 y más', 'Ignorado', '0', '99'} <= set(serie.cat.categories)
+
+def test_dimension_numerica_pasa_a_entero():
+    serie = tipar_columna(list(range(100)) + [None], es_dimension=True)
+    
+    assert str(serie.dtype) == 'Int16'
+    assert serie.isna().sum() == 1
+
+def test_medida_con_guiones_es_conteo():
+    serie = tipar_columna([5, '-', 7], es_medida=True)
+    
+    assert serie.tolist() == [5, 0, 7]
+
+def test_perdidos_al_tipar_compara_con_los_valores_crudos():
+    encabezados = ['Edad', 'Total']
+    datos = [{'Edad': 'Total', 'Total': 10}, {'Edad': '1', 'Total': 4}, {'Edad': 'Ignorado', 'Total': 6}]
+    estructura = {'tipo': 'simple', 'encabezados': encabezados}
+    
+    df = tipar_tabla(encabezados, datos, estructura)
+    assert perdidos_al_tipar(encabezados, datos, df) == {}
+    
+    df['Edad'] = pd.to_numeric(df['Edad'].astype(str), errors='coerce')
+    assert perdidos_al_tipar(encabezados, datos, df) == {'Edad': 2}
+
+def test_conteos_con_miles_y_llamadas_se_leen_como_numeros():
+    valores = [5, '1,234', '12*', '7 1/', '2 345', '-'] + list(range(30))
+    
+    serie = tipar_columna(valores, es_medida=True)
+    
+    assert serie.isna().sum() == 0
+    assert serie.tolist()[:6] == [5, 1234, 12, 7, 2345, 0]
+
+def test_perdidos_al_tipar_cuenta_las_medidas():
+    encabezados = ['Departamento', 'Total']
+    totales = list(range(40)) + ['1,234', 'ver nota']
+    datos = [{'Departamento': f'D{n}', 'Total': total} for n, total in enumerate(totales)]
+    estructura = {'tipo': 'simple', 'encabezados': encabezados}
+    
+    df = tipar_tabla(encabezados, datos, estructura)
+    
+    assert df['Total'].iloc[-2] == 1234
+    assert perdidos_al_tipar(encabezados, datos, df) == {'Total': 1}